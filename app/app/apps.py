@@ -0,0 +1,9 @@
+from django.apps import AppConfig
+
+
+class ProjectConfig(AppConfig):
+    name = "app"
+
+    def ready(self):
+        # Connects the receivers that drop changed users from the cache
+        from . import auth_backends  # noqa: F401
@@ -12,5 +12,15 @@ import os
 from django.core.asgi import get_asgi_application
 
 os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'app.settings')
+# Serve the read-heavy pages with the async views under ASGI
+os.environ.setdefault('ASYNC_READ_VIEWS', 'true')
+# No persistent database connections, see CONN_MAX_AGE in settings
+os.environ.setdefault('SERVER_MODE', 'asgi')
 
 application = get_asgi_application()
+
+# Benchmarks only (bench_read_path); production never wraps query execution
+if int(os.environ.get('SIMULATED_DB_LATENCY_MS', 0)):
+    from app import db_latency
+
+    db_latency.install()
@@ -0,0 +1,64 @@
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.contrib.auth.views import redirect_to_login
+from django.core.exceptions import PermissionDenied
+from django.core.paginator import InvalidPage
+from django.http import Http404
+from django.shortcuts import render
+from django.utils.cache import get_conditional_response
+from django.views import View
+
+from .conditional import apply_validators, normalize_validators
+from .pagination import InvalidCursor
+
+
+class AsyncReadView(View):
+    """Base for read-only views served natively under ASGI.
+
+    Queries go through the async ORM; only template rendering (which may touch
+    the fragment cache) runs in a thread.
+    """
+
+    template_name = None
+    permission_required = None
+
+    async def dispatch(self, request, *args, **kwargs):
+        self.user = await request.auser()
+        if not self.user.is_authenticated:
+            return redirect_to_login(request.get_full_path(), settings.LOGIN_URL)
+        # Templates read request.user; don't let them load it a second time
+        request.user = self.user
+        return await super().dispatch(request, *args, **kwargs)
+
+    async def check_permission(self, obj):
+        if not await self.user.ahas_perm(self.permission_required, obj):
+            raise PermissionDenied
+
+    async def get_page(self, paginator, cursor):
+        try:
+            page = await paginator.apage(cursor)
+        except InvalidCursor:
+            page = await paginator.apage()
+        except InvalidPage as exc:
+            raise Http404(str(exc)) from exc
+        await paginator.acount()
+        return page
+
+    def not_modified(self, validators):
+        """Return a 304 response if the client's copy still matches ``validators``."""
+        etag, timestamp = normalize_validators(*validators)
+        response = get_conditional_response(self.request, etag=etag, last_modified=timestamp)
+        if response is not None:
+            apply_validators(response, etag, timestamp)
+        return response
+
+    async def render(self, context, validators=None):
+        response = await sync_to_async(render)(self.request, self.template_name, context)
+        if validators is not None:
+            apply_validators(response, *normalize_validators(*validators))
+        return response
+
+
+def read_view(view_class, async_view_class):
+    """URL entry for a read-only page: the async view when ``ASYNC_READ_VIEWS`` is on."""
+    return (async_view_class if settings.ASYNC_READ_VIEWS else view_class).as_view()
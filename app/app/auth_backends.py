@@ -0,0 +1,93 @@
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.contrib.auth.backends import ModelBackend
+from django.core.cache import caches
+from django.db import DEFAULT_DB_ALIAS, transaction
+from django.db.models.signals import m2m_changed, post_delete, post_save
+from django.dispatch import receiver
+
+UserModel = get_user_model()
+
+
+def user_cache_key(user_id):
+    return f"auth-user:{user_id}"
+
+
+class CachedModelBackend(ModelBackend):
+    """ModelBackend whose ``get_user`` - run by AuthenticationMiddleware on every
+    authenticated request - reads the user from the cache.
+
+    Users are cached for ``USER_CACHE_SECONDS`` (0 disables it) and dropped from
+    the cache whenever they are saved (password, is_active, last_login...),
+    deleted, or their groups and permissions change. Only use it with a cache
+    shared by every worker, or a change in one worker goes unnoticed by the rest.
+    """
+
+    def get_user(self, user_id):
+        if not settings.USER_CACHE_SECONDS:
+            return super().get_user(user_id)
+        cache = caches[settings.USER_CACHE_ALIAS]
+        key = user_cache_key(user_id)
+        user = cache.get(key)
+        if user is None:
+            user = self.load_user(user_id)
+            if user is None:
+                return None
+            cache.set(key, user, settings.USER_CACHE_SECONDS)
+        return user if self.user_can_authenticate(user) else None
+
+    async def aget_user(self, user_id):
+        if not settings.USER_CACHE_SECONDS:
+            return await super().aget_user(user_id)
+        cache = caches[settings.USER_CACHE_ALIAS]
+        key = user_cache_key(user_id)
+        user = await cache.aget(key)
+        if user is None:
+            try:
+                user = await self.manager().aget(pk=user_id)
+            except UserModel.DoesNotExist:
+                return None
+            await cache.aset(key, user, settings.USER_CACHE_SECONDS)
+        return user if self.user_can_authenticate(user) else None
+
+    @staticmethod
+    def manager():
+        # A lagging replica could put the password hash from before a change
+        # back into the cache. Not db_for_write: a read must not pin the
+        # request (and the user's next ones) to the primary
+        return UserModel._default_manager.db_manager(DEFAULT_DB_ALIAS)
+
+    def load_user(self, user_id):
+        try:
+            return self.manager().get(pk=user_id)
+        except UserModel.DoesNotExist:
+            return None
+
+
+def forget_user(user_id):
+    cache = caches[settings.USER_CACHE_ALIAS]
+    key = user_cache_key(user_id)
+    cache.delete(key)
+    # A request reading the old row before the commit may have cached it again
+    transaction.on_commit(lambda: cache.delete(key))
+
+
+@receiver(post_save, sender=UserModel)
+@receiver(post_delete, sender=UserModel)
+def forget_saved_user(sender, instance, **kwargs):
+    forget_user(instance.pk)
+
+
+@receiver(m2m_changed, sender=UserModel.groups.through)
+@receiver(m2m_changed, sender=UserModel.user_permissions.through)
+def forget_user_with_changed_permissions(sender, instance, action, reverse, pk_set, **kwargs):
+    if not reverse:
+        if action.startswith("post_"):
+            forget_user(instance.pk)
+    elif action in ("post_add", "post_remove"):
+        # Changed from the group's or permission's side
+        for user_id in pk_set:
+            forget_user(user_id)
+    elif action == "pre_clear":
+        for user_id in instance.user_set.values_list("pk", flat=True):
+            forget_user(user_id)
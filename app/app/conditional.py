@@ -0,0 +1,51 @@
+import hashlib
+
+from django.middleware.csrf import get_token
+from django.utils.cache import get_conditional_response, patch_cache_control
+from django.utils.http import http_date, quote_etag
+
+
+def make_etag(request, *parts):
+    """Hash ``parts`` together with what a page embeds about its viewer.
+
+    Pages render per-user buttons and CSRF tokens, so the user and their
+    CSRF secret (rotated on login) are always part of the validator.
+    """
+    get_token(request)  # makes sure the CSRF secret exists before it is hashed
+    parts = (*parts, request.user.pk, request.META["CSRF_COOKIE"])
+    return hashlib.sha256("|".join(map(str, parts)).encode()).hexdigest()[:32]
+
+
+def normalize_validators(etag, last_modified):
+    """Return ``(quoted etag, unix timestamp)`` as ``get_conditional_response`` expects."""
+    etag = quote_etag(etag) if etag else None
+    timestamp = int(last_modified.timestamp()) if last_modified else None
+    return etag, timestamp
+
+
+def apply_validators(response, etag, timestamp):
+    if etag:
+        response.headers.setdefault("ETag", etag)
+    if timestamp:
+        response.headers.setdefault("Last-Modified", http_date(timestamp))
+    patch_cache_control(response, private=True, no_cache=True)
+    return response
+
+
+class ConditionalGetMixin:
+    """Answers ``If-None-Match``/``If-Modified-Since`` with 304 before rendering.
+
+    Views implement ``get_validators()`` returning ``(etag, last_modified)``,
+    both of which must be cheap to compute. Responses may be kept by the
+    browser but must be revalidated, and never by shared caches.
+    """
+
+    def get_validators(self):
+        raise NotImplementedError
+
+    def get(self, request, *args, **kwargs):
+        etag, timestamp = normalize_validators(*self.get_validators())
+        response = get_conditional_response(request, etag=etag, last_modified=timestamp)
+        if response is None:
+            response = super().get(request, *args, **kwargs)
+        return apply_validators(response, etag, timestamp)
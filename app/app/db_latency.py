@@ -0,0 +1,26 @@
+import time
+
+from django.conf import settings
+from django.db.backends.signals import connection_created
+
+
+def install():
+    """Delay every query by ``SIMULATED_DB_LATENCY_MS``, like a database across a network.
+
+    Only meant for benchmarks: a local SQLite database answers too quickly to
+    show how a server behaves while its workers wait on Postgres.
+    """
+    delay = settings.SIMULATED_DB_LATENCY_MS / 1000
+    if not delay:
+        return
+
+    def slow_execute(execute, sql, params, many, context):
+        time.sleep(delay)
+        return execute(sql, params, many, context)
+
+    def add_wrapper(sender, connection, **kwargs):
+        # Fires again whenever a closed connection is reopened
+        if slow_execute not in connection.execute_wrappers:
+            connection.execute_wrappers.append(slow_execute)
+
+    connection_created.connect(add_wrapper, weak=False, dispatch_uid="simulated_db_latency")
@@ -1,10 +1,76 @@
+import contextvars
+import logging
+import time
+from contextlib import contextmanager
+
+from django.conf import settings
+from django.db import DatabaseError, connections, transaction
+
+from app import metrics
+
+logger = logging.getLogger(__name__)
+
+# Per request (see begin_request): did we write, are we pinned? Outside of
+# requests (management commands, threads) nothing is recorded
+_routing_state = contextvars.ContextVar("replica_routing_state", default=None)
+
+# Postgres standby lag; 0 when everything received has been replayed
+POSTGRES_LAG_SQL = """
+    SELECT CASE
+        WHEN pg_last_wal_receive_lsn() = pg_last_wal_replay_lsn() THEN 0
+        ELSE COALESCE(EXTRACT(EPOCH FROM now() - pg_last_xact_replay_timestamp()), 0)
+    END
+"""
+
+
+def begin_request(pinned=False):
+    return _routing_state.set({"wrote": False, "pinned": pinned})
+
+
+def end_request(token):
+    state = _routing_state.get()
+    _routing_state.reset(token)
+    return state
+
+
+@contextmanager
+def primary():
+    """Read from the primary inside the block, e.g. in a management command
+    that reads back the rows it has just inserted."""
+    token = begin_request(pinned=True)
+    try:
+        yield
+    finally:
+        end_request(token)
+
+
 class PrimaryReplicaRouter:
+    replica_alias = 'replica'
+    primary_alias = 'default'
+
+    # Shared by all router instances in this process
+    _health_checked_at = None
+    _replica_healthy = True
 
     def db_for_read(self, model, **hints):
-        return 'replica'
+        alias = self.read_alias()
+        metrics.record_routing("read", alias)
+        return alias
+
+    def read_alias(self):
+        state = _routing_state.get()
+        if state and (state["wrote"] or state["pinned"]):
+            return self.primary_alias
+        if not self.replica_is_healthy():
+            return self.primary_alias
+        return self.replica_alias
 
     def db_for_write(self, model, **hints):
-        return 'default'
+        state = _routing_state.get()
+        if state is not None:
+            state["wrote"] = True
+        metrics.record_routing("write", self.primary_alias)
+        return self.primary_alias
 
     def allow_relation(self, obj1, obj2, **hints):
         return True
@@ -13,3 +79,33 @@ class PrimaryReplicaRouter:
         if db == 'default':
             return True
         return False
+
+    def replica_is_healthy(self):
+        now = time.monotonic()
+        cls = type(self)
+        checked_at = cls._health_checked_at
+        if checked_at is not None and now - checked_at < settings.REPLICA_HEALTH_CHECK_INTERVAL:
+            return cls._replica_healthy
+
+        try:
+            lag = self.probe_lag()
+        except DatabaseError:
+            logger.warning("Replica health probe failed, reading from primary")
+            lag = float("inf")
+
+        healthy = lag <= settings.REPLICA_MAX_LAG_SECONDS
+        if healthy != cls._replica_healthy:
+            logger.warning("Replica lag %.1fs, replica %s", lag, "enabled" if healthy else "disabled")
+        cls._health_checked_at, cls._replica_healthy = now, healthy
+        return healthy
+
+    def probe_lag(self):
+        connection = connections[self.replica_alias]
+        if connection.vendor != "postgresql":
+            return 0
+        # Runs inside a request: a stuck replica times out (and counts as lagging)
+        # instead of holding the request; connect_timeout is set in settings
+        with transaction.atomic(using=self.replica_alias), connection.cursor() as cursor:
+            cursor.execute("SET LOCAL statement_timeout = %s", [settings.REPLICA_PROBE_TIMEOUT_MS])
+            cursor.execute(POSTGRES_LAG_SQL)
+            return float(cursor.fetchone()[0])
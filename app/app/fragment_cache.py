@@ -0,0 +1,52 @@
+import logging
+import threading
+
+from django.conf import settings
+from django.core.cache import caches
+from django.core.cache.utils import make_template_fragment_key
+
+from app import instrumentation
+
+logger = logging.getLogger(__name__)
+
+
+class CacheStats:
+    """Process-wide hit/miss counters for the fragment cache."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def record(self, hit):
+        with self._lock:
+            if hit:
+                self.hits += 1
+            else:
+                self.misses += 1
+
+    @property
+    def hit_rate(self):
+        total = self.hits + self.misses
+        return self.hits / total if total else 0.0
+
+    def reset(self):
+        with self._lock:
+            self.hits = self.misses = 0
+
+
+stats = CacheStats()
+
+
+def get_or_render(fragment_name, vary_on, render):
+    cache = caches[settings.FRAGMENT_CACHE_ALIAS]
+    key = make_template_fragment_key(fragment_name, vary_on)
+
+    content = cache.get(key)
+    stats.record(hit=content is not None)
+    instrumentation.record_cache(hit=content is not None)
+    if content is None:
+        logger.debug("Fragment cache miss: %s", fragment_name)
+        content = render()
+        cache.set(key, content, settings.FRAGMENT_CACHE_TIMEOUT)
+    return content
@@ -0,0 +1,68 @@
+import logging
+import os
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor, wait
+
+from django.conf import settings
+from django.db import connections
+
+logger = logging.getLogger(__name__)
+
+# Checks run in their own threads, so a database that doesn't answer only
+# costs the probe READINESS_TIMEOUT_SECONDS. A hung check keeps its thread;
+# with all of them hung the following checks time out as well.
+_executor = ThreadPoolExecutor(max_workers=4, thread_name_prefix="readiness")
+_lock = threading.Lock()
+_cached = None
+
+
+def is_draining():
+    return os.path.exists(settings.READINESS_DRAIN_FILE)
+
+
+def stop_draining():
+    try:
+        os.remove(settings.READINESS_DRAIN_FILE)
+    except FileNotFoundError:
+        pass
+
+
+def check_database(alias):
+    connection = connections[alias]
+    try:
+        with connection.cursor() as cursor:
+            cursor.execute("SELECT 1")
+    finally:
+        # Connections are per thread, this one belongs to the executor
+        connection.close()
+
+
+def check_databases():
+    futures = {alias: _executor.submit(check_database, alias) for alias in connections}
+    wait(futures.values(), timeout=settings.READINESS_TIMEOUT_SECONDS)
+    results = {}
+    for alias, future in futures.items():
+        if not future.done():
+            results[alias] = "timeout"
+        elif future.exception() is not None:
+            logger.warning("Readiness check of database %r failed: %s", alias, future.exception())
+            results[alias] = "error"
+        else:
+            results[alias] = "ok"
+    return results
+
+
+def readiness():
+    """``(ready, details)`` of this process, cached for ``READINESS_CACHE_SECONDS``."""
+    global _cached
+    if is_draining():
+        return False, {"status": "draining"}
+
+    with _lock:
+        now = time.monotonic()
+        if _cached is None or now - _cached[0] >= settings.READINESS_CACHE_SECONDS:
+            databases = check_databases()
+            _cached = (now, all(result == "ok" for result in databases.values()), databases)
+        _, ready, databases = _cached
+    return ready, {"status": "ok" if ready else "unavailable", "databases": databases}
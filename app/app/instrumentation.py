@@ -0,0 +1,94 @@
+import contextvars
+import time
+
+from django.db import connections
+from django.db.backends.signals import connection_created
+
+# Queries kept per request for the slow request dump
+MAX_LOGGED_QUERIES = 200
+
+_current = contextvars.ContextVar("request_timings", default=None)
+
+
+class RequestTimings:
+    """Where the time of one sampled request went."""
+
+    def __init__(self):
+        self.started = time.perf_counter()
+        self.view_started = self.view_ended = self.render_ended = None
+        # alias -> [queries, seconds]
+        self.databases = {}
+        self.queries = []
+        self.cache_hits = 0
+        self.cache_misses = 0
+
+    @staticmethod
+    def _ms(start, end):
+        return (end - start) * 1000 if start is not None and end is not None else 0.0
+
+    @property
+    def view_ms(self):
+        return self._ms(self.view_started, self.view_ended)
+
+    @property
+    def render_ms(self):
+        return self._ms(self.view_ended, self.render_ended)
+
+    def record_query(self, alias, sql, seconds):
+        totals = self.databases.setdefault(alias, [0, 0.0])
+        totals[0] += 1
+        totals[1] += seconds
+        if len(self.queries) < MAX_LOGGED_QUERIES:
+            self.queries.append((alias, seconds, sql))
+
+
+def current():
+    return _current.get()
+
+
+def begin_request():
+    timings = RequestTimings()
+    return timings, _current.set(timings)
+
+
+def end_request(token):
+    _current.reset(token)
+
+
+def record_cache(hit):
+    timings = _current.get()
+    if timings is not None:
+        if hit:
+            timings.cache_hits += 1
+        else:
+            timings.cache_misses += 1
+
+
+def _time_query(execute, sql, params, many, context):
+    timings = _current.get()
+    if timings is None:
+        return execute(sql, params, many, context)
+    started = time.perf_counter()
+    try:
+        return execute(sql, params, many, context)
+    finally:
+        timings.record_query(context["connection"].alias, sql, time.perf_counter() - started)
+
+
+def _add_wrapper(sender=None, connection=None, **kwargs):
+    # Fires again whenever a closed connection is reopened
+    if _time_query not in connection.execute_wrappers:
+        # First in the list is outermost, so simulated latency is included
+        connection.execute_wrappers.insert(0, _time_query)
+
+
+def install():
+    """Time the queries of sampled requests on every database connection.
+
+    Connections are per thread (and sync_to_async runs queries in other threads),
+    so the wrapper is added whenever a connection is created and only reads the
+    request's timings from a context variable.
+    """
+    connection_created.connect(_add_wrapper, weak=False, dispatch_uid="request_timings")
+    for connection in connections.all(initialized_only=True):
+        _add_wrapper(connection=connection)
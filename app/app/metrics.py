@@ -0,0 +1,138 @@
+import contextvars
+import time
+
+from axes.signals import user_locked_out
+from django.contrib.auth.signals import user_login_failed
+from django.db import connections
+from django.db.backends.signals import connection_created
+from django.dispatch import receiver
+from prometheus_client import (
+    CONTENT_TYPE_LATEST,
+    REGISTRY,
+    CollectorRegistry,
+    Counter,
+    Gauge,
+    Histogram,
+    generate_latest,
+    multiprocess,
+)
+
+# With PROMETHEUS_MULTIPROC_DIR set (see gunicorn.conf.py) every metric below is
+# written to a per-process file there and a scrape of any worker adds them all up.
+
+REQUEST_LATENCY = Histogram(
+    "pokero_http_request_duration_seconds",
+    "Time to produce a response, by URL name.",
+    ["view", "method"],
+    buckets=(0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10),
+)
+RESPONSES = Counter("pokero_http_responses", "Responses by URL name and status code.", ["view", "method", "status"])
+REQUEST_QUERIES = Histogram(
+    "pokero_http_request_db_queries",
+    "SQL queries run by one request, by URL name.",
+    ["view"],
+    buckets=(0, 1, 2, 5, 10, 20, 50, 100),
+)
+DB_QUERY_LATENCY = Histogram(
+    "pokero_db_query_duration_seconds",
+    "Duration of SQL queries by database alias.",
+    ["alias"],
+    buckets=(0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 1),
+)
+DB_ROUTING = Counter(
+    "pokero_db_routing", "Database picked by PrimaryReplicaRouter for reads and writes.", ["operation", "alias"]
+)
+THROTTLED = Counter("pokero_throttled_requests", "Requests refused with 429, by the limit they hit.", ["limit"])
+SHED = Counter("pokero_shed_requests", "Requests refused with 503 by load shedding, by reason.", ["reason"])
+IN_FLIGHT = Gauge(
+    "pokero_http_requests_in_flight", "Requests being handled right now.", multiprocess_mode="livesum"
+)
+QUEUE_TIME = Histogram(
+    "pokero_http_request_queue_seconds",
+    "Time between the ingress receiving a request and a worker starting it.",
+    buckets=(0.001, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5),
+)
+LOGIN_FAILURES = Counter("pokero_login_failures", "Failed login attempts.")
+LOCKOUTS = Counter("pokero_axes_lockouts", "Users or IPs locked out by django-axes.")
+
+# Anything else would give every scanner's made-up method its own series
+METHODS = frozenset(("GET", "HEAD", "POST", "PUT", "PATCH", "DELETE", "OPTIONS"))
+
+_request_queries = contextvars.ContextVar("request_queries", default=None)
+
+
+def view_label(request):
+    match = getattr(request, "resolver_match", None)
+    return match.view_name if match and match.view_name else "<unresolved>"
+
+
+def method_label(request):
+    return request.method if request.method in METHODS else "other"
+
+
+def begin_request():
+    return _request_queries.set([0])
+
+
+def end_request(request, response, started, token):
+    queries = _request_queries.get()[0]
+    _request_queries.reset(token)
+    view, method = view_label(request), method_label(request)
+    REQUEST_LATENCY.labels(view, method).observe(time.perf_counter() - started)
+    RESPONSES.labels(view, method, str(response.status_code)).inc()
+    REQUEST_QUERIES.labels(view).observe(queries)
+
+
+def record_routing(operation, alias):
+    DB_ROUTING.labels(operation, alias).inc()
+
+
+def record_throttled(limit):
+    THROTTLED.labels(limit).inc()
+
+
+def record_shed(reason):
+    SHED.labels(reason).inc()
+
+
+def _observe_query(execute, sql, params, many, context):
+    started = time.perf_counter()
+    try:
+        return execute(sql, params, many, context)
+    finally:
+        DB_QUERY_LATENCY.labels(context["connection"].alias).observe(time.perf_counter() - started)
+        queries = _request_queries.get()
+        if queries is not None:
+            queries[0] += 1
+
+
+def _add_wrapper(sender=None, connection=None, **kwargs):
+    # Fires again whenever a closed connection is reopened
+    if _observe_query not in connection.execute_wrappers:
+        connection.execute_wrappers.append(_observe_query)
+
+
+def install():
+    connection_created.connect(_add_wrapper, weak=False, dispatch_uid="prometheus_queries")
+    for connection in connections.all(initialized_only=True):
+        _add_wrapper(connection=connection)
+
+
+@receiver(user_login_failed)
+def count_login_failure(sender, **kwargs):
+    LOGIN_FAILURES.inc()
+
+
+@receiver(user_locked_out)
+def count_lockout(sender, **kwargs):
+    LOCKOUTS.inc()
+
+
+def render(multiprocess_dir=None):
+    """Exposition of every metric, summed over all workers in multiprocess mode."""
+    if multiprocess_dir:
+        registry = CollectorRegistry()
+        multiprocess.MultiProcessCollector(registry, path=multiprocess_dir)
+    else:
+        registry = REGISTRY
+    return generate_latest(registry), CONTENT_TYPE_LATEST
@@ -1,4 +1,18 @@
 # app/app/middleware.py
+import json
+import logging
+import random
+import time
+
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction, sync_to_async
+from django.conf import settings
+from django.http import HttpResponse, JsonResponse
+
+from app import db_router, health, instrumentation, metrics, throttling
+
+logger = logging.getLogger(__name__)
+
+
 class SecurityHeadersMiddleware:
     def __init__(self, get_response):
         self.get_response = get_response
@@ -11,7 +25,10 @@ class SecurityHeadersMiddleware:
             "magnetometer=(), microphone=(), payment=(), usb=()"
         )
 
-        if request.user.is_authenticated or request.path.startswith('/admin'):
+        # Views that answer conditional GETs mark their responses "private" -
+        # browsers may keep those and revalidate, shared caches still may not
+        is_private = 'private' in response.get('Cache-Control', '')
+        if request.path.startswith('/admin') or (request.user.is_authenticated and not is_private):
             response['Cache-Control'] = "no-store, no-cache, must-revalidate, max-age=0"
             response['Pragma'] = "no-cache"
 
@@ -19,3 +36,334 @@ class SecurityHeadersMiddleware:
         response['Server'] = "PokeroServer" 
 
         return response
+
+
+class PrimaryPinningMiddleware:
+    """Routes reads to the primary for a while after a user has written.
+
+    Works with ``app.db_router.PrimaryReplicaRouter``: a request that writes is
+    pinned to the primary for its remaining queries, and a cookie keeps the
+    user's following requests there for ``REPLICA_PIN_SECONDS``.
+    """
+
+    cookie_name = "primary_pin"
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        if iscoroutinefunction(self.get_response):
+            markcoroutinefunction(self)
+
+    def __call__(self, request):
+        if iscoroutinefunction(self):
+            return self.__acall__(request)
+
+        token = db_router.begin_request(pinned=self.is_pinned(request))
+        try:
+            response = self.get_response(request)
+        finally:
+            state = db_router.end_request(token)
+        return self.process_response(request, response, state)
+
+    async def __acall__(self, request):
+        token = db_router.begin_request(pinned=self.is_pinned(request))
+        try:
+            response = await self.get_response(request)
+        finally:
+            state = db_router.end_request(token)
+        return self.process_response(request, response, state)
+
+    def is_pinned(self, request):
+        try:
+            pinned_until = float(request.COOKIES.get(self.cookie_name, 0))
+        except ValueError:
+            return False
+        return pinned_until > time.time()
+
+    def process_response(self, request, response, state):
+        if state["wrote"]:
+            window = settings.REPLICA_PIN_SECONDS
+            response.set_cookie(
+                self.cookie_name,
+                str(time.time() + window),
+                max_age=window,
+                httponly=True,
+                samesite="Lax",
+                secure=request.is_secure(),
+            )
+        return response
+
+
+class HealthCheckMiddleware:
+    """Answers the Kubernetes probes before any other middleware runs.
+
+    ``/healthz`` (liveness) only shows the process answers; ``/readyz``
+    (readiness) checks every database, see ``app.health``. Neither touches
+    sessions, auth, CSP or templates, nor shows up in metrics and timing logs.
+    """
+
+    liveness_path = "/healthz"
+    readiness_path = "/readyz"
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        if iscoroutinefunction(self.get_response):
+            markcoroutinefunction(self)
+
+    def __call__(self, request):
+        if iscoroutinefunction(self):
+            return self.__acall__(request)
+
+        if request.path == self.liveness_path:
+            return self.liveness()
+        if request.path == self.readiness_path:
+            return self.readiness(*health.readiness())
+        return self.get_response(request)
+
+    async def __acall__(self, request):
+        if request.path == self.liveness_path:
+            return self.liveness()
+        if request.path == self.readiness_path:
+            return self.readiness(*await sync_to_async(health.readiness, thread_sensitive=False)())
+        return await self.get_response(request)
+
+    def liveness(self):
+        response = HttpResponse("ok", content_type="text/plain")
+        response["Cache-Control"] = "no-store"
+        return response
+
+    def readiness(self, ready, details):
+        response = JsonResponse(details, status=200 if ready else 503)
+        response["Cache-Control"] = "no-store"
+        # app.health already logs why; don't add an error line for every probe
+        response._has_been_logged = True
+        return response
+
+
+class LoadSheddingMiddleware:
+    """Refuses requests with 503 and Retry-After while this worker is overloaded.
+
+    Caps the requests in flight and sheds the ones that queued too long in
+    front of the worker, see ``app.throttling.LoadShedder``. Runs before
+    sessions and auth, so a refused request costs next to nothing.
+    """
+
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        if iscoroutinefunction(self.get_response):
+            markcoroutinefunction(self)
+        self.shedder = throttling.LoadShedder(
+            settings.LOAD_SHED_MAX_IN_FLIGHT,
+            settings.LOAD_SHED_QUEUE_TARGET_MS / 1000,
+            settings.LOAD_SHED_INTERVAL_MS / 1000,
+        )
+
+    def __call__(self, request):
+        if iscoroutinefunction(self):
+            return self.__acall__(request)
+
+        if throttling.is_exempt(request):
+            return self.get_response(request)
+        refused = self.admit(request)
+        if refused is not None:
+            return refused
+        try:
+            return self.get_response(request)
+        finally:
+            self.release()
+
+    async def __acall__(self, request):
+        if throttling.is_exempt(request):
+            return await self.get_response(request)
+        refused = self.admit(request)
+        if refused is not None:
+            return refused
+        try:
+            return await self.get_response(request)
+        finally:
+            self.release()
+
+    def admit(self, request):
+        queued = throttling.queue_seconds(request)
+        if queued is not None:
+            metrics.QUEUE_TIME.observe(queued)
+        reason = self.shedder.admit(queued)
+        if reason is not None:
+            metrics.record_shed(reason)
+            return throttling.refusal(503, settings.LOAD_SHED_RETRY_AFTER_SECONDS)
+        metrics.IN_FLIGHT.inc()
+        return None
+
+    def release(self):
+        self.shedder.release()
+        metrics.IN_FLIGHT.dec()
+
+
+class ThrottleMiddleware:
+    """Refuses requests over the per-IP and per-user rates with 429 and Retry-After.
+
+    Token buckets shared by every worker through ``THROTTLE_CACHE_ALIAS``, see
+    ``app.throttling.throttle``. Needs ``request.user``, so it goes after
+    AuthenticationMiddleware.
+    """
+
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        if iscoroutinefunction(self.get_response):
+            markcoroutinefunction(self)
+
+    def __call__(self, request):
+        if iscoroutinefunction(self):
+            return self.__acall__(request)
+
+        if settings.THROTTLE_ENABLED and not throttling.is_exempt(request):
+            limited = throttling.throttle(request, request.user)
+            if limited:
+                return self.refuse(*limited)
+        return self.get_response(request)
+
+    async def __acall__(self, request):
+        if settings.THROTTLE_ENABLED and not throttling.is_exempt(request):
+            user = await request.auser()
+            limited = await sync_to_async(throttling.throttle, thread_sensitive=False)(request, user)
+            if limited:
+                return self.refuse(*limited)
+        return await self.get_response(request)
+
+    def refuse(self, limit, wait):
+        metrics.record_throttled(limit)
+        return throttling.refusal(429, wait)
+
+
+class MetricsMiddleware:
+    """Feeds every request's latency, status and query count to ``app.metrics``."""
+
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        if iscoroutinefunction(self.get_response):
+            markcoroutinefunction(self)
+        metrics.install()
+
+    def __call__(self, request):
+        if iscoroutinefunction(self):
+            return self.__acall__(request)
+
+        started, token = time.perf_counter(), metrics.begin_request()
+        response = self.get_response(request)
+        metrics.end_request(request, response, started, token)
+        return response
+
+    async def __acall__(self, request):
+        started, token = time.perf_counter(), metrics.begin_request()
+        response = await self.get_response(request)
+        metrics.end_request(request, response, started, token)
+        return response
+
+
+class RequestTimingMiddleware:
+    """Reports where a request's time went, for a ``REQUEST_TIMING_SAMPLE_RATE`` share of requests.
+
+    Sampled responses get a ``Server-Timing`` header (total, view, template
+    render, queries per database alias, cache hits and misses) and one JSON log
+    line (unless ``REQUEST_TIMING_LOG`` is off). Requests slower than
+    ``REQUEST_TIMING_SLOW_MS`` always log, with their queries.
+    Unsampled requests only cost a random number and a context variable lookup
+    per query.
+    """
+
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        if iscoroutinefunction(self.get_response):
+            markcoroutinefunction(self)
+        instrumentation.install()
+
+    def __call__(self, request):
+        if iscoroutinefunction(self):
+            return self.__acall__(request)
+
+        if random.random() >= settings.REQUEST_TIMING_SAMPLE_RATE:
+            return self.get_response(request)
+        timings, token = instrumentation.begin_request()
+        try:
+            response = self.get_response(request)
+        finally:
+            instrumentation.end_request(token)
+        return self.process_timings(request, response, timings)
+
+    async def __acall__(self, request):
+        if random.random() >= settings.REQUEST_TIMING_SAMPLE_RATE:
+            return await self.get_response(request)
+        timings, token = instrumentation.begin_request()
+        try:
+            response = await self.get_response(request)
+        finally:
+            instrumentation.end_request(token)
+        return self.process_timings(request, response, timings)
+
+    def process_view(self, request, view_func, view_args, view_kwargs):
+        timings = instrumentation.current()
+        if timings is not None:
+            timings.view_started = time.perf_counter()
+
+    def process_template_response(self, request, response):
+        # The view has returned; the template is rendered right after this hook
+        timings = instrumentation.current()
+        if timings is not None:
+            timings.view_ended = time.perf_counter()
+            response.add_post_render_callback(lambda response: setattr(timings, "render_ended", time.perf_counter()))
+        return response
+
+    def process_timings(self, request, response, timings):
+        ended = time.perf_counter()
+        if timings.view_ended is None:
+            timings.view_ended = ended
+        total_ms = (ended - timings.started) * 1000
+
+        metrics = [f"total;dur={total_ms:.1f}", f"view;dur={timings.view_ms:.1f}"]
+        if timings.render_ended is not None:
+            metrics.append(f"render;dur={timings.render_ms:.1f}")
+        for alias, (count, seconds) in timings.databases.items():
+            metrics.append(f'db-{alias};dur={seconds * 1000:.1f};desc="{count} queries"')
+        metrics.append(f'cache;desc="{timings.cache_hits} hits, {timings.cache_misses} misses"')
+        response["Server-Timing"] = ", ".join(metrics)
+
+        match = request.resolver_match
+        line = {
+            "method": request.method,
+            "path": request.path,
+            "view": match.view_name if match else None,
+            "status": response.status_code,
+            "total_ms": round(total_ms, 1),
+            "view_ms": round(timings.view_ms, 1),
+            "render_ms": round(timings.render_ms, 1),
+            "db": {
+                alias: {"queries": count, "ms": round(seconds * 1000, 1)}
+                for alias, (count, seconds) in timings.databases.items()
+            },
+            "cache": {"hits": timings.cache_hits, "misses": timings.cache_misses},
+        }
+        if total_ms < settings.REQUEST_TIMING_SLOW_MS:
+            if settings.REQUEST_TIMING_LOG:
+                logger.info(json.dumps(line))
+        else:
+            line["queries"] = [
+                {"db": alias, "ms": round(seconds * 1000, 1), "sql": sql}
+                for alias, seconds, sql in timings.queries
+            ]
+            logger.warning(json.dumps(line))
+        return response
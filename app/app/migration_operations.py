@@ -0,0 +1,109 @@
+from django.db import migrations
+
+
+class AddIndexConcurrently(migrations.AddIndex):
+    """``AddIndex`` that doesn't lock writes on Postgres (``CREATE INDEX CONCURRENTLY``).
+
+    Other databases build the index normally. Postgres can't build indexes
+    concurrently inside a transaction, so the migration needs ``atomic = False``.
+    """
+
+    def database_forwards(self, app_label, schema_editor, from_state, to_state):
+        if schema_editor.connection.vendor != "postgresql":
+            return super().database_forwards(app_label, schema_editor, from_state, to_state)
+        model = to_state.apps.get_model(app_label, self.model_name)
+        if self.allow_migrate_model(schema_editor.connection.alias, model):
+            schema_editor.add_index(model, self.index, concurrently=True)
+
+    def database_backwards(self, app_label, schema_editor, from_state, to_state):
+        if schema_editor.connection.vendor != "postgresql":
+            return super().database_backwards(app_label, schema_editor, from_state, to_state)
+        model = from_state.apps.get_model(app_label, self.model_name)
+        if self.allow_migrate_model(schema_editor.connection.alias, model):
+            schema_editor.remove_index(model, self.index, concurrently=True)
+
+
+class AddTableIndexConcurrently(migrations.RunSQL):
+    """Concurrent index on a table without model state, e.g. an auto-created m2m table.
+
+    ``opclasses`` are PostgreSQL operator classes, one per column; other databases
+    skip such an index.
+    """
+
+    def __init__(self, table, name, columns, opclasses=()):
+        self.table, self.name, self.columns, self.opclasses = table, name, columns, opclasses
+        super().__init__(sql="", reverse_sql="")
+
+    def deconstruct(self):
+        kwargs = {"opclasses": self.opclasses} if self.opclasses else {}
+        return self.__class__.__name__, [self.table, self.name, self.columns], kwargs
+
+    def database_forwards(self, app_label, schema_editor, from_state, to_state):
+        qn = schema_editor.quote_name
+        postgresql = schema_editor.connection.vendor == "postgresql"
+        if self.opclasses and not postgresql:
+            return
+        concurrently = "CONCURRENTLY " if postgresql else ""
+        columns = ", ".join(
+            " ".join(filter(None, (qn(column), opclass)))
+            for column, opclass in zip(self.columns, self.opclasses or [""] * len(self.columns))
+        )
+        schema_editor.execute(
+            f"CREATE INDEX {concurrently}IF NOT EXISTS {qn(self.name)} ON {qn(self.table)} ({columns})"
+        )
+
+    def database_backwards(self, app_label, schema_editor, from_state, to_state):
+        concurrently = "CONCURRENTLY " if schema_editor.connection.vendor == "postgresql" else ""
+        schema_editor.execute(f"DROP INDEX {concurrently}IF EXISTS {schema_editor.quote_name(self.name)}")
+
+    def describe(self):
+        return f"Create index {self.name} on {self.table}"
+
+
+class AddFullTextIndex(migrations.RunSQL):
+    """Full-text index over one text column of ``table``.
+
+    Postgres: a generated ``tsvector`` column ``vector`` with a GIN index.
+    SQLite: an FTS5 table ``<table>_fts`` over the column, kept current by
+    triggers. Other databases get nothing and search unindexed.
+    """
+
+    def __init__(self, table, column):
+        self.table, self.column = table, column
+        super().__init__(sql="", reverse_sql="")
+
+    def deconstruct(self):
+        return self.__class__.__name__, [self.table, self.column], {}
+
+    def database_forwards(self, app_label, schema_editor, from_state, to_state):
+        qn = schema_editor.quote_name
+        table, column, fts = qn(self.table), qn(self.column), qn(f"{self.table}_fts")
+        vendor = schema_editor.connection.vendor
+        if vendor == "postgresql":
+            schema_editor.execute(
+                f"ALTER TABLE {table} ADD COLUMN vector tsvector "
+                f"GENERATED ALWAYS AS (to_tsvector('simple', {column})) STORED"
+            )
+            schema_editor.execute(f"CREATE INDEX {qn(self.table + '_vector')} ON {table} USING GIN (vector)")
+        elif vendor == "sqlite":
+            schema_editor.execute(
+                f"CREATE VIRTUAL TABLE {fts} USING fts5({column}, content={table}, content_rowid='id')"
+            )
+            delete = f"INSERT INTO {fts} ({fts}, rowid, {column}) VALUES ('delete', old.id, old.{column});"
+            insert = f"INSERT INTO {fts} (rowid, {column}) VALUES (new.id, new.{column});"
+            for event, body in (("INSERT", insert), ("DELETE", delete), ("UPDATE", delete + " " + insert)):
+                trigger = qn(f"{self.table}_fts_{event.lower()}")
+                schema_editor.execute(f"CREATE TRIGGER {trigger} AFTER {event} ON {table} BEGIN {body} END")
+
+    def database_backwards(self, app_label, schema_editor, from_state, to_state):
+        qn = schema_editor.quote_name
+        vendor = schema_editor.connection.vendor
+        if vendor == "postgresql":
+            schema_editor.execute(f"ALTER TABLE {qn(self.table)} DROP COLUMN vector")
+        elif vendor == "sqlite":
+            for event in ("insert", "delete", "update"):
+                schema_editor.execute(f"DROP TRIGGER {qn(f'{self.table}_fts_{event}')}")
+            schema_editor.execute(f"DROP TABLE {qn(f'{self.table}_fts')}")
+
+    def describe(self):
+        return f"Create full-text index on {self.table}.{self.column}"
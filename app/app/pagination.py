@@ -0,0 +1,209 @@
+import json
+import math
+from functools import reduce
+from operator import or_
+
+from asgiref.sync import sync_to_async
+from django.core import signing
+from django.core.exceptions import ValidationError
+from django.core.paginator import InvalidPage
+from django.db import connections
+from django.db.models import Q
+from django.http import Http404
+
+
+class InvalidCursor(InvalidPage):
+    pass
+
+
+def estimate_count(queryset, limit=10_000):
+    """Cheap row count estimate that never scans the whole result set.
+
+    Postgres answers from the planner (``EXPLAIN``); other databases count
+    at most ``limit`` rows.
+    """
+    connection = connections[queryset.db]
+    if connection.vendor == "postgresql":
+        sql, params = queryset.order_by().query.sql_with_params()
+        with connection.cursor() as cursor:
+            cursor.execute(f"EXPLAIN (FORMAT JSON) {sql}", params)
+            plan = cursor.fetchone()[0]
+        if isinstance(plan, str):
+            plan = json.loads(plan)
+        return int(plan[0]["Plan"]["Plan Rows"])
+    return queryset.order_by()[:limit].count()
+
+
+async def aestimate_count(queryset, limit=10_000):
+    if connections[queryset.db].vendor == "postgresql":
+        return await sync_to_async(estimate_count)(queryset, limit)
+    return await queryset.order_by()[:limit].acount()
+
+
+class KeysetPage:
+    """Quacks like ``django.core.paginator.Page`` for the parts templates use."""
+
+    def __init__(self, object_list, number, offset, paginator, has_next, has_previous):
+        self.object_list = object_list
+        self.number = number
+        self.offset = offset
+        self.paginator = paginator
+        self._has_next = has_next
+        self._has_previous = has_previous
+
+    def __iter__(self):
+        return iter(self.object_list)
+
+    def __len__(self):
+        return len(self.object_list)
+
+    def has_next(self):
+        return self._has_next
+
+    def has_previous(self):
+        return self._has_previous
+
+    def has_other_pages(self):
+        return self._has_next or self._has_previous
+
+    def start_index(self):
+        return self.offset + 1 if self.object_list else 0
+
+    @property
+    def next_cursor(self):
+        if not self._has_next:
+            return None
+        return self.paginator.encode_cursor(
+            self.object_list[-1], "next", self.number + 1, self.offset + len(self)
+        )
+
+    @property
+    def previous_cursor(self):
+        if not self._has_previous:
+            return None
+        return self.paginator.encode_cursor(
+            self.object_list[0], "prev", self.number - 1, max(self.offset - self.paginator.per_page, 0)
+        )
+
+
+class KeysetPaginator:
+    """Paginates by seeking past the last seen ordering key instead of OFFSET.
+
+    ``ordering`` must end with a unique field (usually ``pk``). Counting is
+    skipped unless ``estimate_count`` is set, in which case ``count`` and
+    ``num_pages`` come from :func:`estimate_count`.
+    """
+
+    salt = "app.pagination.cursor"
+
+    def __init__(self, queryset, per_page, ordering=("pk",), estimate_count=False):
+        self.queryset = queryset
+        self.per_page = int(per_page)
+        self.ordering = tuple(ordering)
+        self.estimate_count = estimate_count
+        opts = queryset.model._meta
+        self.fields = [
+            opts.pk if name.lstrip("-") == "pk" else opts.get_field(name.lstrip("-"))
+            for name in self.ordering
+        ]
+
+    def encode_cursor(self, obj, direction, number, offset):
+        values = [field.value_to_string(obj) for field in self.fields]
+        return signing.dumps([values, direction, number, offset], salt=self.salt, compress=True)
+
+    def decode_cursor(self, cursor):
+        try:
+            values, direction, number, offset = signing.loads(cursor, salt=self.salt)
+            values = [field.to_python(value) for field, value in zip(self.fields, values, strict=True)]
+        except (signing.BadSignature, TypeError, ValueError, ValidationError) as exc:
+            raise InvalidCursor("Invalid cursor") from exc
+        if direction not in ("next", "prev"):
+            raise InvalidCursor("Invalid cursor")
+        return values, direction, number, offset
+
+    def _seek(self, values, reverse):
+        # (a, b, c) > (x, y, z)  ==  a > x OR (a = x AND b > y) OR ...
+        conditions = []
+        for i, name in enumerate(self.ordering):
+            descending = name.startswith("-") != reverse
+            lookup = "lt" if descending else "gt"
+            column = name.lstrip("-")
+            equal = {self.ordering[j].lstrip("-"): values[j] for j in range(i)}
+            conditions.append(Q(**equal, **{f"{column}__{lookup}": values[i]}))
+        return reduce(or_, conditions)
+
+    def _query(self, cursor):
+        """Return (queryset, number, offset, direction) for the page at ``cursor``."""
+        if not cursor:
+            return self.queryset.order_by(*self.ordering), 1, 0, None
+
+        values, direction, number, offset = self.decode_cursor(cursor)
+        if direction == "next":
+            queryset = self.queryset.filter(self._seek(values, reverse=False))
+            return queryset.order_by(*self.ordering), number, offset, direction
+
+        reversed_ordering = [name[1:] if name.startswith("-") else f"-{name}" for name in self.ordering]
+        queryset = self.queryset.filter(self._seek(values, reverse=True))
+        return queryset.order_by(*reversed_ordering), number, offset, direction
+
+    def _make_page(self, rows, number, offset, direction):
+        has_more = len(rows) > self.per_page
+        rows = rows[: self.per_page]
+        if direction == "prev":
+            return KeysetPage(rows[::-1], number, offset, self, True, has_more)
+        return KeysetPage(rows, number, offset, self, has_more, direction is not None)
+
+    def page(self, cursor=None):
+        queryset, number, offset, direction = self._query(cursor)
+        rows = list(queryset[: self.per_page + 1])
+        return self._make_page(rows, number, offset, direction)
+
+    async def apage(self, cursor=None):
+        queryset, number, offset, direction = self._query(cursor)
+        rows = [row async for row in queryset[: self.per_page + 1]]
+        return self._make_page(rows, number, offset, direction)
+
+    @property
+    def count(self):
+        if not self.estimate_count:
+            return None
+        if not hasattr(self, "_count"):
+            self._count = estimate_count(self.queryset)
+        return self._count
+
+    async def acount(self):
+        """Fill in ``count`` without blocking the event loop."""
+        if self.estimate_count and not hasattr(self, "_count"):
+            self._count = await aestimate_count(self.queryset)
+        return self.count
+
+    @property
+    def num_pages(self):
+        if self.count is None:
+            return None
+        return max(math.ceil(self.count / self.per_page), 1)
+
+
+class KeysetPaginationMixin:
+    """Keyset pagination for ``MultipleObjectMixin`` views (e.g. ``ListView``)."""
+
+    paginator_class = KeysetPaginator
+    keyset_ordering = ("pk",)
+    estimate_count = False
+    cursor_kwarg = "cursor"
+
+    def get_paginator(self, queryset, per_page, orphans=0, allow_empty_first_page=True, **kwargs):
+        return self.paginator_class(
+            queryset, per_page, ordering=self.keyset_ordering, estimate_count=self.estimate_count
+        )
+
+    def paginate_queryset(self, queryset, page_size):
+        paginator = self.get_paginator(queryset, page_size)
+        try:
+            page = paginator.page(self.request.GET.get(self.cursor_kwarg))
+        except InvalidCursor:
+            # Forged or stale links (e.g. from before an ordering change) start over
+            page = paginator.page()
+        except InvalidPage as exc:
+            raise Http404(str(exc)) from exc
+        return paginator, page, page.object_list, page.has_other_pages()
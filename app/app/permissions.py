@@ -0,0 +1,138 @@
+import contextvars
+
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction, sync_to_async
+from django.db.models.signals import m2m_changed, post_delete, post_save
+from django.dispatch import receiver
+from rules.permissions import ObjectPermissionBackend
+
+_current_cache = contextvars.ContextVar("permission_cache", default=None)
+
+
+class PermissionCache:
+    """Memoizes rule results and loaded related objects for a single request."""
+
+    def __init__(self):
+        self.results = {}
+        self.objects = {}
+        self.hits = 0
+        self.misses = 0
+
+    @staticmethod
+    def key(user, perm, obj):
+        if obj is None:
+            return (user.pk, perm, None, None)
+        if getattr(obj, "pk", None) is None:
+            # Unsaved objects have no stable identity
+            return None
+        return (user.pk, perm, obj._meta.label, obj.pk)
+
+    def remember(self, obj):
+        if obj is not None and obj.pk is not None:
+            self.objects.setdefault((obj._meta.label, obj.pk), obj)
+        return obj
+
+    def related(self, obj, field_name):
+        field = obj._meta.get_field(field_name)
+        if field.is_cached(obj):
+            return self.remember(getattr(obj, field_name))
+
+        related_pk = getattr(obj, field.attname)
+        if related_pk is None:
+            return None
+
+        key = (field.related_model._meta.label, related_pk)
+        if key not in self.objects:
+            self.objects[key] = getattr(obj, field_name)
+        else:
+            field.set_cached_value(obj, self.objects[key])
+        return self.objects[key]
+
+    def clear(self):
+        self.results.clear()
+        self.objects.clear()
+
+
+def get_permission_cache():
+    return _current_cache.get()
+
+
+def activate():
+    cache = PermissionCache()
+    return cache, _current_cache.set(cache)
+
+
+def deactivate(token):
+    _current_cache.reset(token)
+
+
+def related(obj, field_name):
+    """Return a related object, sharing instances loaded earlier in the request."""
+    cache = _current_cache.get()
+    if cache is None:
+        return getattr(obj, field_name)
+    return cache.related(obj, field_name)
+
+
+class CachedObjectPermissionBackend(ObjectPermissionBackend):
+    def has_perm(self, user, perm, *args, **kwargs):
+        cache = _current_cache.get()
+        obj = args[0] if args else kwargs.get("obj")
+        key = cache.key(user, perm, obj) if cache is not None else None
+        if key is None:
+            return super().has_perm(user, perm, *args, **kwargs)
+
+        if key in cache.results:
+            cache.hits += 1
+            return cache.results[key]
+
+        cache.misses += 1
+        cache.remember(obj)
+        result = cache.results[key] = super().has_perm(user, perm, *args, **kwargs)
+        return result
+
+    async def ahas_perm(self, user, perm, *args, **kwargs):
+        # Cache hits never leave the event loop; predicates may query, so misses
+        # are evaluated in a thread
+        cache = _current_cache.get()
+        obj = args[0] if args else kwargs.get("obj")
+        key = cache.key(user, perm, obj) if cache is not None else None
+        if key is not None and key in cache.results:
+            cache.hits += 1
+            return cache.results[key]
+        return await sync_to_async(self.has_perm)(user, perm, *args, **kwargs)
+
+
+class PermissionCacheMiddleware:
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        if iscoroutinefunction(self.get_response):
+            markcoroutinefunction(self)
+
+    def __call__(self, request):
+        if iscoroutinefunction(self):
+            return self.__acall__(request)
+        request.permission_cache, token = activate()
+        try:
+            return self.get_response(request)
+        finally:
+            deactivate(token)
+
+    async def __acall__(self, request):
+        request.permission_cache, token = activate()
+        try:
+            return await self.get_response(request)
+        finally:
+            deactivate(token)
+
+
+@receiver(post_save)
+@receiver(post_delete)
+@receiver(m2m_changed)
+def clear_permission_cache(sender, **kwargs):
+    # Any write may change the outcome of a predicate, so drop everything
+    cache = _current_cache.get()
+    if cache is not None:
+        cache.clear()
@@ -0,0 +1,65 @@
+import logging
+import time
+
+from django.conf import settings
+from django.contrib.auth import BACKEND_SESSION_KEY, HASH_SESSION_KEY, SESSION_KEY
+from django.contrib.sessions.backends import cached_db
+
+logger = logging.getLogger(__name__)
+
+# [persisted at, *auth keys at that time], stored in the session itself
+PERSISTED_KEY = "_persisted"
+# Changes to these are written through to the database right away
+AUTH_KEYS = (SESSION_KEY, BACKEND_SESSION_KEY, HASH_SESSION_KEY, "_session_expiry")
+
+
+class SessionStore(cached_db.SessionStore):
+    """Cached database sessions that write the database behind the cache.
+
+    Requests read sessions from the cache, so with a shared cache (redis) no
+    request queries ``django_session`` unless the session was evicted. Saves
+    always update the cache; the database row only when the session is new,
+    logs in or out, changes its expiry, or was persisted more than
+    ``SESSION_PERSIST_SECONDS`` ago. An evicted session falls back to a row at
+    most that old.
+    """
+
+    cache_key_prefix = "app.sessions"
+
+    def auth_state(self):
+        return [self._session.get(key) for key in AUTH_KEYS]
+
+    def needs_persisting(self, must_create):
+        persisted = self._session.get(PERSISTED_KEY)
+        return (
+            must_create
+            or self.session_key is None
+            or persisted is None
+            or persisted[1:] != self.auth_state()
+            or time.time() - persisted[0] >= settings.SESSION_PERSIST_SECONDS
+        )
+
+    def mark_persisted(self):
+        self._session[PERSISTED_KEY] = [time.time(), *self.auth_state()]
+
+    def save(self, must_create=False):
+        if self.needs_persisting(must_create):
+            self.mark_persisted()
+            return super().save(must_create)
+        try:
+            self._cache.set(self.cache_key, self._session, self.get_expiry_age())
+        except Exception:
+            logger.exception("Error saving session to cache, writing it to the database")
+            self.mark_persisted()
+            super().save(must_create)
+
+    async def asave(self, must_create=False):
+        if self.needs_persisting(must_create):
+            self.mark_persisted()
+            return await super().asave(must_create)
+        try:
+            await self._cache.aset(await self.acache_key(), self._session, await self.aget_expiry_age())
+        except Exception:
+            logger.exception("Error saving session to cache, writing it to the database")
+            self.mark_persisted()
+            await super().asave(must_create)
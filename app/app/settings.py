@@ -4,6 +4,7 @@ Updated/Optimized version.
 """
 
 import os
+import sys
 from pathlib import Path
 
 # Funkcja pomocnicza do bezpiecznego pobierania sekretów
@@ -26,6 +27,8 @@ def get_secret(env_var_name: str, file_env_var_name: str = None, default: str =
     # 3. Zwróć wartość domyślną (tylko dla dev/build)
     return default
 
+TESTING = len(sys.argv) > 1 and sys.argv[1] == 'test'
+
 # Build paths inside the project like this: BASE_DIR / 'subdir'.
 BASE_DIR = Path(__file__).resolve().parent.parent
 
@@ -63,9 +66,13 @@ INSTALLED_APPS = [
     'games',
     'tables',
     "comments",
+    "stats",
+    "search",
+    "jobs",
     'csp', # Biblioteka django-csp
     "rules",
     "axes",
+    "app.apps.ProjectConfig",
 ]
 
 if DEBUG:
@@ -74,13 +81,20 @@ if DEBUG:
     ]
 
 MIDDLEWARE = [
+    'app.middleware.HealthCheckMiddleware',       # Sondy Kubernetesa omijają resztę middleware
+    'app.middleware.RequestTimingMiddleware',     # Pierwszy z pozostałych, żeby mierzyć cały czas żądania
+    'app.middleware.MetricsMiddleware',
+    'app.middleware.LoadSheddingMiddleware',      # Odrzuca nadmiar żądań zanim cokolwiek zrobią (liczone w metrykach)
     'django.middleware.security.SecurityMiddleware',
     'whitenoise.middleware.WhiteNoiseMiddleware', # Musi być zaraz po SecurityMiddleware
     'csp.middleware.CSPMiddleware',               # Musi być przed generowaniem HTML
+    'app.middleware.PrimaryPinningMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
     'django.middleware.common.CommonMiddleware',
     'django.middleware.csrf.CsrfViewMiddleware',
     'django.contrib.auth.middleware.AuthenticationMiddleware',
+    'app.permissions.PermissionCacheMiddleware',
+    'app.middleware.ThrottleMiddleware',          # Limity na IP i użytkownika, potrzebuje request.user
     # 'app.middleware.SecurityHeadersMiddleware', # UWAGA: Wyłącz to, jeśli używasz django-csp i ustawień SECURE_*, żeby nie dublować nagłówków
     'django.contrib.messages.middleware.MessageMiddleware',
     'django.middleware.clickjacking.XFrameOptionsMiddleware',
@@ -94,7 +108,9 @@ if DEBUG:
 
 AUTHENTICATION_BACKENDS = (
     'axes.backends.AxesStandaloneBackend',
-    'rules.permissions.ObjectPermissionBackend',
+    'app.permissions.CachedObjectPermissionBackend',
+    'app.auth_backends.CachedModelBackend',
+    # Sesje zalogowane przed CachedModelBackend wskazują na ten backend
     'django.contrib.auth.backends.ModelBackend',
 )
 
@@ -111,12 +127,18 @@ TEMPLATES = [
                 'django.contrib.auth.context_processors.auth',
                 'django.contrib.messages.context_processors.messages',
             ],
+            'libraries': {
+                'fragment_cache': 'app.templatetags.fragment_cache',
+            },
         },
     },
 ]
 
 WSGI_APPLICATION = 'app.wsgi.application'
 
+# Serwer aplikacji: wsgi albo asgi (ustawiane przez Helm z app.server i przez app/asgi.py)
+SERVER_MODE = os.environ.get('SERVER_MODE', 'wsgi')
+
 # Database
 # Skonsolidowana logika bazy danych
 DATABASES = {
@@ -126,9 +148,27 @@ DATABASES = {
         'NAME': os.environ.get('POSTGRES_DB'),
         'USER': os.environ.get('POSTGRES_USER'),
         'PASSWORD': get_secret("POSTGRES_PASSWORD", "POSTGRES_PASSWORD_FILE"),
+        # Trwałe połączenia: worker łączy się przy starcie (gunicorn.conf.py), a nie przy pierwszym żądaniu.
+        # Pod ASGI zawsze 0: każdy wątek sync_to_async trzyma własne połączenie, którego koniec
+        # żądania nie zamyka, więc trwałe połączenia rosłyby aż do limitu Postgresa
+        'CONN_MAX_AGE': 0 if SERVER_MODE == 'asgi' else int(os.environ.get('DB_CONN_MAX_AGE', 60)),
+        'CONN_HEALTH_CHECKS': True,
     }
 }
 
+# Lokalnie (testy, praca bez dockera) bez Postgresa używamy SQLite
+if DEBUG and not os.environ.get('POSTGRES_HOST'):
+    DATABASES['default'] = {
+        'ENGINE': 'django.db.backends.sqlite3',
+        'NAME': BASE_DIR / 'db.sqlite3',
+    }
+    # Testy routera potrzebują drugiej, niezależnej bazy udającej replikę
+    if TESTING:
+        DATABASES['replica'] = {
+            'ENGINE': 'django.db.backends.sqlite3',
+            'NAME': BASE_DIR / 'db_replica.sqlite3',
+        }
+
 # Dodaj replikę tylko na prawdziwej produkcji, jeśli zdefiniowano host
 IS_REAL_PRODUCTION = not DEBUG and os.environ.get('CI') != 'true'
 REPLICA_HOST = os.environ.get('POSTGRES_HOST_REPLICA')
@@ -136,9 +176,117 @@ REPLICA_HOST = os.environ.get('POSTGRES_HOST_REPLICA')
 if IS_REAL_PRODUCTION and REPLICA_HOST:
     DATABASES['replica'] = DATABASES['default'].copy()
     DATABASES['replica']['HOST'] = REPLICA_HOST
+    # Sprawdzenie opóźnienia repliki odbywa się w trakcie żądania, więc nie może czekać długo
+    DATABASES['replica']['OPTIONS'] = {'connect_timeout': int(os.environ.get('REPLICA_CONNECT_TIMEOUT', 2))}
     # Router używamy tylko gdy mamy replikę
     DATABASE_ROUTERS = ['app.db_router.PrimaryReplicaRouter']
 
+# Read-your-writes: po zapisie użytkownik czyta z primary przez tyle sekund
+REPLICA_PIN_SECONDS = int(os.environ.get('REPLICA_PIN_SECONDS', 10))
+# Replika z większym opóźnieniem jest pomijana; wynik sprawdzenia trzymamy w pamięci
+REPLICA_MAX_LAG_SECONDS = float(os.environ.get('REPLICA_MAX_LAG_SECONDS', 5))
+REPLICA_HEALTH_CHECK_INTERVAL = float(os.environ.get('REPLICA_HEALTH_CHECK_INTERVAL', 10))
+# Limit czasu zapytania o opóźnienie repliki (ms); przekroczenie traktujemy jak opóźnienie
+REPLICA_PROBE_TIMEOUT_MS = int(os.environ.get('REPLICA_PROBE_TIMEOUT_MS', 500))
+
+
+# Cache
+# CACHE_BACKEND: locmem (domyślnie, osobny dla każdego procesu), file (np. w testach
+# lub na wspólnym wolumenie) albo redis (współdzielony między workerami i podami)
+CACHE_BACKENDS = {
+    'locmem': 'django.core.cache.backends.locmem.LocMemCache',
+    'file': 'django.core.cache.backends.filebased.FileBasedCache',
+    'redis': 'django.core.cache.backends.redis.RedisCache',
+}
+CACHE_DEFAULT_LOCATIONS = {
+    'locmem': 'pokero',
+    'file': '/tmp/pokero-cache',
+    'redis': 'redis://localhost:6379/0',
+}
+CACHE_BACKEND = os.environ.get('CACHE_BACKEND', 'locmem')
+CACHES = {
+    'default': {
+        'BACKEND': CACHE_BACKENDS[CACHE_BACKEND],
+        'LOCATION': os.environ.get('CACHE_LOCATION', CACHE_DEFAULT_LOCATIONS[CACHE_BACKEND]),
+    },
+}
+# Cache wspólny dla workerów (i podów, jeśli redis): tylko wtedy sesje i użytkownicy
+# mogą być czytani z cache, bo wylogowanie czy zmiana hasła muszą być widoczne wszędzie
+SHARED_CACHE = CACHE_BACKEND != 'locmem'
+if SHARED_CACHE:
+    # Sesje czytane z cache; wiersz w django_session zapisywany najwyżej co SESSION_PERSIST_SECONDS
+    SESSION_ENGINE = 'app.sessions'
+SESSION_PERSIST_SECONDS = int(os.environ.get('SESSION_PERSIST_SECONDS', 60))
+# Użytkownik z sesji (AuthenticationMiddleware) czytany z cache; 0 wyłącza
+USER_CACHE_ALIAS = 'default'
+USER_CACHE_SECONDS = int(os.environ.get('USER_CACHE_SECONDS', 300 if SHARED_CACHE else 0))
+
+# Fragmenty stron (wiersze listy stołów, gry, komentarze) - klucze zawierają Table.version
+FRAGMENT_CACHE_ALIAS = 'default'
+FRAGMENT_CACHE_TIMEOUT = int(os.environ.get('FRAGMENT_CACHE_TIMEOUT', 60 * 60))
+# Rozliczenie stołu (bilanse i przelewy) - klucz zawiera Table.version
+SETTLEMENT_CACHE_ALIAS = 'default'
+SETTLEMENT_CACHE_TIMEOUT = int(os.environ.get('SETTLEMENT_CACHE_TIMEOUT', 60 * 60))
+
+# Natywne widoki async dla stron tylko do odczytu; app/asgi.py włącza je domyślnie
+ASYNC_READ_VIEWS = os.environ.get('ASYNC_READ_VIEWS', 'false').lower() == 'true'
+# Sztuczne opóźnienie każdego zapytania (ms) - tylko do benchmarków
+SIMULATED_DB_LATENCY_MS = int(os.environ.get('SIMULATED_DB_LATENCY_MS', 0))
+
+# Pomiar czasu żądań (nagłówek Server-Timing + linia logu JSON) dla takiej części żądań;
+# wolniejsze niż REQUEST_TIMING_SLOW_MS logują też wszystkie zapytania SQL
+REQUEST_TIMING_SAMPLE_RATE = float(os.environ.get('REQUEST_TIMING_SAMPLE_RATE', 1.0))
+REQUEST_TIMING_SLOW_MS = float(os.environ.get('REQUEST_TIMING_SLOW_MS', 500))
+# Linia logu INFO dla każdego mierzonego żądania; w testach wyłączona, żeby nie zasłaniała błędów
+REQUEST_TIMING_LOG = os.environ.get('REQUEST_TIMING_LOG', 'false' if TESTING else 'true').lower() == 'true'
+
+# Metryki Prometheusa pod /metrics. Z gunicornem ustaw PROMETHEUS_MULTIPROC_DIR (patrz
+# gunicorn.conf.py), wtedy każdy worker zwraca sumę ze wszystkich workerów
+PROMETHEUS_MULTIPROC_DIR = os.environ.get('PROMETHEUS_MULTIPROC_DIR')
+
+# Sonda gotowości (/readyz) sprawdza wszystkie bazy z limitem czasu i trzyma wynik przez
+# kilka sekund; gdy istnieje READINESS_DRAIN_FILE (tworzy go preStop), pod jest wygaszany
+READINESS_TIMEOUT_SECONDS = float(os.environ.get('READINESS_TIMEOUT_SECONDS', 1))
+READINESS_CACHE_SECONDS = float(os.environ.get('READINESS_CACHE_SECONDS', 5))
+READINESS_DRAIN_FILE = os.environ.get('READINESS_DRAIN_FILE', '/tmp/pokero-draining')
+
+# Limity żądań (token bucket, 429 + Retry-After): na adres IP dla wszystkich i na
+# użytkownika dla zalogowanych; RATE żądań na sekundę, BURST naraz. Liczniki w cache
+# THROTTLE_CACHE_ALIAS - wspólne dla podów tylko z redisem, z locmem osobne na worker
+THROTTLE_ENABLED = os.environ.get('THROTTLE_ENABLED', 'true').lower() == 'true' and not TESTING
+THROTTLE_CACHE_ALIAS = 'default'
+THROTTLE_IP_RATE = float(os.environ.get('THROTTLE_IP_RATE', 20))
+THROTTLE_IP_BURST = int(os.environ.get('THROTTLE_IP_BURST', 200))
+THROTTLE_USER_RATE = float(os.environ.get('THROTTLE_USER_RATE', 5))
+THROTTLE_USER_BURST = int(os.environ.get('THROTTLE_USER_BURST', 50))
+
+# Zrzucanie obciążenia (503 + Retry-After) w każdym workerze: najwyżej
+# LOAD_SHED_MAX_IN_FLIGHT żądań naraz (0 - bez limitu), a gdy przez cały
+# LOAD_SHED_INTERVAL_MS żądania czekały w kolejce dłużej niż LOAD_SHED_QUEUE_TARGET_MS
+# (nagłówek X-Request-Start z ingressu), odrzucane są te, które czekały dłużej
+LOAD_SHED_MAX_IN_FLIGHT = int(os.environ.get('LOAD_SHED_MAX_IN_FLIGHT', 50))
+LOAD_SHED_QUEUE_TARGET_MS = float(os.environ.get('LOAD_SHED_QUEUE_TARGET_MS', 200))
+LOAD_SHED_INTERVAL_MS = float(os.environ.get('LOAD_SHED_INTERVAL_MS', 1000))
+LOAD_SHED_RETRY_AFTER_SECONDS = int(os.environ.get('LOAD_SHED_RETRY_AFTER_SECONDS', 2))
+
+# Zadania w tle (django.tasks) zapisywane w tabeli jobs_job i wykonywane przez
+# `manage.py run_worker`; w testach trzymane w pamięci do MemoryBackend.run_pending()
+TASKS = {
+    'default': {
+        'BACKEND': 'jobs.backends.MemoryBackend' if TESTING else 'jobs.backends.DatabaseBackend',
+    },
+}
+TASK_WORKER_CONCURRENCY = int(os.environ.get('TASK_WORKER_CONCURRENCY', 4))
+TASK_POLL_SECONDS = float(os.environ.get('TASK_POLL_SECONDS', 1))
+# Nieudane zadanie wraca do kolejki po 2, 4, 8... s (z losowym rozrzutem, najwyżej
+# TASK_RETRY_MAX_DELAY_SECONDS), po TASK_MAX_ATTEMPTS próbach zostaje FAILED
+TASK_MAX_ATTEMPTS = int(os.environ.get('TASK_MAX_ATTEMPTS', 5))
+TASK_RETRY_BACKOFF_SECONDS = float(os.environ.get('TASK_RETRY_BACKOFF_SECONDS', 2))
+TASK_RETRY_MAX_DELAY_SECONDS = float(os.environ.get('TASK_RETRY_MAX_DELAY_SECONDS', 600))
+# Zadanie RUNNING dłużej niż to (worker zginął) wraca do kolejki
+TASK_LEASE_SECONDS = float(os.environ.get('TASK_LEASE_SECONDS', 600))
+# Jak długo trzymać zakończone zadania
+TASK_KEEP_SECONDS = float(os.environ.get('TASK_KEEP_SECONDS', 7 * 24 * 60 * 60))
 
 # Password validation
 AUTH_PASSWORD_VALIDATORS = [
@@ -173,6 +321,10 @@ STORAGES = {
     },
 }
 
+# Testy nie uruchamiają collectstatic, więc manifest nie istnieje
+if TESTING:
+    STORAGES["staticfiles"]["BACKEND"] = "django.contrib.staticfiles.storage.StaticFilesStorage"
+
 DEFAULT_AUTO_FIELD = 'django.db.models.BigAutoField'
 TAILWIND_APP_NAME = "theme"
 
@@ -187,6 +339,8 @@ if not DEBUG:
     SECURE_HSTS_SECONDS = 31536000
     SECURE_HSTS_INCLUDE_SUBDOMAINS = True
     SECURE_PROXY_SSL_HEADER = ('HTTP_X_FORWARDED_PROTO', 'https')
+    # Prometheus pobiera metryki bezpośrednio z poda po HTTP
+    SECURE_REDIRECT_EXEMPT = [r'^metrics$']
 
     # Wyjątki dla CI/CD
     if os.environ.get('CI') == 'true':
@@ -273,5 +427,10 @@ LOGGING = {
             'level': 'INFO',
             'propagate': False,
         },
+        'jobs': {
+            'handlers': ['console'],
+            'level': 'INFO',
+            'propagate': False,
+        },
     },
 }
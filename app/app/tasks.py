@@ -0,0 +1,10 @@
+import logging
+
+from django.tasks import task
+
+logger = logging.getLogger(__name__)
+
+
+@task
+def log_registration(username):
+    logger.warning(f"New user registered: {username}")
@@ -0,0 +1,55 @@
+from django import template
+
+from app import fragment_cache
+
+register = template.Library()
+
+
+class FragmentCacheNode(template.Node):
+    def __init__(self, nodelist, fragment_name, vary_on, viewer):
+        self.nodelist = nodelist
+        self.fragment_name = fragment_name
+        self.vary_on = vary_on
+        self.viewer = viewer
+
+    def render(self, context):
+        vary_on = [var.resolve(context) for var in self.vary_on]
+        if self.viewer is not None:
+            # Fragments with per-user buttons embed CSRF tokens, so they must also
+            # vary on the viewer's CSRF secret, which changes on login
+            request = context.get("request")
+            csrf_secret = request.META.get("CSRF_COOKIE") if request is not None else None
+            vary_on += [self.viewer.resolve(context).pk, csrf_secret]
+
+        return fragment_cache.get_or_render(
+            self.fragment_name, vary_on, lambda: self.nodelist.render(context)
+        )
+
+
+@register.tag("fragment_cache")
+def do_fragment_cache(parser, token):
+    """
+    Cache a template fragment until one of the ``vary_on`` values changes::
+
+        {% fragment_cache "table_games" table.pk table.version viewer=user %}
+            ...
+        {% endfragment_cache %}
+
+    Pass ``viewer`` when the fragment renders permission-dependent buttons.
+    """
+    nodelist = parser.parse(("endfragment_cache",))
+    parser.delete_first_token()
+
+    bits = token.split_contents()
+    if len(bits) < 2:
+        raise template.TemplateSyntaxError(f"'{bits[0]}' tag requires a fragment name")
+
+    fragment_name = bits[1].strip("\"'")
+    viewer = None
+    vary_on = []
+    for bit in bits[2:]:
+        if bit.startswith("viewer="):
+            viewer = parser.compile_filter(bit.removeprefix("viewer="))
+        else:
+            vary_on.append(parser.compile_filter(bit))
+    return FragmentCacheNode(nodelist, fragment_name, vary_on, viewer)
@@ -0,0 +1,456 @@
+import io
+import json
+import os
+import subprocess
+import sys
+import tempfile
+import time
+from unittest import mock
+
+from django.contrib.auth import SESSION_KEY
+from django.contrib.auth.models import Group, Permission, User
+from django.contrib.sessions.models import Session
+from django.conf import settings
+from django.core.cache import cache
+from django.core.management import call_command
+from django.db import OperationalError, connection
+from django.template import engines
+from django.test import TestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+
+from tables.models import Table
+
+from prometheus_client import REGISTRY
+
+from . import auth_backends, db_router, health, instrumentation, metrics, throttling, warmup
+from .db_router import PrimaryReplicaRouter
+from .middleware import PrimaryPinningMiddleware
+from .sessions import SessionStore
+
+
+@override_settings(
+    DATABASE_ROUTERS=["app.db_router.PrimaryReplicaRouter"],
+    REPLICA_PIN_SECONDS=30,
+    REPLICA_MAX_LAG_SECONDS=5,
+    REPLICA_HEALTH_CHECK_INTERVAL=60,
+)
+class PrimaryReplicaRouterTests(TestCase):
+    # Two separate SQLite databases: nothing written to "default" ever shows up
+    # on "replica", like a replica that has not caught up yet.
+    databases = {"default", "replica"}
+
+    def setUp(self):
+        PrimaryReplicaRouter._health_checked_at = None
+        PrimaryReplicaRouter._replica_healthy = True
+        self.user = User.objects.create_user("dealer", password="x")
+
+    def test_request_reads_primary_after_its_own_write(self):
+        token = db_router.begin_request()
+        try:
+            self.assertFalse(Table.objects.exists())
+            Table.objects.create(name="fresh", dealer=self.user, creator=self.user)
+            self.assertTrue(Table.objects.exists())
+        finally:
+            db_router.end_request(token)
+
+        token = db_router.begin_request()
+        try:
+            self.assertFalse(Table.objects.exists())
+        finally:
+            db_router.end_request(token)
+
+    def test_writes_outside_requests_pin_nothing(self):
+        Table.objects.create(name="fresh", dealer=self.user, creator=self.user)
+        self.assertIsNone(db_router._routing_state.get())
+        self.assertEqual(PrimaryReplicaRouter().db_for_read(Table), "replica")
+
+    def test_cookie_pins_following_requests(self):
+        # The user was replicated long ago, the session about to be created is not
+        self.user.save(using="replica")
+
+        response = self.client.post(reverse("login"), {"username": "dealer", "password": "x"})
+        self.assertEqual(response.status_code, 302)
+        self.assertIn(PrimaryPinningMiddleware.cookie_name, response.cookies)
+
+        response = self.client.get(reverse("tables_list_view"))
+        self.assertEqual(response.status_code, 200)
+
+        del self.client.cookies[PrimaryPinningMiddleware.cookie_name]
+        response = self.client.get(reverse("tables_list_view"))
+        self.assertEqual(response.status_code, 302)
+
+    def test_lagging_replica_is_skipped_and_probe_is_cached(self):
+        router = PrimaryReplicaRouter()
+        token = db_router.begin_request()
+        self.addCleanup(db_router.end_request, token)
+
+        with mock.patch.object(PrimaryReplicaRouter, "probe_lag", return_value=60) as probe:
+            self.assertEqual(router.db_for_read(Table), "default")
+            self.assertEqual(router.db_for_read(Table), "default")
+        self.assertEqual(probe.call_count, 1)
+
+        PrimaryReplicaRouter._health_checked_at = None
+        with mock.patch.object(PrimaryReplicaRouter, "probe_lag", return_value=1):
+            self.assertEqual(router.db_for_read(Table), "replica")
+
+    def test_timed_out_probe_counts_as_lagging(self):
+        router = PrimaryReplicaRouter()
+        token = db_router.begin_request()
+        self.addCleanup(db_router.end_request, token)
+
+        timeout = OperationalError("canceling statement due to statement timeout")
+        with mock.patch.object(PrimaryReplicaRouter, "probe_lag", side_effect=timeout):
+            self.assertEqual(router.db_for_read(Table), "default")
+
+    @override_settings(SESSION_ENGINE="app.sessions", USER_CACHE_SECONDS=300)
+    def test_cached_user_miss_reads_primary_without_pinning(self):
+        cache.clear()
+        token = db_router.begin_request()
+        user = auth_backends.CachedModelBackend().get_user(self.user.pk)
+        state = db_router.end_request(token)
+        self.assertEqual(user, self.user)
+        self.assertFalse(state["wrote"])
+
+        cache.clear()
+        self.client.force_login(self.user)
+        cache.delete(auth_backends.user_cache_key(self.user.pk))
+        response = self.client.get(reverse("tables_list_view"))
+        self.assertEqual(response.status_code, 200)
+        self.assertNotIn(PrimaryPinningMiddleware.cookie_name, response.cookies)
+
+
+@override_settings(REQUEST_TIMING_LOG=True)
+class RequestTimingMiddlewareTests(TestCase):
+    def setUp(self):
+        self.user = User.objects.create_user("player", password="x")
+        self.table = Table.objects.create(name="t", dealer=self.user, creator=self.user)
+        self.client.force_login(self.user)
+        cache.clear()
+        # The test database connection was opened before any middleware was loaded
+        instrumentation.install()
+
+    def get_timed(self, url):
+        with self.assertLogs("app.middleware") as logs:
+            response = self.client.get(url)
+        return response, json.loads(logs.records[-1].getMessage())
+
+    def test_server_timing_header_and_log_line(self):
+        response, line = self.get_timed(reverse("table_object_view", args=[self.table.pk]))
+
+        metrics = {part.split(";")[0] for part in response["Server-Timing"].split(", ")}
+        self.assertLessEqual({"total", "view", "render", "db-default", "cache"}, metrics)
+        self.assertEqual(line["view"], "table_object_view")
+        self.assertEqual(line["status"], 200)
+        self.assertGreater(line["db"]["default"]["queries"], 0)
+        self.assertGreater(line["cache"]["misses"], 0)
+        self.assertNotIn("queries", line)
+
+    @override_settings(REQUEST_TIMING_SLOW_MS=0)
+    def test_slow_request_logs_its_queries(self):
+        with self.assertLogs("app.middleware", "WARNING") as logs:
+            self.client.get(reverse("table_object_view", args=[self.table.pk]))
+        line = json.loads(logs.records[-1].getMessage())
+        self.assertEqual(len(line["queries"]), line["db"]["default"]["queries"])
+        self.assertTrue(all(query["sql"] for query in line["queries"]))
+
+    @override_settings(REQUEST_TIMING_SAMPLE_RATE=0)
+    def test_unsampled_requests_are_not_timed(self):
+        response = self.client.get(reverse("table_object_view", args=[self.table.pk]))
+        self.assertNotIn("Server-Timing", response)
+
+    async def test_counts_queries_run_in_threads_under_asgi(self):
+        await self.async_client.aforce_login(self.user)
+        with self.assertLogs("app.middleware") as logs:
+            response = await self.async_client.get(reverse("table_object_view", args=[self.table.pk]))
+        self.assertIn("db-default", response["Server-Timing"])
+        self.assertGreater(json.loads(logs.records[-1].getMessage())["db"]["default"]["queries"], 0)
+
+
+class MetricsTests(TestCase):
+    def setUp(self):
+        self.user = User.objects.create_user("player", password="x")
+        self.table = Table.objects.create(name="t", dealer=self.user, creator=self.user)
+        self.client.force_login(self.user)
+
+    def sample(self, name, **labels):
+        return REGISTRY.get_sample_value(name, labels) or 0
+
+    def test_requests_are_counted_per_url_name(self):
+        labels = {"view": "table_object_view", "method": "GET"}
+        responses = self.sample("pokero_http_responses_total", status="200", **labels)
+        queries = self.sample("pokero_http_request_db_queries_count", view="table_object_view")
+
+        self.client.get(reverse("table_object_view", args=[self.table.pk]))
+
+        self.assertEqual(self.sample("pokero_http_responses_total", status="200", **labels), responses + 1)
+        self.assertEqual(self.sample("pokero_http_request_db_queries_count", view="table_object_view"), queries + 1)
+        self.assertGreater(self.sample("pokero_db_query_duration_seconds_count", alias="default"), 0)
+
+        body = self.client.get(reverse("metrics")).content.decode()
+        self.assertIn('pokero_http_request_duration_seconds_bucket{le="0.005",method="GET",view="table_object_view"}', body)
+
+    def test_not_served_through_the_ingress(self):
+        response = self.client.get(reverse("metrics"), HTTP_X_FORWARDED_FOR="203.0.113.7")
+        self.assertEqual(response.status_code, 404)
+
+    def test_failed_logins_are_counted(self):
+        before = self.sample("pokero_login_failures_total")
+        self.client.post(reverse("login"), {"username": "player", "password": "wrong"})
+        self.assertEqual(self.sample("pokero_login_failures_total"), before + 1)
+
+    @override_settings(DATABASE_ROUTERS=["app.db_router.PrimaryReplicaRouter"])
+    def test_router_decisions_are_counted(self):
+        PrimaryReplicaRouter._health_checked_at = None
+        with mock.patch.object(PrimaryReplicaRouter, "probe_lag", return_value=0):
+            reads = self.sample("pokero_db_routing_total", operation="read", alias="replica")
+            writes = self.sample("pokero_db_routing_total", operation="write", alias="default")
+            token = db_router.begin_request()
+            PrimaryReplicaRouter().db_for_read(Table)
+            PrimaryReplicaRouter().db_for_write(Table)
+            db_router.end_request(token)
+
+        self.assertEqual(self.sample("pokero_db_routing_total", operation="read", alias="replica"), reads + 1)
+        self.assertEqual(self.sample("pokero_db_routing_total", operation="write", alias="default"), writes + 1)
+
+    def test_workers_are_summed_in_multiprocess_mode(self):
+        # Like two gunicorn workers: separate processes writing to one directory
+        script = "import django; django.setup(); from app import metrics; metrics.LOCKOUTS.inc(); metrics.LOCKOUTS.inc()"
+        with tempfile.TemporaryDirectory() as path:
+            env = {**os.environ, "PROMETHEUS_MULTIPROC_DIR": path, "DJANGO_SETTINGS_MODULE": "app.settings"}
+            for _ in range(2):
+                subprocess.run([sys.executable, "-c", script], env=env, check=True, cwd=settings.BASE_DIR)
+            content, _ = metrics.render(path)
+
+        self.assertIn("pokero_axes_lockouts_total 4.0", content.decode())
+
+
+
+class WarmupTests(TestCase):
+    def test_compiles_templates_without_touching_the_database(self):
+        with self.assertNumQueries(0):
+            counts = warmup.warm_up()
+
+        self.assertGreater(counts["routes"], 0)
+        self.assertGreater(counts["templates"], 0)
+        # The cached loader keeps compiled templates by name
+        loader = engines["django"].engine.template_loaders[0]
+        self.assertIn("tables/table_list.html", loader.get_template_cache)
+
+    def test_startup_time_reports_phases(self):
+        with tempfile.TemporaryDirectory() as directory:
+            output = os.path.join(directory, "startup.json")
+            call_command("startup_time", "--runs", "1", "--output", output, stdout=io.StringIO())
+            with open(output) as report:
+                result = json.load(report)
+
+        self.assertEqual(result["status"], 200)
+        self.assertEqual(
+            list(result["phases_ms"]),
+            ["import_django", "load_app", "warm_up", "connect_databases", "first_request", "second_request"],
+        )
+        self.assertIn("django", result["imports_ms"])
+
+
+@override_settings(READINESS_CACHE_SECONDS=60, READINESS_TIMEOUT_SECONDS=1)
+class HealthCheckTests(TestCase):
+    databases = {"default", "replica"}
+
+    def setUp(self):
+        health._cached = None
+        self.addCleanup(setattr, health, "_cached", None)
+
+    def test_liveness_skips_database_sessions_and_templates(self):
+        with self.assertNumQueries(0), mock.patch("django.template.loader.get_template") as get_template:
+            response = self.client.get("/healthz", HTTP_HOST="10.0.0.1:8000")
+
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.content, b"ok")
+        get_template.assert_not_called()
+        self.assertNotIn("Content-Security-Policy", response)
+        self.assertFalse(response.cookies)
+
+    def test_readiness_checks_every_database_and_caches_the_result(self):
+        with mock.patch.object(health, "check_database", wraps=health.check_database) as check:
+            response = self.client.get("/readyz")
+            self.client.get("/readyz")
+
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.json(), {"status": "ok", "databases": {"default": "ok", "replica": "ok"}})
+        self.assertEqual(sorted(call.args[0] for call in check.call_args_list), ["default", "replica"])
+
+    @override_settings(READINESS_TIMEOUT_SECONDS=0.05)
+    def test_slow_database_is_not_ready(self):
+        def check(alias):
+            if alias == "replica":
+                time.sleep(0.5)
+
+        with mock.patch.object(health, "check_database", side_effect=check):
+            response = self.client.get("/readyz")
+
+        self.assertEqual(response.status_code, 503)
+        self.assertEqual(response.json()["databases"], {"default": "ok", "replica": "timeout"})
+
+    async def test_async_readiness(self):
+        with mock.patch.object(health, "check_database"):
+            response = await self.async_client.get("/readyz")
+
+        self.assertEqual(response.status_code, 200)
+
+    def test_draining(self):
+        with tempfile.NamedTemporaryFile() as drain_file, override_settings(READINESS_DRAIN_FILE=drain_file.name):
+            response = self.client.get("/readyz")
+        self.assertEqual(response.status_code, 503)
+        self.assertEqual(response.json(), {"status": "draining"})
+
+
+@override_settings(SESSION_ENGINE="app.sessions", USER_CACHE_SECONDS=300, SESSION_PERSIST_SECONDS=60)
+class CachedSessionTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.user = User.objects.create_user("dealer", password="x")
+        self.client.force_login(self.user)
+
+    def auth_queries(self):
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get(reverse("tables_list_view"))
+        return response, [
+            query["sql"] for query in queries.captured_queries
+            if "django_session" in query["sql"] or query["sql"].startswith('SELECT "auth_user"')
+        ]
+
+    def test_authenticated_request_reads_session_and_user_from_cache(self):
+        self.auth_queries()
+        response, queries = self.auth_queries()
+
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(queries, [])
+
+    def test_changes_are_written_behind(self):
+        store = SessionStore()
+        store["step"] = 1
+        store.save()
+        store["step"] = 2
+        store.save()
+
+        row = Session.objects.get(session_key=store.session_key)
+        self.assertEqual(row.get_decoded()["step"], 1)
+        self.assertEqual(SessionStore(store.session_key)["step"], 2)
+
+        with override_settings(SESSION_PERSIST_SECONDS=0):
+            store.save()
+        self.assertEqual(Session.objects.get(session_key=store.session_key).get_decoded()["step"], 2)
+
+    def test_logout_is_written_through(self):
+        session_key = self.client.session.session_key
+        self.client.logout()
+
+        self.assertFalse(Session.objects.filter(session_key=session_key).exists())
+        self.assertNotIn(SESSION_KEY, SessionStore(session_key))
+
+    def test_password_change_ends_cached_sessions(self):
+        self.auth_queries()
+        self.user.set_password("changed")
+        self.user.save()
+
+        response, _ = self.auth_queries()
+        self.assertEqual(response.status_code, 302)
+
+    def test_permission_change_drops_cached_user(self):
+        self.auth_queries()
+        self.assertIsNotNone(cache.get(auth_backends.user_cache_key(self.user.pk)))
+
+        self.user.user_permissions.add(Permission.objects.get(codename="add_table"))
+        self.assertIsNone(cache.get(auth_backends.user_cache_key(self.user.pk)))
+
+        self.auth_queries()
+        Group.objects.create(name="dealers").user_set.add(self.user)
+        self.assertIsNone(cache.get(auth_backends.user_cache_key(self.user.pk)))
+
+
+@override_settings(
+    THROTTLE_ENABLED=True, THROTTLE_IP_RATE=1, THROTTLE_IP_BURST=5, THROTTLE_USER_RATE=1, THROTTLE_USER_BURST=2
+)
+class ThrottleTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.user = User.objects.create_user("dealer", password="x")
+
+    def statuses(self, count, **extra):
+        return [self.client.get(reverse("tables_list_view"), **extra).status_code for _ in range(count)]
+
+    def test_user_bucket(self):
+        self.client.force_login(self.user)
+
+        self.assertEqual(self.statuses(3), [200, 200, 429])
+        response = self.client.get(reverse("tables_list_view"))
+        self.assertEqual(response["Retry-After"], "1")
+        self.assertEqual(response["Cache-Control"], "no-store")
+        self.assertGreater(REGISTRY.get_sample_value("pokero_throttled_requests_total", {"limit": "user"}), 0)
+
+    def test_ip_bucket_uses_the_address_added_by_the_ingress(self):
+        self.assertEqual(self.statuses(6, HTTP_X_FORWARDED_FOR="1.1.1.1, 10.0.0.1"), [302] * 5 + [429])
+        # Spoofing the first X-Forwarded-For entry doesn't reset the limit
+        self.assertEqual(self.statuses(1, HTTP_X_FORWARDED_FOR="2.2.2.2, 10.0.0.1"), [429])
+        self.assertEqual(self.statuses(1, HTTP_X_FORWARDED_FOR="10.0.0.2"), [302])
+
+    async def test_async_user_bucket(self):
+        await self.async_client.aforce_login(self.user)
+        statuses = [(await self.async_client.get(reverse("tables_list_view"))).status_code for _ in range(3)]
+
+        self.assertEqual(statuses, [200, 200, 429])
+
+    def test_bucket_refills(self):
+        key = "throttle:test"
+        self.assertEqual([throttling.take_token(key, 2, 2, now=100) for _ in range(2)], [0, 0])
+        self.assertAlmostEqual(throttling.take_token(key, 2, 2, now=100), 0.5)
+        self.assertEqual(throttling.take_token(key, 2, 2, now=100.5), 0)
+        self.assertAlmostEqual(throttling.take_token(key, 2, 2, now=100.5), 0.5)
+
+    def test_probes_and_static_files_are_exempt(self):
+        statuses = [self.client.get("/healthz").status_code for _ in range(10)]
+        statuses += [self.client.get(settings.STATIC_URL + "missing.css").status_code for _ in range(10)]
+
+        self.assertNotIn(429, statuses)
+
+
+class LoadSheddingTests(TestCase):
+    def test_in_flight_cap(self):
+        shedder = throttling.LoadShedder(max_in_flight=2, target=0.1, interval=1)
+
+        self.assertEqual([shedder.admit(None) for _ in range(3)], [None, None, "in_flight"])
+        shedder.release()
+        self.assertIsNone(shedder.admit(None))
+
+    def test_sheds_only_after_a_whole_interval_of_queueing(self):
+        shedder = throttling.LoadShedder(max_in_flight=0, target=0.1, interval=1)
+
+        # A burst that drains within the interval
+        self.assertEqual([shedder.admit(queued, now=now) for queued, now in [(0.5, 0), (0.01, 0.5)]], [None, None])
+        self.assertIsNone(shedder.admit(0.5, now=1.0))
+        # Every request of [1, 2) queued longer than the target
+        self.assertIsNone(shedder.admit(0.3, now=1.5))
+        self.assertEqual(shedder.admit(0.3, now=2.0), "queue")
+        # Short waits still get through, and once they do for an interval shedding stops
+        self.assertIsNone(shedder.admit(0.01, now=2.5))
+        self.assertIsNone(shedder.admit(0.3, now=3.0))
+
+    def test_queue_time_from_the_ingress_header(self):
+        now = 1_700_000_000.0
+        for header in ("t=1699999999.75", "1699999999750", "1699999999750000"):
+            request = mock.Mock(META={"HTTP_X_REQUEST_START": header})
+            self.assertAlmostEqual(throttling.queue_seconds(request, now=now), 0.25, places=3)
+        self.assertIsNone(throttling.queue_seconds(mock.Mock(META={"HTTP_X_REQUEST_START": "soon"})))
+
+    @override_settings(LOAD_SHED_QUEUE_TARGET_MS=100, LOAD_SHED_INTERVAL_MS=200)
+    def test_shed_response(self):
+        started = f"t={time.time() - 5:.3f}"
+        self.assertEqual(self.client.get("/", HTTP_X_REQUEST_START=started).status_code, 200)
+        time.sleep(0.25)
+        response = self.client.get("/", HTTP_X_REQUEST_START=started)
+
+        self.assertEqual(response.status_code, 503)
+        self.assertEqual(response["Retry-After"], "2")
+        self.assertGreater(REGISTRY.get_sample_value("pokero_shed_requests_total", {"reason": "queue"}), 0)
+        # Probes still answer
+        self.assertEqual(self.client.get("/healthz", HTTP_X_REQUEST_START=started).status_code, 200)
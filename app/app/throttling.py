@@ -0,0 +1,145 @@
+import logging
+import math
+import re
+import threading
+import time
+
+from django.conf import settings
+from django.core.cache import caches
+from django.http import HttpResponse
+
+logger = logging.getLogger(__name__)
+
+# X-Request-Start as set by the ingress ("t=<seconds>" with nginx's $msec), also
+# accepted in milliseconds or microseconds since the epoch
+REQUEST_START = re.compile(r"^(?:t=)?(\d+(?:\.\d+)?)$")
+
+
+def is_exempt(request):
+    """Static files and Prometheus scrapes are never throttled or shed."""
+    return request.path.startswith(settings.STATIC_URL) or request.path == "/metrics"
+
+
+def refusal(status, retry_after):
+    response = HttpResponse(
+        "Too many requests, retry later." if status == 429 else "Server busy, retry later.",
+        status=status,
+        content_type="text/plain",
+    )
+    response["Retry-After"] = str(max(math.ceil(retry_after), 1))
+    response["Cache-Control"] = "no-store"
+    # Counted in metrics; an error line for every refused request would flood the logs
+    response._has_been_logged = True
+    return response
+
+
+def client_ip(request):
+    """The address the ingress saw the request come from.
+
+    The ingress appends it to X-Forwarded-For; everything before it is
+    whatever the client claims, so only the last entry is used.
+    """
+    forwarded = request.META.get("HTTP_X_FORWARDED_FOR")
+    if forwarded:
+        return forwarded.rsplit(",", 1)[-1].strip()
+    return request.META.get("REMOTE_ADDR", "")
+
+
+def take_token(key, rate, burst, now=None):
+    """Take a token from the bucket ``key`` refilling ``rate`` tokens per second up to ``burst``.
+
+    Returns 0 when the request may go on, otherwise the seconds until the
+    next token. The bucket is a single timestamp in the throttle cache (GCRA):
+    the time it will be full again. Two workers updating the same bucket at
+    the same moment can both pass, which lets a few extra requests through
+    but never blocks one wrongly.
+    """
+    cache = caches[settings.THROTTLE_CACHE_ALIAS]
+    now = time.time() if now is None else now
+    interval = 1 / rate
+    full_at = max(cache.get(key, now), now) + interval
+    wait = full_at - burst * interval - now
+    if wait > 0:
+        return wait
+    cache.set(key, full_at, math.ceil(full_at - now) + 1)
+    return 0
+
+
+def throttle(request, user):
+    """``(limit, seconds to wait)`` of the first bucket ``request`` finds empty, or None."""
+    buckets = [("ip", f"throttle:ip:{client_ip(request)}", settings.THROTTLE_IP_RATE, settings.THROTTLE_IP_BURST)]
+    if user.is_authenticated:
+        buckets.append(("user", f"throttle:user:{user.pk}", settings.THROTTLE_USER_RATE, settings.THROTTLE_USER_BURST))
+    for limit, key, rate, burst in buckets:
+        try:
+            wait = take_token(key, rate, burst)
+        except Exception:
+            # A cache outage must not take the site down with it
+            logger.exception("Error reading the throttle cache, not throttling")
+            return None
+        if wait:
+            return limit, wait
+    return None
+
+
+def queue_seconds(request, now=None):
+    """Time since the ingress received ``request`` (its X-Request-Start header), or None."""
+    match = REQUEST_START.match(request.META.get("HTTP_X_REQUEST_START", ""))
+    if not match:
+        return None
+    started = float(match[1])
+    # Milliseconds or microseconds since the epoch
+    while started > 1e11:
+        started /= 1000
+    now = time.time() if now is None else now
+    # Clocks of the ingress and the pod differ a little
+    return max(now - started, 0.0)
+
+
+class LoadShedder:
+    """Decides, per worker process, which requests to refuse before doing any work.
+
+    Requests beyond ``max_in_flight`` running at once are refused right away.
+    Queue time (see ``queue_seconds``) is watched like CoDel watches a packet
+    queue: when even the shortest queue time of a whole ``interval`` was
+    above ``target``, the worker can't keep up, and until that changes the
+    requests that waited longer than ``target`` are refused. Their clients
+    have waited long already and retrying later beats timing out everyone.
+    A single slow burst, which drains within the interval, sheds nothing.
+    """
+
+    def __init__(self, max_in_flight, target, interval):
+        self.max_in_flight = max_in_flight
+        self.target = target
+        self.interval = interval
+        self.in_flight = 0
+        self.overloaded = False
+        self._lock = threading.Lock()
+        self._window_started = None
+        self._window_min = None
+
+    def admit(self, queued, now=None):
+        """Count a request in, or return why it is refused ("in_flight" or "queue")."""
+        now = time.monotonic() if now is None else now
+        with self._lock:
+            if queued is not None and self._observe(queued, now):
+                return "queue"
+            if self.max_in_flight and self.in_flight >= self.max_in_flight:
+                return "in_flight"
+            self.in_flight += 1
+        return None
+
+    def release(self):
+        with self._lock:
+            self.in_flight -= 1
+
+    def _observe(self, queued, now):
+        if self._window_started is None:
+            self._window_started = now
+        elif now - self._window_started >= self.interval:
+            # A window that ended long ago says nothing about now
+            recent = now - self._window_started < 2 * self.interval
+            self.overloaded = recent and self._window_min is not None and self._window_min > self.target
+            self._window_started, self._window_min = now, None
+        self._window_min = queued if self._window_min is None else min(self._window_min, queued)
+        return self.overloaded and queued > self.target
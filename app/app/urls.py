@@ -18,7 +18,7 @@ from django.contrib import admin
 from django.urls import path, include
 from django.conf import settings
 
-from .views import MainPageView, RegisterView
+from .views import MainPageView, MetricsView, RegisterView
 
 urlpatterns = [
     path('', MainPageView.as_view(), name="home"),
@@ -26,6 +26,9 @@ urlpatterns = [
     path('auth/', include("django.contrib.auth.urls")),
     path('auth/signup/', RegisterView.as_view(), name="signup"),
     path('tables/', include("tables.urls")),
+    path('leaderboard/', include("stats.urls")),
+    path('search/', include("search.urls")),
+    path('metrics', MetricsView.as_view(), name="metrics"),
 ]
 
 if settings.DEBUG:
@@ -1,9 +1,11 @@
-import logging
+from django.conf import settings
+from django.http import Http404, HttpResponse
 from django.urls import reverse_lazy
-from django.views.generic import CreateView, TemplateView
+from django.views.generic import CreateView, TemplateView, View
 from django.contrib.auth.forms import UserCreationForm
 
-logger = logging.getLogger(__name__)
+from app import metrics, tasks
+from jobs.enqueue import enqueue_on_commit
 
 class MainPageView(TemplateView):
     template_name = "main_page.html"
@@ -19,5 +21,17 @@ class RegisterView(CreateView):
 
     def form_valid(self, form):
         # <--- Log: Successful registration
-        logger.warning(f"New user registered: {form.cleaned_data.get('username')}")
+        enqueue_on_commit(tasks.log_registration, form.cleaned_data.get('username'))
         return super().form_valid(form)
+
+
+class MetricsView(View):
+    """Prometheus exposition, for scrapes from inside the cluster."""
+
+    def get(self, request):
+        # Requests through the ingress always carry X-Forwarded-For, direct scrapes of the pod don't
+        if "HTTP_X_FORWARDED_FOR" in request.META:
+            raise Http404
+        content, content_type = metrics.render(settings.PROMETHEUS_MULTIPROC_DIR)
+        return HttpResponse(content, content_type=content_type)
+
@@ -0,0 +1,57 @@
+import logging
+from pathlib import Path
+
+from django.contrib.staticfiles.storage import staticfiles_storage
+from django.db import DatabaseError, connections
+from django.template import TemplateSyntaxError, engines
+from django.urls import get_resolver
+
+logger = logging.getLogger(__name__)
+
+
+def template_names(engine):
+    for directory in engine.template_dirs:
+        root = Path(directory)
+        for template in root.rglob("*.html"):
+            yield template.relative_to(root).as_posix()
+
+
+def warm_up():
+    """Do the work the first requests of a process would otherwise pay for.
+
+    Imports every view through the URL resolver, compiles every template into
+    the cached template loader and reads the static files manifest. Nothing
+    here opens a database connection, so it is safe to run in the gunicorn
+    master before the workers are forked (see gunicorn.conf.py).
+    """
+    resolver = get_resolver()
+    # Reversing fills the lookup tables of every included URLconf
+    routes = len(resolver.reverse_dict)
+
+    templates = 0
+    for engine in engines.all():
+        for name in template_names(engine):
+            try:
+                engine.get_template(name)
+            except TemplateSyntaxError:
+                # Templates of third-party apps may use tags of apps that aren't installed
+                logger.debug("Template %s not loaded", name)
+            else:
+                templates += 1
+
+    # Only the manifest storage has one
+    getattr(staticfiles_storage, "hashed_files", None)
+    return {"routes": routes, "templates": templates}
+
+
+def connect_databases():
+    """Open this process's connection to every database before it serves a request.
+
+    Only persistent connections (``CONN_MAX_AGE``) outlive the first request.
+    """
+    for connection in connections.all():
+        try:
+            connection.ensure_connection()
+        except DatabaseError:
+            # Serve errors for now rather than keep the worker from booting
+            logger.warning("Could not connect to database %r", connection.alias, exc_info=True)
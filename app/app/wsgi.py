@@ -14,3 +14,9 @@ from django.core.wsgi import get_wsgi_application
 os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'app.settings')
 
 application = get_wsgi_application()
+
+# Benchmarks only (bench_read_path); production never wraps query execution
+if int(os.environ.get('SIMULATED_DB_LATENCY_MS', 0)):
+    from app import db_latency
+
+    db_latency.install()
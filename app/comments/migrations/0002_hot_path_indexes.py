@@ -0,0 +1,24 @@
+# Generated by Django 6.1.2 on 2026-10-18 16:41
+
+from django.conf import settings
+from django.db import migrations, models
+
+from app.migration_operations import AddIndexConcurrently
+
+
+class Migration(migrations.Migration):
+    # Indexes are built concurrently on Postgres, which can't run in a transaction
+    atomic = False
+
+    dependencies = [
+        ('comments', '0001_initial'),
+        ('tables', '0007_hot_path_indexes'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        AddIndexConcurrently(
+            model_name='comment',
+            index=models.Index(fields=['table', 'created_at'], name='comments_table_created_at'),
+        ),
+    ]
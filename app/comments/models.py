@@ -8,7 +8,7 @@ from tables.models import Table
 
 @rules.predicate
 def is_comment_creator(user, comment):
-    return user == comment.creator
+    return user.is_authenticated and user.pk == comment.creator_id
 
 class Comment(RulesModel):
     class Meta:
@@ -16,6 +16,7 @@ class Comment(RulesModel):
             "change": is_comment_creator,
             "delete": is_comment_creator,
         }
+        indexes = [models.Index(fields=["table", "created_at"], name="comments_table_created_at")]
 
     comment = models.TextField()
     table = models.ForeignKey(Table, on_delete=models.CASCADE, related_name="comments")
@@ -1,8 +1,12 @@
 from django.urls import path
-from .views import CommentCreateView, CommentDeleteView, CommentUpdateView
+
+from app.async_views import read_view
+
+from .views import AsyncCommentListView, CommentCreateView, CommentDeleteView, CommentListView, CommentUpdateView
 
 
 urlpatterns = [
+    path('', read_view(CommentListView, AsyncCommentListView), name="comment_list_view"),
     path('create/', CommentCreateView.as_view(), name="comment_create_view"),
     path('<int:comment_pk>/delete/', CommentDeleteView.as_view(), name="comment_delete_view"),
     path('<int:comment_pk>/update/', CommentUpdateView.as_view(), name="comment_update_view"),
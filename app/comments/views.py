@@ -1,13 +1,63 @@
 from django.contrib.auth.mixins import LoginRequiredMixin
-from django.shortcuts import get_object_or_404
-from django.views.generic import DeleteView, CreateView, UpdateView
+from django.shortcuts import aget_object_or_404, get_object_or_404
+from django.utils.functional import cached_property
+from django.views.generic import DeleteView, CreateView, ListView, UpdateView
 from django.urls import reverse_lazy
 from rules.contrib.views import PermissionRequiredMixin
 
 from tables.models import Table
 
+from app.async_views import AsyncReadView
+from app.pagination import KeysetPaginationMixin, KeysetPaginator
+
 from .models import Comment
 
+
+def comments_queryset(table):
+    return table.comments.select_related("creator")
+
+
+def comments_paginator(table):
+    return KeysetPaginator(comments_queryset(table), CommentListView.paginate_by, CommentListView.keyset_ordering)
+
+
+def first_comments_page(table):
+    return comments_paginator(table).page()
+
+
+class CommentListView(KeysetPaginationMixin, PermissionRequiredMixin, LoginRequiredMixin, ListView):
+    # Comments fragment, loaded page by page from the table detail page
+    template_name = "comments/comment_list.html"
+    permission_required = "tables.read_table"
+    paginate_by = 25
+
+    @cached_property
+    def table(self):
+        return get_object_or_404(Table, pk=self.kwargs["pk"])
+
+    def get_permission_object(self):
+        return self.table
+
+    def get_queryset(self):
+        return comments_queryset(self.table)
+
+    def get_context_data(self, **kwargs):
+        context = super().get_context_data(**kwargs)
+        context["table"] = self.table
+        return context
+
+
+class AsyncCommentListView(AsyncReadView):
+    template_name = CommentListView.template_name
+    permission_required = CommentListView.permission_required
+
+    async def get(self, request, *args, **kwargs):
+        table = await aget_object_or_404(Table, pk=kwargs["pk"])
+        await self.check_permission(table)
+        page = await self.get_page(comments_paginator(table), request.GET.get("cursor"))
+        return await self.render({"table": table, "page_obj": page, "object_list": page.object_list})
+
+
 class CommentCreateView(LoginRequiredMixin, CreateView):
     model = Comment
     template_name_suffix = "_create_form"
@@ -1,5 +1,21 @@
 from django.contrib import admin
-from .models import Game
+from .models import Game, GamePlayer
 # Register your models here.
 
-admin.site.register(Game)
+
+class GamePlayerInline(admin.TabularInline):
+    # Players are added and removed through the players m2m (its signals keep
+    # stats and memberships), here only their chips are edited
+    model = GamePlayer
+    fields = ["user", "buy_in", "cash_out"]
+    readonly_fields = ["user"]
+    extra = 0
+    can_delete = False
+
+    def has_add_permission(self, request, obj):
+        return False
+
+
+@admin.register(Game)
+class GameAdmin(admin.ModelAdmin):
+    inlines = [GamePlayerInline]
@@ -0,0 +1,57 @@
+from django import forms
+
+from tables.pickers import UserSearchSelect, UserSearchSelectMultiple
+
+from .models import Game, GamePlayer
+
+
+class GameForm(forms.ModelForm):
+    class Meta:
+        model = Game
+        fields = ["players", "winner"]
+        widgets = {"players": UserSearchSelectMultiple, "winner": UserSearchSelect}
+
+    def __init__(self, *args, table_id=None, **kwargs):
+        super().__init__(*args, **kwargs)
+        for field in self.fields.values():
+            field.widget.rank_table(table_id)
+
+
+class GameRowForm(forms.Form):
+    """One game of a batch. Choices come from the view so they are loaded once per request."""
+
+    players = forms.TypedMultipleChoiceField(coerce=int, widget=UserSearchSelectMultiple)
+    winner = forms.TypedChoiceField(coerce=int, required=False, empty_value=None, widget=UserSearchSelect)
+
+    def __init__(self, *args, choices=(), table_id=None, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.fields["players"].choices = choices
+        self.fields["winner"].choices = [("", "---------"), *choices]
+        for field in self.fields.values():
+            field.widget.rank_table(table_id)
+
+
+def game_batch_formset(rows, max_rows):
+    return forms.formset_factory(
+        GameRowForm, extra=rows, max_num=max_rows, absolute_max=max_rows, validate_max=True
+    )
+
+
+class BaseLedgerFormSet(forms.BaseModelFormSet):
+    def clean(self):
+        super().clean()
+        if any(self.errors):
+            return
+        # Chips only change hands during a game
+        bought_in = sum(form.cleaned_data["buy_in"] for form in self.forms)
+        cashed_out = sum(form.cleaned_data["cash_out"] for form in self.forms)
+        if bought_in != cashed_out:
+            raise forms.ValidationError(
+                f"Cash-outs add up to {cashed_out} chips but buy-ins to {bought_in}."
+            )
+
+
+# Only the players' rows of one game are edited, none are added or deleted
+GameLedgerFormSet = forms.modelformset_factory(
+    GamePlayer, fields=["buy_in", "cash_out"], formset=BaseLedgerFormSet, extra=0, edit_only=True
+)
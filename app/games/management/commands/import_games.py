@@ -0,0 +1,203 @@
+import csv
+import json
+import time
+from collections import Counter, defaultdict
+from datetime import datetime, time as day_start
+from itertools import batched
+from pathlib import Path
+
+from django.contrib.auth.hashers import make_password
+from django.contrib.auth.models import User
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection, transaction
+from django.utils import timezone
+from django.utils.dateparse import parse_date, parse_datetime
+
+from app import db_router
+from games.models import Game
+from search.index import index_tables
+from stats.models import bump_stats_many
+from tables.memberships import rebuild_memberships
+from tables.models import Table
+
+
+class Command(BaseCommand):
+    help = (
+        "Imports historical games from CSV or JSONL files, one game per row with the "
+        "columns table, table_name, play_date, dealer, game, winner and players "
+        "(';'-separated in CSV, a list in JSONL). Tables and games are keyed by the "
+        "'table' and 'game' columns, so an interrupted import can simply be run again."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("files", nargs="+")
+        parser.add_argument("--format", choices=("csv", "jsonl"), help="Defaults to the file extension.")
+        parser.add_argument("--chunk-size", type=int, default=5000, help="Rows committed per transaction.")
+        parser.add_argument(
+            "--create-users", action="store_true",
+            help="Create unknown usernames (without a usable password) instead of failing.",
+        )
+
+    def handle(self, *args, files, format, chunk_size, create_users, **options):
+        self.create_users = create_users
+        # Every username and table key seen so far, so each is looked up once. Like
+        # the chunks' own inserts, users created just before must not be missed
+        with db_router.primary():
+            self.users = dict(User.objects.values_list("username", "pk"))
+        self.tables = {}
+
+        totals = Counter()
+        started = time.perf_counter()
+        for name in files:
+            path = Path(name)
+            rows = self.read(path, format or path.suffix.lstrip("."))
+            for number, chunk in enumerate(batched(rows, chunk_size), 1):
+                chunk_started = time.perf_counter()
+                # A chunk reads back the ids of the rows it inserts
+                with transaction.atomic(), db_router.primary():
+                    counts = self.import_chunk(chunk)
+                totals.update(counts)
+                elapsed = time.perf_counter() - chunk_started
+                self.stdout.write(
+                    f"{path.name} chunk {number}: {len(chunk)} rows in {elapsed:.2f}s "
+                    f"({len(chunk) / elapsed:.0f} rows/s), {counts['games']} new games, "
+                    f"{counts['skipped']} already imported"
+                )
+
+        elapsed = time.perf_counter() - started
+        self.stdout.write(self.style.SUCCESS(
+            f"Imported {totals['rows']} rows in {elapsed:.1f}s ({totals['rows'] / max(elapsed, 1e-9):.0f} rows/s): "
+            f"{totals['users']} users, {totals['tables']} tables, {totals['games']} games, "
+            f"{totals['players']} player rows, {totals['skipped']} games already imported"
+        ))
+
+    def read(self, path, fmt):
+        """Yield normalized rows one at a time, never the whole file."""
+        with path.open(newline="", encoding="utf-8") as stream:
+            if fmt == "csv":
+                records = (
+                    (line, {**record, "players": (record.get("players") or "").split(";")})
+                    for line, record in enumerate(csv.DictReader(stream), 2)
+                )
+            elif fmt == "jsonl":
+                records = ((line, json.loads(text)) for line, text in enumerate(stream, 1) if text.strip())
+            else:
+                raise CommandError(f"{path}: unknown format {fmt!r}, pass --format")
+
+            for line, record in records:
+                if not record.get("table") or not record.get("game"):
+                    raise CommandError(f"{path}:{line}: 'table' and 'game' are required")
+                players = record.get("players") or []
+                # A string would be read as one-letter usernames
+                if not isinstance(players, list) or not all(isinstance(name, str) for name in players):
+                    raise CommandError(f"{path}:{line}: 'players' must be a list of usernames")
+                yield {
+                    "table": record["table"],
+                    "table_name": record.get("table_name") or record["table"],
+                    "play_date": self.parse_play_date(record.get("play_date"), path, line),
+                    "dealer": record.get("dealer") or None,
+                    "game": str(record["game"]),
+                    "winner": record.get("winner") or None,
+                    "players": [name.strip() for name in players if name.strip()],
+                }
+
+    def parse_play_date(self, value, path, line):
+        if not value:
+            return timezone.now()
+        parsed = parse_datetime(value)
+        if parsed is None and (day := parse_date(value)) is not None:
+            parsed = datetime.combine(day, day_start())
+        if parsed is None:
+            raise CommandError(f"{path}:{line}: invalid play_date {value!r}")
+        return parsed if timezone.is_aware(parsed) else timezone.make_aware(parsed)
+
+    def import_chunk(self, rows):
+        counts = Counter(rows=len(rows))
+        counts["users"] = self.resolve_users(rows)
+        counts["tables"] = self.resolve_tables(rows)
+
+        done = set(Game.objects.filter(import_key__in={row["game"] for row in rows})
+                   .values_list("import_key", flat=True))
+        new = {}
+        for row in rows:
+            if row["game"] not in done:
+                new.setdefault(row["game"], row)
+        counts["skipped"] = len(rows) - len(new)
+        if not new:
+            return counts
+
+        Game.objects.bulk_create(
+            Game(import_key=key, table_id=self.tables[row["table"]], winner_id=self.users.get(row["winner"]))
+            for key, row in new.items()
+        )
+        game_ids = dict(Game.objects.filter(import_key__in=new).values_list("import_key", "pk"))
+        player_ids = {key: {self.users[name] for name in row["players"]} for key, row in new.items()}
+        players = [(game_ids[key], user_id) for key, user_ids in player_ids.items() for user_id in user_ids]
+        self.insert_players(players)
+
+        # bulk inserts send no signals; stats of the new games' tables and users
+        # are added up here, committed together with the games
+        deltas = defaultdict(lambda: defaultdict(lambda: [0, 0]))
+        for key, row in new.items():
+            table_deltas = deltas[self.tables[row["table"]]]
+            for user_id in player_ids[key]:
+                table_deltas[user_id][0] += 1
+            table_deltas[self.users.get(row["winner"])][1] += 1
+        for table_id, table_deltas in deltas.items():
+            bump_stats_many(table_id, table_deltas)
+
+        rebuild_memberships(deltas.keys())
+        Table.objects.filter(pk__in=deltas.keys()).bump_version()
+
+        counts.update(games=len(new), players=len(players))
+        return counts
+
+    def resolve_users(self, rows):
+        names = {name for row in rows for name in (row["dealer"], row["winner"], *row["players"]) if name}
+        missing = names - self.users.keys()
+        if not missing:
+            return 0
+        if not self.create_users:
+            raise CommandError(f"Unknown users: {', '.join(sorted(missing))} (use --create-users)")
+
+        User.objects.bulk_create(User(username=name, password=make_password(None)) for name in missing)
+        self.users.update(User.objects.filter(username__in=missing).values_list("username", "pk"))
+        return len(missing)
+
+    def resolve_tables(self, rows):
+        keys = {row["table"] for row in rows} - self.tables.keys()
+        if not keys:
+            return 0
+        self.tables.update(Table.objects.filter(import_key__in=keys).values_list("import_key", "pk"))
+
+        new = {}
+        for row in rows:
+            if row["table"] not in self.tables:
+                new.setdefault(row["table"], row)
+        if new:
+            Table.objects.bulk_create(
+                Table(
+                    import_key=key,
+                    name=row["table_name"],
+                    play_date=row["play_date"],
+                    dealer_id=self.users.get(row["dealer"]),
+                    creator_id=self.users.get(row["dealer"]),
+                )
+                for key, row in new.items()
+            )
+            self.tables.update(Table.objects.filter(import_key__in=new).values_list("import_key", "pk"))
+            index_tables(self.tables[key] for key in new)
+        return len(new)
+
+    def insert_players(self, rows):
+        through = Game.players.through
+        if connection.vendor != "postgresql":
+            through.objects.bulk_create(through(game_id=game_id, user_id=user_id) for game_id, user_id in rows)
+            return
+
+        # COPY is several times faster than multi-row INSERTs for the largest table
+        qn = connection.ops.quote_name
+        sql = f"COPY {qn(through._meta.db_table)} ({qn('game_id')}, {qn('user_id')}) FROM STDIN"
+        with connection.cursor() as cursor, cursor.cursor.copy(sql) as copy:
+            for row in rows:
+                copy.write_row(row)
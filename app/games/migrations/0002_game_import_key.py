@@ -0,0 +1,18 @@
+# Generated by Django 6.1.2 on 2026-10-18 16:31
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('games', '0001_initial'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='game',
+            name='import_key',
+            field=models.CharField(blank=True, editable=False, max_length=255, null=True, unique=True),
+        ),
+    ]
@@ -0,0 +1,26 @@
+# Generated by Django 6.1.2 on 2026-10-18 16:41
+
+from django.conf import settings
+from django.db import migrations, models
+
+from app.migration_operations import AddIndexConcurrently, AddTableIndexConcurrently
+
+
+class Migration(migrations.Migration):
+    # Indexes are built concurrently on Postgres, which can't run in a transaction
+    atomic = False
+
+    dependencies = [
+        ('games', '0002_game_import_key'),
+        ('tables', '0007_hot_path_indexes'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        AddIndexConcurrently(
+            model_name='game',
+            index=models.Index(fields=['table', 'id'], name='games_table_id'),
+        ),
+        # players m2m looked up from the user side (a user's games)
+        AddTableIndexConcurrently("games_game_players", "games_players_user_game", ["user_id", "game_id"]),
+    ]
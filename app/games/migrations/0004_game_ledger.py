@@ -0,0 +1,50 @@
+# Generated by Django 6.1.2 on 2026-10-18 17:44
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('games', '0003_hot_path_indexes'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        # The players m2m gets an explicit through model over its existing table and
+        # its index from 0003, only the chip columns are new in the database
+        migrations.SeparateDatabaseAndState(
+            state_operations=[
+                migrations.CreateModel(
+                    name='GamePlayer',
+                    fields=[
+                        ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                        ('game', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='ledger', to='games.game')),
+                        ('user', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='+', to=settings.AUTH_USER_MODEL)),
+                    ],
+                    options={
+                        'db_table': 'games_game_players',
+                        'unique_together': {('game', 'user')},
+                        'indexes': [models.Index(fields=['user', 'game'], name='games_players_user_game')],
+                    },
+                ),
+                migrations.AlterField(
+                    model_name='game',
+                    name='players',
+                    field=models.ManyToManyField(related_name='games', through='games.GamePlayer', to=settings.AUTH_USER_MODEL),
+                ),
+            ],
+        ),
+        migrations.AddField(
+            model_name='gameplayer',
+            name='buy_in',
+            field=models.PositiveIntegerField(db_default=0, default=0),
+        ),
+        migrations.AddField(
+            model_name='gameplayer',
+            name='cash_out',
+            field=models.PositiveIntegerField(db_default=0, default=0),
+        ),
+    ]
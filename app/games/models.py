@@ -1,6 +1,11 @@
-from django.db import models
+from collections import defaultdict
+
+from django.db import models, transaction
 
 from django.contrib.auth.models import User
+from app.permissions import related
+from stats.models import bump_stats_many
+from tables.memberships import bump_players
 from tables.models import Table
 import rules
 from rules.contrib.models import RulesModel
@@ -8,11 +13,11 @@ from rules.contrib.models import RulesModel
 
 @rules.predicate
 def is_game_table_dealer(user, game):
-    return user == game.table.dealer
+    return user.is_authenticated and user.pk == related(game, "table").dealer_id
 
 @rules.predicate
 def is_table_dealer(user, table):
-    return user == table.dealer
+    return user.is_authenticated and user.pk == table.dealer_id
 
 class Game(RulesModel):
     class Meta:
@@ -20,6 +25,8 @@ class Game(RulesModel):
             "change": is_game_table_dealer,
             "delete": is_game_table_dealer,
         }
+        # Games of a table in keyset (pk) order
+        indexes = [models.Index(fields=["table", "id"], name="games_table_id")]
 
     table = models.ForeignKey(
         Table,
@@ -27,5 +34,56 @@ class Game(RulesModel):
         related_name='games',
     )
     winner = models.ForeignKey(User, on_delete=models.SET_NULL, null=True, related_name="won_games")
-    players = models.ManyToManyField(User, related_name="games")
+    players = models.ManyToManyField(User, through="GamePlayer", related_name="games")
+    # Natural key of games created by import_games, makes re-runs idempotent
+    import_key = models.CharField(max_length=255, null=True, blank=True, unique=True, editable=False)
+
+
+class GamePlayer(models.Model):
+    """A player of a game and the chips they bought in for and cashed out with."""
+
+    class Meta:
+        # The table of the former auto-created m2m, raw SQL elsewhere still uses it
+        db_table = "games_game_players"
+        unique_together = [("game", "user")]
+        # A user's games; created by 0003 before this model existed
+        indexes = [models.Index(fields=["user", "game"], name="games_players_user_game")]
+
+    game = models.ForeignKey(Game, on_delete=models.CASCADE, related_name="ledger")
+    user = models.ForeignKey(User, on_delete=models.CASCADE, related_name="+")
+    # db_default too, so rows inserted by COPY or players.add() without chips are valid
+    buy_in = models.PositiveIntegerField(default=0, db_default=0)
+    cash_out = models.PositiveIntegerField(default=0, db_default=0)
+
+
+def create_games(table, rows):
+    """Record many games of ``table`` at once; ``rows`` are ``(player_ids, winner_id)``.
+
+    Takes a constant number of statements however many games there are.
+    ``bulk_create`` sends no signals, so stats, memberships and the table
+    version are updated here instead of by ``stats.signals`` and ``tables.signals``.
+    """
+    deltas = defaultdict(lambda: [0, 0])
+    for player_ids, winner_id in rows:
+        for pk in player_ids:
+            deltas[pk][0] += 1
+        deltas[winner_id][1] += 1
+
+    with transaction.atomic():
+        games = Game.objects.bulk_create(Game(table=table, winner_id=winner_id) for _, winner_id in rows)
+        Game.players.through.objects.bulk_create(
+            Game.players.through(game_id=game.pk, user_id=pk)
+            for game, (player_ids, _) in zip(games, rows)
+            for pk in player_ids
+        )
+        bump_stats_many(table.pk, deltas)
+        bump_players(table.pk, {pk: played for pk, (played, _) in deltas.items()})
+        Table.objects.filter(pk=table.pk).bump_version()
+    return games
+
 
+def save_ledger(game, players):
+    """Save the buy-ins and cash-outs of ``players``, ``GamePlayer`` rows of ``game``."""
+    with transaction.atomic():
+        GamePlayer.objects.bulk_update(players, ["buy_in", "cash_out"])
+        Table.objects.filter(pk=game.table_id).bump_version()
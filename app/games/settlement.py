@@ -0,0 +1,127 @@
+import heapq
+
+from django.conf import settings
+from django.contrib.auth.models import User
+from django.core.cache import caches
+from django.db import connections, router
+
+from .models import Game, GamePlayer
+
+# Above this many players owing or owed, the exact search (2^n subsets) is too
+# slow and transfers are matched greedily, which needs at most one more per group
+EXACT_SETTLEMENT_PLAYERS = 12
+
+
+def table_balances(table_id):
+    """Chips won or lost by every player of a table, biggest winner first.
+
+    A single aggregate query; the window functions add each player's rank and
+    ``unbalanced``, the chips the whole table cashed out minus what it bought
+    in, which is 0 unless some buy-in or cash-out was mistyped.
+    """
+    using = router.db_for_read(GamePlayer)
+    qn = connections[using].ops.quote_name
+    sql = f"""
+        SELECT p.user_id, u.username, COUNT(*), SUM(p.buy_in), SUM(p.cash_out),
+               SUM(p.cash_out) - SUM(p.buy_in) AS balance,
+               RANK() OVER (ORDER BY SUM(p.cash_out) - SUM(p.buy_in) DESC),
+               SUM(SUM(p.cash_out) - SUM(p.buy_in)) OVER ()
+        FROM {qn(GamePlayer._meta.db_table)} p
+        JOIN {qn(Game._meta.db_table)} g ON g.id = p.game_id
+        JOIN {qn(User._meta.db_table)} u ON u.id = p.user_id
+        WHERE g.table_id = %s
+        GROUP BY p.user_id, u.username
+        ORDER BY balance DESC, u.username
+    """
+    columns = ["user_id", "username", "games", "bought_in", "cashed_out", "balance", "rank", "unbalanced"]
+    with connections[using].cursor() as cursor:
+        cursor.execute(sql, [table_id])
+        return [dict(zip(columns, row)) for row in cursor.fetchall()]
+
+
+def settle(balances):
+    """Fewest ``(debtor, creditor, chips)`` transfers that bring every balance to zero.
+
+    ``balances`` maps players to chips won (negative: lost) and must sum to
+    zero. Players who lost and won exactly the same as others can settle among
+    themselves, so the players are split into as many zero-sum groups as
+    possible, each of which then needs one transfer fewer than its size.
+    """
+    if sum(balances.values()):
+        raise ValueError("Balances don't sum to zero")
+    people = sorted((player for player, chips in balances.items() if chips), key=lambda player: (balances[player], player))
+    groups = _zero_sum_groups(people, balances) if len(people) <= EXACT_SETTLEMENT_PLAYERS else [people]
+    return [transfer for group in groups for transfer in _match(group, balances)]
+
+
+def _zero_sum_groups(people, balances):
+    n = len(people)
+    chips = [balances[player] for player in people]
+    full = (1 << n) - 1
+    # totals[mask]: chips of the players in mask; groups[mask]: most zero-sum groups they split into
+    totals = [0] * (full + 1)
+    groups = [0] * (full + 1)
+    for mask in range(1, full + 1):
+        lowest = (mask & -mask).bit_length() - 1
+        totals[mask] = totals[mask & (mask - 1)] + chips[lowest]
+        groups[mask] = max(groups[mask & ~(1 << i)] for i in range(n) if mask >> i & 1) + (totals[mask] == 0)
+
+    # Take the players off in an order achieving groups[full]; its zero-sum prefixes are the groups
+    order, mask = [], full
+    while mask:
+        i = next(
+            i for i in range(n)
+            if mask >> i & 1 and groups[mask & ~(1 << i)] + (totals[mask] == 0) == groups[mask]
+        )
+        order.append(i)
+        mask &= ~(1 << i)
+    result, group, total = [], [], 0
+    for i in reversed(order):
+        group.append(people[i])
+        total += chips[i]
+        if total == 0:
+            result.append(group)
+            group = []
+    return result
+
+
+def _match(group, balances):
+    # The biggest debtor pays the biggest creditor, which settles at least one of them
+    debtors = [(balances[player], player) for player in group if balances[player] < 0]
+    creditors = [(-balances[player], player) for player in group if balances[player] > 0]
+    heapq.heapify(debtors)
+    heapq.heapify(creditors)
+    transfers = []
+    while debtors:
+        owes, debtor = heapq.heappop(debtors)
+        owed, creditor = heapq.heappop(creditors)
+        chips = min(-owes, -owed)
+        transfers.append((debtor, creditor, chips))
+        if owes + chips:
+            heapq.heappush(debtors, (owes + chips, debtor))
+        if owed + chips:
+            heapq.heappush(creditors, (owed + chips, creditor))
+    return transfers
+
+
+def table_settlement(table):
+    """Balances and settling transfers of ``table``, cached until its version changes.
+
+    Transfers are left out while the table is unbalanced.
+    """
+    cache = caches[settings.SETTLEMENT_CACHE_ALIAS]
+    key = f"settlement:{table.pk}:{table.version}"
+    settlement = cache.get(key)
+    if settlement is None:
+        players = table_balances(table.pk)
+        unbalanced = players[0]["unbalanced"] if players else 0
+        transfers = []
+        if not unbalanced:
+            names = {player["user_id"]: player["username"] for player in players}
+            transfers = [
+                {"debtor": names[debtor], "creditor": names[creditor], "chips": chips}
+                for debtor, creditor, chips in settle({player["user_id"]: player["balance"] for player in players})
+            ]
+        settlement = {"players": players, "unbalanced": unbalanced, "transfers": transfers}
+        cache.set(key, settlement, settings.SETTLEMENT_CACHE_TIMEOUT)
+    return settlement
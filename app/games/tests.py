@@ -1,3 +1,319 @@
-from django.test import TestCase
+import io
+import json
+import tempfile
+from pathlib import Path
 
-# Create your tests here.
+from django.contrib.auth.models import User
+from django.core.cache import cache
+from django.core.management import CommandError, call_command
+from django.db import connection
+from django.test import TestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+
+from app import permissions
+from app.db_router import PrimaryReplicaRouter
+from stats.models import PlayerStats, TablePlayerStats
+from tables.models import Table
+
+from .models import Game, GamePlayer
+from .settlement import settle, table_settlement
+
+
+class GamePermissionCacheTests(TestCase):
+    def setUp(self):
+        self.dealer = User.objects.create_user("dealer", password="x")
+        self.table = Table.objects.create(name="t", dealer=self.dealer, creator=self.dealer)
+        Game.objects.bulk_create(Game(table=self.table) for _ in range(20))
+        self.cache, self.token = permissions.activate()
+
+    def tearDown(self):
+        permissions.deactivate(self.token)
+
+    def test_table_is_loaded_once_for_all_games(self):
+        games = list(Game.objects.filter(table=self.table))
+        with self.assertNumQueries(1):
+            for game in games:
+                self.assertTrue(self.dealer.has_perm("games.change_game", game))
+                self.assertTrue(self.dealer.has_perm("games.change_game", game))
+
+        self.assertEqual(self.cache.misses, 20)
+        self.assertEqual(self.cache.hits, 20)
+
+    def test_write_drops_cached_results(self):
+        game = Game.objects.filter(table=self.table).first()
+        self.assertTrue(self.dealer.has_perm("games.delete_game", game))
+
+        other = User.objects.create_user("other", password="x")
+        self.table.dealer = other
+        self.table.save()
+
+        game = Game.objects.get(pk=game.pk)
+        self.assertFalse(self.dealer.has_perm("games.delete_game", game))
+
+
+class GameBatchCreateViewTests(TestCase):
+    def setUp(self):
+        self.dealer = User.objects.create_user("dealer", password="x")
+        self.players = [User.objects.create_user(f"player{i}", password="x") for i in range(4)]
+        self.table = Table.objects.create(name="t", dealer=self.dealer, creator=self.dealer)
+        self.url = reverse("game_batch_create_view", args=[self.table.pk])
+        self.client.force_login(self.dealer)
+
+    def post_games(self, rows, extra=0):
+        data = {"form-TOTAL_FORMS": len(rows) + extra, "form-INITIAL_FORMS": 0}
+        for i, (players, winner) in enumerate(rows):
+            data[f"form-{i}-players"] = [player.pk for player in players]
+            data[f"form-{i}-winner"] = winner.pk if winner else ""
+        return self.client.post(self.url, data)
+
+    def count_write_queries(self, games):
+        rows = [(self.players[:3], self.players[i % 3]) for i in range(games)]
+        with CaptureQueriesContext(connection) as ctx:
+            response = self.post_games(rows)
+        self.assertRedirects(response, reverse("table_object_view", args=[self.table.pk]), fetch_redirect_response=False)
+        return len(ctx.captured_queries)
+
+    def test_query_count_does_not_grow_with_games(self):
+        self.assertEqual(self.count_write_queries(3), self.count_write_queries(40))
+        self.assertEqual(Game.objects.filter(table=self.table).count(), 43)
+
+    def test_stats_and_version_match_single_writes(self):
+        a, b, c, d = self.players
+        version = self.table.version
+        response = self.post_games([([a, b], a), ([a, b, c], c), ([d], None)], extra=2)
+        self.assertEqual(response.status_code, 302)
+
+        self.table.refresh_from_db()
+        self.assertEqual(self.table.version, version + 1)
+        self.assertEqual(
+            sorted(PlayerStats.objects.values_list("user__username", "games_played", "games_won")),
+            [("player0", 2, 1), ("player1", 2, 0), ("player2", 1, 1), ("player3", 1, 0)],
+        )
+        self.assertEqual(TablePlayerStats.objects.filter(table=self.table).count(), 4)
+        self.assertEqual(sorted(len(game.players.all()) for game in Game.objects.all()), [1, 2, 3])
+
+    def test_invalid_row_writes_nothing(self):
+        response = self.post_games([(self.players[:2], None), ([], self.players[0])])
+        self.assertEqual(response.status_code, 200)
+        self.assertFalse(Game.objects.exists())
+        self.assertFalse(PlayerStats.objects.exists())
+
+    def test_requires_dealer(self):
+        self.client.force_login(self.players[0])
+        response = self.post_games([(self.players[:2], None)])
+        self.assertEqual(response.status_code, 403)
+        self.assertFalse(Game.objects.exists())
+
+    def test_form_lists_no_users(self):
+        response = self.client.get(self.url)
+        self.assertNotContains(response, "player0")
+        self.assertContains(response, "data-user-search=")
+
+
+class GameFormTests(TestCase):
+    def setUp(self):
+        self.dealer = User.objects.create_user("dealer", password="x")
+        self.players = [User.objects.create_user(f"player{i}", password="x") for i in range(3)]
+        self.table = Table.objects.create(name="t", dealer=self.dealer, creator=self.dealer)
+        self.client.force_login(self.dealer)
+
+    def test_create_form_lists_no_users(self):
+        response = self.client.get(reverse("game_create_view", args=[self.table.pk]))
+        self.assertNotContains(response, "player0")
+
+    def test_update_form_renders_only_chosen_users(self):
+        game = Game.objects.create(table=self.table, winner=self.players[0])
+        game.players.set(self.players[:2])
+
+        response = self.client.get(reverse("game_update_view", args=[self.table.pk, game.pk]))
+        self.assertContains(response, ">player0</option>")
+        self.assertContains(response, ">player1</option>")
+        self.assertNotContains(response, "player2")
+
+    def test_validates_submitted_users(self):
+        url = reverse("game_create_view", args=[self.table.pk])
+        response = self.client.post(url, {"players": [self.players[0].pk, 10**6], "winner": ""})
+        self.assertEqual(response.status_code, 200)
+        self.assertFalse(Game.objects.exists())
+
+        response = self.client.post(url, {"players": [self.players[0].pk, self.players[1].pk], "winner": self.players[1].pk})
+        self.assertEqual(response.status_code, 302)
+        self.assertEqual(Game.objects.get().winner, self.players[1])
+
+
+class ImportGamesCommandTests(TestCase):
+    databases = {"default", "replica"}
+    CSV = (
+        "table,table_name,play_date,dealer,game,winner,players\n"
+        "2019-03-01,Friday,2019-03-01,alice,2019-03-01#1,bob,alice;bob\n"
+        "2019-03-01,Friday,2019-03-01,alice,2019-03-01#2,alice,alice;bob;carol\n"
+        "2019-03-08,Friday,2019-03-08T21:00:00,bob,2019-03-08#1,,bob;carol\n"
+    )
+
+    def setUp(self):
+        self.alice = User.objects.create_user("alice", password="x")
+        directory = tempfile.TemporaryDirectory()
+        self.addCleanup(directory.cleanup)
+        self.dir = Path(directory.name)
+
+    def run_import(self, name, content, *args):
+        path = self.dir / name
+        path.write_text(content)
+        out = io.StringIO()
+        call_command("import_games", str(path), "--chunk-size", "2", *args, stdout=out)
+        return out.getvalue()
+
+    def test_import_is_idempotent(self):
+        output = self.run_import("history.csv", self.CSV, "--create-users")
+        self.assertIn("rows/s", output)
+        self.assertEqual(Table.objects.count(), 2)
+        self.assertEqual(Game.objects.count(), 3)
+        self.assertEqual(Game.players.through.objects.count(), 7)
+
+        table = Table.objects.get(import_key="2019-03-08")
+        self.assertEqual((table.name, table.dealer.username, table.play_date.hour), ("Friday", "bob", 21))
+        self.assertEqual(table.version, 1)
+        self.assertFalse(User.objects.get(username="carol").has_usable_password())
+        self.assertEqual(
+            sorted(PlayerStats.objects.values_list("user__username", "games_played", "games_won")),
+            [("alice", 2, 1), ("bob", 3, 1), ("carol", 2, 0)],
+        )
+
+        self.run_import("history.csv", self.CSV)
+        self.assertEqual(Game.objects.count(), 3)
+        self.assertEqual(Game.players.through.objects.count(), 7)
+        self.assertEqual(PlayerStats.objects.get(user=self.alice).games_played, 2)
+
+    @override_settings(DATABASE_ROUTERS=["app.db_router.PrimaryReplicaRouter"])
+    def test_reads_its_own_rows_from_primary(self):
+        # The empty "replica" database hasn't caught up with anything
+        PrimaryReplicaRouter._health_checked_at, PrimaryReplicaRouter._replica_healthy = None, True
+        self.run_import("history.csv", self.CSV, "--create-users")
+        self.assertEqual(Game.objects.using("default").count(), 3)
+        self.assertEqual(Game.players.through.objects.using("default").count(), 7)
+
+    def test_resumes_after_failed_chunk(self):
+        rows = self.CSV.splitlines()
+        broken = "\n".join([*rows[:3], rows[3].replace("2019-03-08T21:00:00", "someday")]) + "\n"
+        with self.assertRaisesMessage(CommandError, "invalid play_date"):
+            self.run_import("history.csv", broken, "--create-users")
+        # The first chunk was committed, with its stats, before the bad row was read
+        self.assertEqual(Game.objects.count(), 2)
+        self.assertEqual(PlayerStats.objects.get(user=self.alice).games_played, 2)
+
+        self.run_import("history.csv", self.CSV)
+        self.assertEqual(Game.objects.count(), 3)
+        self.assertEqual(
+            sorted(TablePlayerStats.objects.values_list("table__import_key", "user__username", "games_played", "games_won")),
+            [("2019-03-01", "alice", 2, 1), ("2019-03-01", "bob", 2, 1), ("2019-03-01", "carol", 1, 0),
+             ("2019-03-08", "bob", 1, 0), ("2019-03-08", "carol", 1, 0)],
+        )
+
+    def test_rerun_of_imported_rows_touches_no_stats(self):
+        self.run_import("history.csv", self.CSV, "--create-users")
+        with CaptureQueriesContext(connection) as queries:
+            output = self.run_import("history.csv", self.CSV)
+        self.assertIn("3 games already imported", output)
+        self.assertFalse([query for query in queries if "stats" in query["sql"]])
+
+    def test_jsonl_and_unknown_users(self):
+        line = {"table": "t", "game": "g1", "winner": "zed", "players": ["alice", "zed"]}
+        with self.assertRaisesMessage(CommandError, "Unknown users: zed"):
+            self.run_import("history.jsonl", json.dumps(line) + "\n")
+        self.assertFalse(Game.objects.exists())
+
+        self.run_import("history.jsonl", json.dumps(line) + "\n", "--create-users")
+        self.assertEqual(Game.objects.get().winner.username, "zed")
+
+    def test_jsonl_players_must_be_a_list(self):
+        line = {"table": "t", "game": "g1", "players": "alice"}
+        with self.assertRaisesMessage(CommandError, "history.jsonl:1: 'players' must be a list of usernames"):
+            self.run_import("history.jsonl", json.dumps(line) + "\n", "--create-users")
+        self.assertFalse(User.objects.filter(username="a").exists())
+
+
+class SettlementTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.dealer = User.objects.create_user("dealer", password="x")
+        self.a, self.b, self.c = (User.objects.create_user(name, password="x") for name in "abc")
+        self.table = Table.objects.create(name="t", dealer=self.dealer, creator=self.dealer)
+        self.client.force_login(self.dealer)
+
+    def play(self, chips):
+        game = Game.objects.create(table=self.table)
+        for user, (buy_in, cash_out) in chips.items():
+            game.players.add(user, through_defaults={"buy_in": buy_in, "cash_out": cash_out})
+        return game
+
+    def assertSettles(self, balances, transfers):
+        left = dict(balances)
+        for debtor, creditor, chips in transfers:
+            self.assertGreater(chips, 0)
+            left[debtor] += chips
+            left[creditor] -= chips
+        self.assertFalse(any(left.values()))
+
+    def test_settle_finds_fewest_transfers(self):
+        # Greedy matching needs 4: -3 and -3 can settle with +6, -4 with +4
+        balances = {1: -4, 2: -3, 3: -3, 4: 6, 5: 4}
+        transfers = settle(balances)
+        self.assertSettles(balances, transfers)
+        self.assertEqual(len(transfers), 3)
+
+        with self.assertRaises(ValueError):
+            settle({1: -4, 2: 3})
+
+    def test_settle_many_players(self):
+        balances = {i: (i % 7 - 3) * 10 for i in range(1, 200)}
+        balances[200] = -sum(balances.values())
+        transfers = settle(balances)
+        self.assertSettles(balances, transfers)
+        self.assertLess(len(transfers), 200)
+
+    def test_table_settlement(self):
+        self.play({self.a: (100, 250), self.b: (100, 0), self.c: (100, 50)})
+        self.play({self.a: (100, 0), self.b: (100, 200)})
+
+        settlement = table_settlement(self.table)
+        self.assertEqual(
+            [(p["username"], p["games"], p["bought_in"], p["cashed_out"], p["balance"], p["rank"]) for p in settlement["players"]],
+            [("a", 2, 200, 250, 50, 1), ("b", 2, 200, 200, 0, 2), ("c", 1, 100, 50, -50, 3)],
+        )
+        self.assertEqual(settlement["transfers"], [{"debtor": "c", "creditor": "a", "chips": 50}])
+
+        # Cached until the table changes
+        with self.assertNumQueries(0):
+            table_settlement(self.table)
+        row = GamePlayer.objects.get(user=self.c)
+        row.cash_out = 0
+        row.save()
+        self.table.refresh_from_db()
+        with self.assertNumQueries(1):
+            self.assertEqual(table_settlement(self.table)["unbalanced"], -50)
+        self.assertEqual(table_settlement(self.table)["transfers"], [])
+
+    def test_ledger_view(self):
+        game = self.play({self.a: (0, 0), self.b: (0, 0)})
+        rows = list(game.ledger.order_by("user__username"))
+        url = reverse("game_ledger_view", args=[self.table.pk, game.pk])
+
+        def post(*chips):
+            data = {"form-TOTAL_FORMS": 2, "form-INITIAL_FORMS": 2}
+            for i, (row, (buy_in, cash_out)) in enumerate(zip(rows, chips)):
+                data.update({f"form-{i}-id": row.pk, f"form-{i}-buy_in": buy_in, f"form-{i}-cash_out": cash_out})
+            return self.client.post(url, data)
+
+        self.assertContains(post((100, 150), (100, 0)), "Cash-outs add up to 150 chips but buy-ins to 200.")
+        version = Table.objects.get(pk=self.table.pk).version
+        response = post((100, 180), (100, 20))
+        self.assertRedirects(response, reverse("table_settlement_view", args=[self.table.pk]))
+        self.assertEqual(Table.objects.get(pk=self.table.pk).version, version + 1)
+
+        response = self.client.get(reverse("table_settlement_view", args=[self.table.pk]))
+        self.assertContains(response, "b pays a")
+        self.assertEqual(response.context["transfers"], [{"debtor": "b", "creditor": "a", "chips": 80}])
+
+        self.client.force_login(self.a)
+        self.assertEqual(post((100, 100), (100, 100)).status_code, 403)
@@ -1,9 +1,23 @@
 from django.urls import path
 
-from games.views import GameCreateView, GameDeleteView, GameUpdateView
+from app.async_views import read_view
+from games.views import (
+    AsyncGameListView,
+    GameBatchCreateView,
+    GameCreateView,
+    GameDeleteView,
+    GameLedgerView,
+    GameListView,
+    GameUpdateView,
+    TableSettlementView,
+)
 
 urlpatterns = [
+    path('', read_view(GameListView, AsyncGameListView), name="game_list_view"),
     path('create/', GameCreateView.as_view(), name="game_create_view"),
+    path('create/batch/', GameBatchCreateView.as_view(), name="game_batch_create_view"),
     path('<int:game_pk>/update/', GameUpdateView.as_view(), name="game_update_view"),
+    path('<int:game_pk>/ledger/', GameLedgerView.as_view(), name="game_ledger_view"),
+    path('settlement/', TableSettlementView.as_view(), name="table_settlement_view"),
     path('<int:game_pk>/delete/', GameDeleteView.as_view(), name="game_delete_view"),
 ]
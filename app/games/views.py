@@ -1,44 +1,199 @@
+from django.contrib.auth.models import User
 from django.urls import reverse_lazy
-from django.views.generic import CreateView, DeleteView, UpdateView
+from django.utils.functional import cached_property
+from django.views.generic import CreateView, DeleteView, FormView, ListView, TemplateView, UpdateView
 from django.contrib.auth.mixins import LoginRequiredMixin
 from rules.contrib.views import PermissionRequiredMixin
 
 
 from tables.models import Table
-from django.shortcuts import get_object_or_404
+from django.shortcuts import aget_object_or_404, get_object_or_404
+
+from app.async_views import AsyncReadView
+from app.pagination import KeysetPaginationMixin, KeysetPaginator
+
+from .forms import GameForm, GameLedgerFormSet, game_batch_formset
+from .models import Game, create_games, save_ledger
+from .settlement import table_settlement
+
+
+def games_queryset(table):
+    return table.games.select_related("winner").prefetch_related("players")
+
+
+def games_paginator(table):
+    return KeysetPaginator(games_queryset(table), GameListView.paginate_by, GameListView.keyset_ordering)
+
+
+def first_games_page(table):
+    return games_paginator(table).page()
+
+
+class GameListView(KeysetPaginationMixin, PermissionRequiredMixin, LoginRequiredMixin, ListView):
+    # Rows fragment, loaded page by page from the table detail page
+    template_name = "games/game_list.html"
+    permission_required = "tables.read_table"
+    paginate_by = 25
+
+    @cached_property
+    def table(self):
+        return get_object_or_404(Table, pk=self.kwargs["pk"])
+
+    def get_permission_object(self):
+        return self.table
+
+    def get_queryset(self):
+        return games_queryset(self.table)
+
+    def get_context_data(self, **kwargs):
+        context = super().get_context_data(**kwargs)
+        context["table"] = self.table
+        return context
+
+
+class AsyncGameListView(AsyncReadView):
+    template_name = GameListView.template_name
+    permission_required = GameListView.permission_required
+
+    async def get(self, request, *args, **kwargs):
+        table = await aget_object_or_404(Table, pk=kwargs["pk"])
+        await self.check_permission(table)
+        page = await self.get_page(games_paginator(table), request.GET.get("cursor"))
+        return await self.render({"table": table, "page_obj": page, "object_list": page.object_list})
 
-from .models import Game
 
 class GameCreateView(PermissionRequiredMixin, LoginRequiredMixin, CreateView):
     model = Game
-    fields = ["players", "winner"]
+    form_class = GameForm
     template_name_suffix = "_create_form"
     success_url = reverse_lazy('tables_list_view')
     pk_url_kwarg = "game_pk"
     permission_required = "tables.change_table" # hack
 
-    def get_permission_object(self):
+    @cached_property
+    def table(self):
         return get_object_or_404(Table, pk=self.kwargs["pk"])
 
+    def get_permission_object(self):
+        return self.table
+
+    def get_form_kwargs(self):
+        return {**super().get_form_kwargs(), "table_id": self.table.pk}
+
     def form_valid(self, form):
-        table_pk = self.kwargs['pk']
-        
-        table = get_object_or_404(Table, pk=table_pk)
-        form.instance.table = table
+        form.instance.table = self.table
 
         return super().form_valid(form)
 
+class GameBatchCreateView(PermissionRequiredMixin, LoginRequiredMixin, FormView):
+    # A whole evening of games for one table in a single POST
+    template_name = "games/game_batch_form.html"
+    permission_required = "tables.change_table"
+    default_rows = 10
+    max_rows = 100
+
+    @cached_property
+    def table(self):
+        return get_object_or_404(Table, pk=self.kwargs["pk"])
+
+    def get_permission_object(self):
+        return self.table
+
+    def get_form_class(self):
+        try:
+            rows = int(self.request.GET.get("rows", self.default_rows))
+        except ValueError:
+            rows = self.default_rows
+        return game_batch_formset(min(max(rows, 1), self.max_rows), self.max_rows)
+
+    def get_form_kwargs(self):
+        kwargs = super().get_form_kwargs()
+        # Only the submitted users are valid choices, the pickers search for the rest
+        submitted = {
+            value
+            for key, values in self.request.POST.lists()
+            if key.endswith(("-players", "-winner"))
+            for value in values
+            if value.isdigit()
+        }
+        choices = list(User.objects.filter(pk__in=submitted).order_by("username").values_list("pk", "username"))
+        kwargs["form_kwargs"] = {"choices": choices, "table_id": self.table.pk}
+        return kwargs
+
+    def get_context_data(self, **kwargs):
+        context = super().get_context_data(**kwargs)
+        context["table"] = self.table
+        return context
+
+    def form_valid(self, form):
+        rows = [(row["players"], row["winner"]) for row in form.cleaned_data if row]
+        create_games(self.table, rows)
+        return super().form_valid(form)
+
+    def get_success_url(self):
+        return reverse_lazy('table_object_view', kwargs={"pk": self.table.pk})
+
 class GameUpdateView(PermissionRequiredMixin, LoginRequiredMixin, UpdateView):
     model = Game
-    fields = ["players", "winner"]
+    form_class = GameForm
     template_name_suffix = "_update_form"
     pk_url_kwarg = "game_pk"
     permission_required = "games.change_game"
 
+    def get_form_kwargs(self):
+        return {**super().get_form_kwargs(), "table_id": self.object.table_id}
+
     def get_success_url(self):
         # pk in that case is a Game.table.pk
         return reverse_lazy('table_object_view', kwargs={"pk": self.kwargs["pk"]})
 
+class GameLedgerView(PermissionRequiredMixin, LoginRequiredMixin, FormView):
+    # Buy-ins and cash-outs of the players of one game
+    template_name = "games/game_ledger_form.html"
+    form_class = GameLedgerFormSet
+    permission_required = "games.change_game"
+
+    @cached_property
+    def game(self):
+        return get_object_or_404(Game, pk=self.kwargs["game_pk"], table_id=self.kwargs["pk"])
+
+    def get_permission_object(self):
+        return self.game
+
+    def get_form_kwargs(self):
+        players = self.game.ledger.select_related("user").order_by("user__username")
+        return {**super().get_form_kwargs(), "queryset": players}
+
+    def get_context_data(self, **kwargs):
+        context = super().get_context_data(**kwargs)
+        context["game"] = self.game
+        return context
+
+    def form_valid(self, form):
+        save_ledger(self.game, form.save(commit=False))
+        return super().form_valid(form)
+
+    def get_success_url(self):
+        return reverse_lazy('table_settlement_view', kwargs={"pk": self.game.table_id})
+
+class TableSettlementView(PermissionRequiredMixin, LoginRequiredMixin, TemplateView):
+    # Who owes whom, from the buy-ins and cash-outs of all games of a table
+    template_name = "games/settlement.html"
+    permission_required = "tables.read_table"
+
+    @cached_property
+    def table(self):
+        return get_object_or_404(Table, pk=self.kwargs["pk"])
+
+    def get_permission_object(self):
+        return self.table
+
+    def get_context_data(self, **kwargs):
+        context = super().get_context_data(**kwargs)
+        context["table"] = self.table
+        context.update(table_settlement(self.table))
+        return context
+
 class GameDeleteView(PermissionRequiredMixin, LoginRequiredMixin, DeleteView):
     model = Game
     pk_url_kwarg = "game_pk"
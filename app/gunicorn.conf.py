@@ -0,0 +1,54 @@
+# Loaded by gunicorn from the working directory (/backend/app in the image).
+import gc
+import os
+import shutil
+
+# Import Django and the app once in the master; forked workers share those
+# pages copy-on-write instead of each importing everything again.
+preload_app = True
+
+# prometheus_client opens its files when the preloaded app imports it, which
+# is before on_starting
+if os.environ.get("PROMETHEUS_MULTIPROC_DIR"):
+    os.makedirs(os.environ["PROMETHEUS_MULTIPROC_DIR"], exist_ok=True)
+
+
+def on_starting(server):
+    # Metric files of the previous run would be added to the new totals
+    path = os.environ.get("PROMETHEUS_MULTIPROC_DIR")
+    if path:
+        shutil.rmtree(path, ignore_errors=True)
+        os.makedirs(path, exist_ok=True)
+
+    # The preStop hook also runs before a container is restarted; a drain file
+    # left in the pod's /tmp would keep the new one out of rotation
+    from app import health
+
+    health.stop_draining()
+
+
+def when_ready(server):
+    # Runs in the master after preloading and before the first worker is forked
+    if server.cfg.preload_app:
+        from app import warmup
+
+        server.log.info("Warmed up %s", warmup.warm_up())
+        # Keep the warmed objects out of the collector, so collections in the
+        # workers don't write to (and copy) the shared pages
+        gc.freeze()
+
+
+def post_worker_init(worker):
+    # The worker accepts requests only after this returns
+    from app import warmup
+
+    if not worker.cfg.preload_app:
+        warmup.warm_up()
+    warmup.connect_databases()
+
+
+def child_exit(server, worker):
+    if os.environ.get("PROMETHEUS_MULTIPROC_DIR"):
+        from prometheus_client import multiprocess
+
+        multiprocess.mark_process_dead(worker.pid)
@@ -0,0 +1,104 @@
+from copy import deepcopy
+
+from django.conf import settings
+from django.tasks import TaskResult, TaskResultStatus
+from django.tasks.backends.base import BaseTaskBackend
+from django.tasks.backends.dummy import DummyBackend
+from django.tasks.base import TaskError
+from django.tasks.exceptions import TaskResultDoesNotExist
+from django.tasks.signals import task_enqueued
+from django.utils import timezone
+from django.utils.json import normalize_json
+from django.utils.module_loading import import_string
+
+from .models import Job
+from .worker import error_of, jobs, run_task
+
+
+class DatabaseBackend(BaseTaskBackend):
+    """Stores tasks as ``jobs.Job`` rows, run by ``manage.py run_worker``.
+
+    The row is inserted in the caller's transaction, so a task enqueued by a
+    request that rolls back is never run; use ``jobs.enqueue.enqueue_on_commit``
+    for tasks that read what the request writes.
+    """
+
+    supports_defer = True
+    supports_async_task = True
+    supports_get_result = True
+    supports_priority = True
+
+    def enqueue(self, task, args, kwargs):
+        self.validate_task(task)
+        now = timezone.now()
+        job = jobs().create(
+            task_path=task.module_path,
+            queue_name=task.queue_name,
+            priority=task.priority,
+            args=normalize_json(list(args)),
+            kwargs=normalize_json(dict(kwargs)),
+            run_after=task.run_after or now,
+            enqueued_at=now,
+        )
+        result = self.to_result(job, task)
+        task_enqueued.send(type(self), task_result=result)
+        return result
+
+    def get_result(self, result_id):
+        try:
+            job = jobs().get(pk=int(result_id))
+        except (ValueError, Job.DoesNotExist):
+            raise TaskResultDoesNotExist(result_id) from None
+        return self.to_result(job)
+
+    def get_task(self, job):
+        return import_string(job.task_path).using(
+            priority=job.priority, queue_name=job.queue_name, backend=self.alias
+        )
+
+    def to_result(self, job, task=None):
+        result = TaskResult(
+            task=task or self.get_task(job),
+            id=str(job.pk),
+            status=TaskResultStatus(job.status),
+            enqueued_at=job.enqueued_at,
+            started_at=job.started_at,
+            finished_at=job.finished_at,
+            last_attempted_at=job.last_attempted_at,
+            args=job.args,
+            kwargs=job.kwargs,
+            backend=self.alias,
+            errors=[TaskError(**error) for error in job.errors],
+            worker_ids=list(job.worker_ids),
+        )
+        object.__setattr__(result, "_return_value", job.return_value)
+        return result
+
+
+class MemoryBackend(DummyBackend):
+    """Keeps enqueued tasks in memory until ``run_pending()``, for tests.
+
+    Deferred tasks run along with the rest, and failed ones are retried right
+    away, up to ``TASK_MAX_ATTEMPTS`` attempts.
+    """
+
+    def run_pending(self):
+        """Run every ready task, including ones enqueued meanwhile; returns their results."""
+        finished = []
+        while ready := [result for result in self.results if result.status == TaskResultStatus.READY]:
+            result = max(ready, key=lambda result: result.task.priority)
+            object.__setattr__(result, "last_attempted_at", timezone.now())
+            object.__setattr__(result, "started_at", result.started_at or result.last_attempted_at)
+            result.worker_ids.append(self.alias)
+            try:
+                object.__setattr__(result, "_return_value", run_task(result.task, result))
+            except Exception as exception:
+                result.errors.append(TaskError(**error_of(exception)))
+                if result.attempts < settings.TASK_MAX_ATTEMPTS:
+                    continue
+                object.__setattr__(result, "status", TaskResultStatus.FAILED)
+            else:
+                object.__setattr__(result, "status", TaskResultStatus.SUCCESSFUL)
+            object.__setattr__(result, "finished_at", timezone.now())
+            finished.append(deepcopy(result))
+        return finished
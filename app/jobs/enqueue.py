@@ -0,0 +1,12 @@
+from functools import partial
+
+from django.db import transaction
+
+
+def enqueue_on_commit(task, *args, using=None, **kwargs):
+    """Enqueue ``task`` once the current transaction commits (right away outside one).
+
+    For tasks deriving data from what the caller writes: they never run
+    before those rows are visible, nor at all when the transaction rolls back.
+    """
+    transaction.on_commit(partial(task.enqueue, *args, **kwargs), using=using)
@@ -0,0 +1,79 @@
+import logging
+import signal
+import threading
+import time
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from django.db import DatabaseError, close_old_connections, connections
+from django.tasks import DEFAULT_TASK_BACKEND_ALIAS, task_backends
+
+from jobs.backends import DatabaseBackend
+from jobs.worker import Worker
+
+logger = logging.getLogger(__name__)
+
+
+class Command(BaseCommand):
+    help = (
+        "Runs the tasks enqueued on a database task backend, in --concurrency threads, "
+        "until SIGTERM or SIGINT. Tasks running at that point are finished first."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--concurrency", type=int, default=settings.TASK_WORKER_CONCURRENCY, help="Worker threads.")
+        parser.add_argument(
+            "--queue", action="append", dest="queues",
+            help="Queue to run, can be repeated (default: every queue of the backend).",
+        )
+        parser.add_argument("--backend", default=DEFAULT_TASK_BACKEND_ALIAS, help="Alias in settings.TASKS.")
+        parser.add_argument("--burst", action="store_true", help="Exit once no task is ready.")
+
+    def handle(self, *args, concurrency, queues, backend, burst, **options):
+        if concurrency < 1:
+            raise CommandError("--concurrency must be at least 1")
+        backend = task_backends[backend]
+        if not isinstance(backend, DatabaseBackend):
+            raise CommandError(f"{backend.alias!r} is a {type(backend).__name__}, only a DatabaseBackend has a worker")
+        if queues and not set(queues) <= backend.queues:
+            raise CommandError(f"Unknown queues {sorted(set(queues) - backend.queues)}")
+
+        stop = threading.Event()
+        if threading.current_thread() is threading.main_thread():
+            for signum in (signal.SIGTERM, signal.SIGINT):
+                signal.signal(signum, lambda *args: stop.set())
+
+        maintenance = Worker(backend, queues)
+        requeued = maintenance.requeue_stale()
+        if requeued:
+            self.stdout.write(self.style.WARNING(f"Requeued {requeued} tasks of workers that stopped"))
+        self.stdout.write(f"Running {', '.join(maintenance.queues)} in {concurrency} threads")
+
+        threads = [
+            threading.Thread(target=self.work, args=(Worker(backend, queues, f"worker-{i}"), stop, burst))
+            for i in range(concurrency)
+        ]
+        for thread in threads:
+            thread.start()
+        # The main thread only waits, and once in a while puts back stale jobs and prunes old ones
+        maintained_at = time.monotonic()
+        while any(thread.is_alive() for thread in threads) and not stop.wait(settings.TASK_POLL_SECONDS):
+            if time.monotonic() - maintained_at < settings.TASK_LEASE_SECONDS / 2:
+                continue
+            maintained_at = time.monotonic()
+            try:
+                maintenance.requeue_stale()
+                maintenance.prune()
+            except DatabaseError:
+                logger.exception("Error requeueing stale tasks")
+            finally:
+                close_old_connections()
+        for thread in threads:
+            thread.join()
+        self.stdout.write("Worker stopped")
+
+    def work(self, worker, stop, burst):
+        try:
+            worker.run(stop, burst=burst)
+        finally:
+            connections.close_all()
@@ -0,0 +1,38 @@
+# Generated by Django 6.1.2 on 2026-10-18 17:31
+
+import django.utils.timezone
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    initial = True
+
+    dependencies = [
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='Job',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('task_path', models.CharField(max_length=255)),
+                ('queue_name', models.CharField(max_length=100)),
+                ('priority', models.SmallIntegerField(default=0)),
+                ('args', models.JSONField(default=list)),
+                ('kwargs', models.JSONField(default=dict)),
+                ('status', models.CharField(choices=[('READY', 'Ready'), ('RUNNING', 'Running'), ('FAILED', 'Failed'), ('SUCCESSFUL', 'Successful')], default='READY', max_length=10)),
+                ('run_after', models.DateTimeField(default=django.utils.timezone.now)),
+                ('enqueued_at', models.DateTimeField(default=django.utils.timezone.now)),
+                ('started_at', models.DateTimeField(blank=True, null=True)),
+                ('last_attempted_at', models.DateTimeField(blank=True, null=True)),
+                ('finished_at', models.DateTimeField(blank=True, null=True)),
+                ('worker_ids', models.JSONField(default=list)),
+                ('errors', models.JSONField(default=list)),
+                ('return_value', models.JSONField(blank=True, null=True)),
+            ],
+            options={
+                'indexes': [models.Index(condition=models.Q(('status', 'READY')), fields=['queue_name', '-priority', 'run_after'], name='jobs_job_ready'), models.Index(fields=['status', 'last_attempted_at'], name='jobs_job_status_attempted')],
+            },
+        ),
+    ]
@@ -0,0 +1,44 @@
+from django.db import models
+from django.tasks import TaskResultStatus
+from django.utils import timezone
+
+
+class Job(models.Model):
+    """A task enqueued on ``jobs.backends.DatabaseBackend``.
+
+    Workers claim READY jobs whose ``run_after`` has passed, highest priority
+    first, with ``SELECT ... FOR UPDATE SKIP LOCKED`` (see ``jobs.worker``).
+    A failed attempt puts the job back to READY with a later ``run_after``
+    until ``TASK_MAX_ATTEMPTS`` is reached.
+    """
+
+    class Meta:
+        indexes = [
+            # The claim query, which only ever reads READY jobs
+            models.Index(
+                fields=["queue_name", "-priority", "run_after"],
+                condition=models.Q(status=TaskResultStatus.READY),
+                name="jobs_job_ready",
+            ),
+            # Stale RUNNING jobs and finished jobs to prune
+            models.Index(fields=["status", "last_attempted_at"], name="jobs_job_status_attempted"),
+        ]
+
+    task_path = models.CharField(max_length=255)
+    queue_name = models.CharField(max_length=100)
+    priority = models.SmallIntegerField(default=0)
+    args = models.JSONField(default=list)
+    kwargs = models.JSONField(default=dict)
+    status = models.CharField(max_length=10, choices=TaskResultStatus.choices, default=TaskResultStatus.READY)
+    run_after = models.DateTimeField(default=timezone.now)
+    enqueued_at = models.DateTimeField(default=timezone.now)
+    started_at = models.DateTimeField(null=True, blank=True)
+    last_attempted_at = models.DateTimeField(null=True, blank=True)
+    finished_at = models.DateTimeField(null=True, blank=True)
+    # One entry per attempt
+    worker_ids = models.JSONField(default=list)
+    errors = models.JSONField(default=list)
+    return_value = models.JSONField(null=True, blank=True)
+
+    def __str__(self):
+        return f"{self.task_path} ({self.status})"
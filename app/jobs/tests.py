@@ -0,0 +1,211 @@
+import io
+from datetime import timedelta
+from unittest import mock
+
+from django.core.management import call_command
+from django.db import OperationalError, connection, transaction
+from django.db.models import QuerySet
+from django.tasks import TaskResultStatus, default_task_backend, task
+from django.test import TestCase, TransactionTestCase, override_settings
+from django.urls import reverse
+from django.utils import timezone
+
+from .enqueue import enqueue_on_commit
+from .models import Job
+from .worker import Worker
+
+DATABASE_TASKS = {"default": {"BACKEND": "jobs.backends.DatabaseBackend", "QUEUES": ["default", "exports"]}}
+calls = []
+
+
+@task
+def add(a, b):
+    calls.append((a, b))
+    return a + b
+
+
+@task(takes_context=True)
+def flaky(context):
+    calls.append(context.attempt)
+    if context.attempt < 2:
+        raise ConnectionError("try again")
+    return "done"
+
+
+@task
+def broken():
+    raise ValueError("never works")
+
+
+@override_settings(TASKS=DATABASE_TASKS, TASK_MAX_ATTEMPTS=3, TASK_RETRY_BACKOFF_SECONDS=10)
+class DatabaseBackendTests(TestCase):
+    def setUp(self):
+        calls.clear()
+        self.worker = Worker(default_task_backend)
+
+    def test_enqueue_and_run(self):
+        result = add.enqueue(2, b=3)
+        self.assertEqual(result.status, TaskResultStatus.READY)
+        self.assertEqual(Job.objects.get().task_path, "jobs.tests.add")
+
+        self.assertTrue(self.worker.run_one())
+        self.assertFalse(self.worker.run_one())
+
+        result.refresh()
+        self.assertEqual(result.status, TaskResultStatus.SUCCESSFUL)
+        self.assertEqual(result.return_value, 5)
+        self.assertEqual(result.attempts, 1)
+        self.assertEqual(calls, [(2, 3)])
+
+    def test_claims_by_priority_and_run_after(self):
+        add.using(run_after=timezone.now() + timedelta(minutes=1)).enqueue(0, 0)
+        add.enqueue(1, 1)
+        add.using(priority=10).enqueue(2, 2)
+        add.using(queue_name="exports").enqueue(3, 3)
+
+        while self.worker.run_one():
+            pass
+        self.assertEqual(calls, [(2, 2), (1, 1), (3, 3)])
+
+        calls.clear()
+        Worker(default_task_backend, ["exports"]).run_one()
+        add.using(queue_name="exports").enqueue(4, 4)
+        self.assertFalse(Worker(default_task_backend, ["default"]).run_one())
+        self.assertEqual(calls, [])
+
+    def test_claimed_job_is_not_claimed_again(self):
+        add.enqueue(1, 1)
+        job = self.worker.claim()
+
+        self.assertEqual(job.status, TaskResultStatus.RUNNING)
+        self.assertIsNone(Worker(default_task_backend).claim())
+
+        # Its worker died: the job comes back after the lease
+        Job.objects.update(last_attempted_at=timezone.now() - timedelta(hours=1))
+        self.assertEqual(self.worker.requeue_stale(), 1)
+        self.assertTrue(Worker(default_task_backend).run_one())
+        # The first attempt finishing late doesn't overwrite the second
+        self.worker.execute(job)
+        self.assertEqual(len(Job.objects.get().worker_ids), 2)
+
+    def test_retries_with_backoff(self):
+        result = flaky.enqueue()
+        started = timezone.now()
+        self.worker.run_one()
+
+        job = Job.objects.get()
+        self.assertEqual(job.status, TaskResultStatus.READY)
+        self.assertEqual(job.errors[0]["exception_class_path"], "builtins.ConnectionError")
+        self.assertGreaterEqual(job.run_after, started + timedelta(seconds=5))
+        # Not before its run_after
+        self.assertFalse(self.worker.run_one())
+
+        Job.objects.update(run_after=timezone.now())
+        self.worker.run_one()
+        result.refresh()
+        self.assertEqual(result.return_value, "done")
+        self.assertEqual(calls, [1, 2])
+
+    def test_fails_after_max_attempts(self):
+        result = broken.enqueue()
+        for _ in range(3):
+            Job.objects.update(run_after=timezone.now())
+            self.worker.run_one()
+
+        result.refresh()
+        self.assertEqual(result.status, TaskResultStatus.FAILED)
+        self.assertEqual(len(result.errors), 3)
+        self.assertIs(result.errors[0].exception_class, ValueError)
+
+    def test_failed_result_save_is_retried_not_rerun(self):
+        result = add.enqueue(2, 3)
+        update = QuerySet.update
+        failures = [OperationalError("database table is locked: jobs_job")] * 2
+
+        def flaky_update(queryset, **kwargs):
+            if "return_value" in kwargs and failures:
+                raise failures.pop()
+            return update(queryset, **kwargs)
+
+        with (
+            mock.patch.object(QuerySet, "update", flaky_update),
+            mock.patch("jobs.worker.time.sleep") as sleep,
+            self.assertLogs("jobs.worker", "WARNING") as logs,
+        ):
+            self.assertTrue(self.worker.run_one())
+        self.assertEqual(sleep.call_count, 2)
+        self.assertEqual(len(logs.records), 2)
+
+        result.refresh()
+        self.assertEqual(result.status, TaskResultStatus.SUCCESSFUL)
+        self.assertEqual(result.return_value, 5)
+        with override_settings(TASK_LEASE_SECONDS=0):
+            self.assertEqual(self.worker.requeue_stale(), 0)
+        self.assertFalse(self.worker.run_one())
+        self.assertEqual(calls, [(2, 3)])
+
+    def test_prune_keeps_failed_jobs(self):
+        add.enqueue(1, 1)
+        broken.enqueue()
+        with self.settings(TASK_MAX_ATTEMPTS=1):
+            while self.worker.run_one():
+                pass
+        Job.objects.update(last_attempted_at=timezone.now() - timedelta(days=30))
+
+        self.assertEqual(self.worker.prune(), 1)
+        self.assertEqual(Job.objects.get().status, TaskResultStatus.FAILED)
+
+    def test_enqueue_on_commit(self):
+        with transaction.atomic():
+            enqueue_on_commit(add, 1, 2)
+            transaction.set_rollback(True)
+        with self.captureOnCommitCallbacks(execute=True):
+            enqueue_on_commit(add, 3, 4)
+            self.assertFalse(Job.objects.exists())
+
+        self.assertEqual(Job.objects.get().args, [3, 4])
+
+
+class MemoryBackendTests(TestCase):
+    def setUp(self):
+        calls.clear()
+        default_task_backend.clear()
+
+    def test_run_pending_retries(self):
+        flaky.enqueue()
+        add.enqueue(1, 2)
+        broken.enqueue()
+        with self.settings(TASK_MAX_ATTEMPTS=3):
+            results = default_task_backend.run_pending()
+
+        self.assertEqual(
+            [(result.task.name, result.status) for result in results],
+            [("flaky", "SUCCESSFUL"), ("add", "SUCCESSFUL"), ("broken", "FAILED")],
+        )
+        self.assertEqual([result.attempts for result in results], [2, 1, 3])
+        self.assertEqual(default_task_backend.run_pending(), [])
+
+    def test_registration_is_logged_by_a_task(self):
+        data = {"username": "newcomer", "password1": "a-long-pass-phrase", "password2": "a-long-pass-phrase"}
+        with self.captureOnCommitCallbacks(execute=True):
+            self.client.post(reverse("signup"), data, secure=True)
+
+        with self.assertLogs("app.tasks", "WARNING") as logs:
+            default_task_backend.run_pending()
+        self.assertIn("New user registered: newcomer", logs.output[0])
+
+
+@override_settings(TASKS=DATABASE_TASKS)
+class RunWorkerTests(TransactionTestCase):
+    def test_burst_runs_every_ready_task(self):
+        calls.clear()
+        for i in range(10):
+            add.enqueue(i, i)
+        out = io.StringIO()
+        # Without SKIP LOCKED (SQLite) concurrent claims only contend for the table lock
+        concurrency = "2" if connection.features.has_select_for_update_skip_locked else "1"
+        call_command("run_worker", "--burst", "--concurrency", concurrency, stdout=out)
+
+        self.assertIn("Worker stopped", out.getvalue())
+        self.assertEqual(sorted(calls), [(i, i) for i in range(10)])
+        self.assertEqual(Job.objects.filter(status=TaskResultStatus.SUCCESSFUL).count(), 10)
@@ -0,0 +1,189 @@
+import logging
+import os
+import random
+import socket
+import time
+from contextlib import nullcontext
+from datetime import timedelta
+from traceback import format_exception
+
+from django.conf import settings
+from django.db import DatabaseError, close_old_connections, connections, router, transaction
+from django.tasks import TaskContext, TaskResultStatus
+from django.tasks.signals import task_finished, task_started
+from django.utils import timezone
+from django.utils.json import normalize_json
+
+from app import db_router
+
+from .models import Job
+
+logger = logging.getLogger(__name__)
+
+READY, RUNNING = TaskResultStatus.READY, TaskResultStatus.RUNNING
+FAILED, SUCCESSFUL = TaskResultStatus.FAILED, TaskResultStatus.SUCCESSFUL
+
+# The task has already run when its result is saved: a failed save is retried
+# (after 0.05s, 0.1s, ...) rather than left for the lease to run the task again
+RESULT_SAVE_ATTEMPTS = 5
+RESULT_SAVE_BACKOFF_SECONDS = 0.05
+
+
+def jobs():
+    # Claims and results always go to the primary, never a lagging replica
+    return Job.objects.db_manager(router.db_for_write(Job))
+
+
+def retry_delay(attempts):
+    """Seconds before the next attempt: exponential backoff with jitter, so
+    jobs failing on the same outage don't all come back at once."""
+    delay = min(settings.TASK_RETRY_BACKOFF_SECONDS * 2 ** (attempts - 1), settings.TASK_RETRY_MAX_DELAY_SECONDS)
+    return delay * random.uniform(0.5, 1)
+
+
+def run_task(task, task_result):
+    """Call ``task`` for ``task_result``; returns its return value as JSON."""
+    if task.takes_context:
+        value = task.call(TaskContext(task_result=task_result), *task_result.args, **task_result.kwargs)
+    else:
+        value = task.call(*task_result.args, **task_result.kwargs)
+    return normalize_json(value)
+
+
+def error_of(exception):
+    exception_type = type(exception)
+    return {
+        "exception_class_path": f"{exception_type.__module__}.{exception_type.__qualname__}",
+        "traceback": "".join(format_exception(exception)),
+    }
+
+
+class Worker:
+    """Claims and runs jobs of ``backend`` (a ``DatabaseBackend``) from ``queues``.
+
+    Safe to run in any number of threads and processes: each job is claimed
+    by exactly one of them. Jobs left RUNNING by a worker that died are put
+    back after ``TASK_LEASE_SECONDS``.
+    """
+
+    def __init__(self, backend, queues=None, name=None):
+        self.backend = backend
+        self.queues = sorted(queues or backend.queues)
+        self.id = f"{socket.gethostname()}:{os.getpid()}" + (f":{name}" if name else "")
+
+    def claim(self):
+        db = jobs().db
+        # SQLite has neither row locks nor SKIP LOCKED: there the conditional UPDATE
+        # alone decides which thread gets a job, and a read transaction would only
+        # fail to upgrade to a write while another thread claims
+        locking = connections[db].features.has_select_for_update_skip_locked
+        while True:
+            now = timezone.now()
+            with transaction.atomic(using=db) if locking else nullcontext():
+                job = (
+                    jobs()
+                    .select_for_update(skip_locked=True)
+                    .filter(status=READY, queue_name__in=self.queues, run_after__lte=now)
+                    .order_by("-priority", "run_after", "pk")
+                    .first()
+                )
+                if job is None:
+                    return None
+                job.status = RUNNING
+                job.started_at = job.started_at or now
+                job.last_attempted_at = now
+                job.worker_ids.append(self.id)
+                claimed = jobs().filter(pk=job.pk, status=READY).update(
+                    status=job.status,
+                    started_at=job.started_at,
+                    last_attempted_at=job.last_attempted_at,
+                    worker_ids=job.worker_ids,
+                )
+            if claimed:
+                return job
+
+    def run_one(self):
+        """Claim and run one job; returns False when there was none ready."""
+        job = self.claim()
+        if job is None:
+            return False
+        self.execute(job)
+        return True
+
+    def execute(self, job):
+        task = self.backend.get_task(job)
+        task_result = self.backend.to_result(job, task)
+        task_started.send(type(self.backend), task_result=task_result)
+        # Reads after the task's own writes go to the primary, as in a request
+        token = db_router.begin_request()
+        try:
+            return_value = run_task(task, task_result)
+        except Exception as exception:
+            job.errors.append(error_of(exception))
+            if len(job.worker_ids) < settings.TASK_MAX_ATTEMPTS:
+                job.status = READY
+                job.run_after = timezone.now() + timedelta(seconds=retry_delay(len(job.worker_ids)))
+            else:
+                job.status = FAILED
+                job.finished_at = timezone.now()
+        else:
+            job.status = SUCCESSFUL
+            job.finished_at = timezone.now()
+            job.return_value = return_value
+        finally:
+            db_router.end_request(token)
+            close_old_connections()
+
+        if not self.save_result(job):
+            logger.warning("Job %s finished after its lease ran out, result dropped", job.pk)
+        elif job.status != READY:
+            task_finished.send(type(self.backend), task_result=self.backend.to_result(job, task))
+        return job
+
+    def save_result(self, job):
+        """Write back the outcome of ``job``'s attempt; returns False if another attempt owns it."""
+        for attempt in range(RESULT_SAVE_ATTEMPTS):
+            try:
+                # A job whose lease ran out may have been claimed again; that attempt owns it now
+                saved = jobs().filter(pk=job.pk, status=RUNNING, last_attempted_at=job.last_attempted_at).update(
+                    status=job.status,
+                    run_after=job.run_after,
+                    finished_at=job.finished_at,
+                    errors=job.errors,
+                    return_value=job.return_value,
+                )
+                return bool(saved)
+            except DatabaseError:
+                if attempt == RESULT_SAVE_ATTEMPTS - 1:
+                    raise
+                logger.warning("Saving the result of job %s failed, retrying", job.pk, exc_info=True)
+                close_old_connections()
+                time.sleep(RESULT_SAVE_BACKOFF_SECONDS * 2 ** attempt)
+
+    def requeue_stale(self):
+        """Put back jobs RUNNING for over ``TASK_LEASE_SECONDS``, whose worker most likely died."""
+        cutoff = timezone.now() - timedelta(seconds=settings.TASK_LEASE_SECONDS)
+        return jobs().filter(status=RUNNING, last_attempted_at__lt=cutoff).update(status=READY)
+
+    def prune(self):
+        """Delete jobs that succeeded more than ``TASK_KEEP_SECONDS`` ago; failed ones are kept."""
+        cutoff = timezone.now() - timedelta(seconds=settings.TASK_KEEP_SECONDS)
+        deleted, _ = jobs().filter(status=SUCCESSFUL, last_attempted_at__lt=cutoff).delete()
+        return deleted
+
+    def run(self, stop, burst=False):
+        """Run jobs until ``stop`` (a ``threading.Event``) is set; with ``burst``,
+        only until no job is ready."""
+        while not stop.is_set():
+            try:
+                if self.run_one():
+                    continue
+            except Exception:
+                # The database went away: wait for it like for new jobs, then try
+                # again (also in burst mode, where jobs may still be ready)
+                logger.exception("Error claiming or saving a job")
+                close_old_connections()
+            else:
+                if burst:
+                    return
+            stop.wait(settings.TASK_POLL_SECONDS)
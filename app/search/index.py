@@ -0,0 +1,55 @@
+from django.db import connection, transaction
+
+from comments.models import Comment
+from tables.models import Table
+
+from .models import SearchDocument
+
+Kind = SearchDocument.Kind
+
+
+def _replace(kind, object_ids, documents):
+    with transaction.atomic():
+        SearchDocument.objects.filter(kind=kind, object_id__in=object_ids).delete()
+        SearchDocument.objects.bulk_create(documents)
+
+
+def index_tables(table_ids):
+    """(Re)index the names of the given tables."""
+    table_ids = list(table_ids)
+    rows = Table.objects.filter(pk__in=table_ids).values_list("pk", "name")
+    _replace(Kind.TABLE, table_ids, [
+        SearchDocument(kind=Kind.TABLE, object_id=pk, table_id=pk, text=name) for pk, name in rows
+    ])
+
+
+def index_comments(comment_ids):
+    comment_ids = list(comment_ids)
+    rows = Comment.objects.filter(pk__in=comment_ids).values_list("pk", "table_id", "comment")
+    _replace(Kind.COMMENT, comment_ids, [
+        SearchDocument(kind=Kind.COMMENT, object_id=pk, table_id=table_id, text=text)
+        for pk, table_id, text in rows
+    ])
+
+
+def unindex(kind, object_ids):
+    SearchDocument.objects.filter(kind=kind, object_id__in=list(object_ids)).delete()
+
+
+def rebuild():
+    """Recreate every document in two set-based INSERTs; returns the number of documents."""
+    qn = connection.ops.quote_name
+    documents = qn(SearchDocument._meta.db_table)
+    with transaction.atomic(), connection.cursor() as cursor:
+        cursor.execute(f"DELETE FROM {documents}")
+        cursor.execute(
+            f"INSERT INTO {documents} (kind, object_id, table_id, text) "
+            f"SELECT %s, id, id, name FROM {qn(Table._meta.db_table)}",
+            [Kind.TABLE],
+        )
+        cursor.execute(
+            f"INSERT INTO {documents} (kind, object_id, table_id, text) "
+            f"SELECT %s, id, table_id, comment FROM {qn(Comment._meta.db_table)}",
+            [Kind.COMMENT],
+        )
+    return SearchDocument.objects.count()
@@ -0,0 +1,10 @@
+from django.core.management.base import BaseCommand
+
+from search.index import rebuild
+
+
+class Command(BaseCommand):
+    help = "Recreates the search documents of all tables and comments, e.g. after bulk inserts."
+
+    def handle(self, *args, **options):
+        self.stdout.write(self.style.SUCCESS(f"Rebuilt search index: {rebuild()} documents"))
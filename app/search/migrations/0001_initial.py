@@ -0,0 +1,41 @@
+import django.db.models.deletion
+from django.db import migrations, models
+
+from app.migration_operations import AddFullTextIndex
+
+
+class Migration(migrations.Migration):
+
+    initial = True
+
+    dependencies = [
+        ('comments', '0002_hot_path_indexes'),
+        ('tables', '0008_username_prefix_index'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='SearchDocument',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('kind', models.CharField(choices=[('table', 'Table'), ('comment', 'Comment')], max_length=8)),
+                ('object_id', models.BigIntegerField()),
+                ('text', models.TextField()),
+                ('table', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='+', to='tables.table')),
+            ],
+            options={
+                'constraints': [models.UniqueConstraint(fields=('kind', 'object_id'), name='unique_search_document')],
+            },
+        ),
+        AddFullTextIndex('search_searchdocument', 'text'),
+        # Documents of the existing tables and comments
+        migrations.RunSQL(
+            """
+            INSERT INTO search_searchdocument (kind, object_id, table_id, text)
+            SELECT 'table', id, id, name FROM tables_table
+            UNION ALL
+            SELECT 'comment', id, table_id, comment FROM comments_comment
+            """,
+            reverse_sql=migrations.RunSQL.noop,
+        ),
+    ]
@@ -0,0 +1,28 @@
+from django.db import models
+
+from tables.models import Table
+
+
+class SearchDocument(models.Model):
+    """Searchable text of one table or comment.
+
+    The full-text index lives outside the model: a generated ``tsvector``
+    column with a GIN index on Postgres, an FTS5 table kept by triggers on
+    SQLite (see ``app.migration_operations.AddFullTextIndex``). Rows are kept
+    by ``search.signals``; ``rebuild_search_index`` recreates all of them.
+    """
+
+    class Kind(models.TextChoices):
+        TABLE = "table"
+        COMMENT = "comment"
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=["kind", "object_id"], name="unique_search_document"),
+        ]
+
+    kind = models.CharField(max_length=8, choices=Kind.choices)
+    object_id = models.BigIntegerField()
+    # The table the document belongs to, for visibility
+    table = models.ForeignKey(Table, on_delete=models.CASCADE, related_name="+")
+    text = models.TextField()
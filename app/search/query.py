@@ -0,0 +1,78 @@
+import re
+
+from django.contrib.auth.models import User
+from django.db import connections
+from django.db.models import BooleanField, FloatField, Value
+from django.db.models.expressions import RawSQL
+
+from tables.models import Table, TableMembership
+from tables.pickers import username_prefix
+
+from .models import SearchDocument
+
+# Results per kind
+SEARCH_RESULTS = 20
+# Words of a query that are searched for, the rest is ignored
+MAX_TERMS = 8
+# Letters and digits only, so terms can't carry tsquery or FTS5 syntax
+TERM = re.compile(r"[^\W_]+")
+
+
+def search_terms(query):
+    return TERM.findall(query.lower())[:MAX_TERMS]
+
+
+def matching(documents, terms):
+    """Documents containing every term (the last one as a prefix), annotated with ``rank``."""
+    connection = connections[documents.db]
+    if connection.vendor == "postgresql":
+        tsquery = " & ".join(f"{term}:*" for term in terms)
+        return documents.alias(
+            match=RawSQL("vector @@ to_tsquery('simple', %s)", [tsquery], output_field=BooleanField())
+        ).filter(match=True).annotate(
+            rank=RawSQL("ts_rank(vector, to_tsquery('simple', %s))", [tsquery], output_field=FloatField())
+        )
+
+    if connection.vendor == "sqlite":
+        qn = connection.ops.quote_name
+        table = SearchDocument._meta.db_table
+        fts = qn(f"{table}_fts")
+        match = " ".join(f'"{term}"*' for term in terms)
+        return documents.filter(
+            pk__in=RawSQL(f"SELECT rowid FROM {fts} WHERE {fts} MATCH %s", [match])
+        ).annotate(
+            # bm25() is lower for better matches
+            rank=RawSQL(
+                f"(SELECT -bm25({fts}) FROM {fts} WHERE {fts} MATCH %s AND rowid = {qn(table)}.{qn('id')})",
+                [match],
+                output_field=FloatField(),
+            )
+        )
+
+    # No full-text index on other databases
+    for term in terms:
+        documents = documents.filter(text__icontains=term)
+    return documents.annotate(rank=Value(0.0, output_field=FloatField()))
+
+
+def search(user, query, limit=SEARCH_RESULTS):
+    """Tables, comments and players matching ``query`` among the tables ``user`` may read.
+
+    Visibility is part of each query (the same membership subquery as the
+    tables list), so results never need a permission check per row.
+    """
+    results = {"tables": [], "comments": [], "players": []}
+    terms = search_terms(query)
+    if not terms:
+        return results
+
+    visible = Table.objects.visible_to(user)
+    documents = matching(SearchDocument.objects.filter(table__in=visible), terms).order_by("-rank", "-pk")
+    results["tables"] = list(documents.filter(kind=SearchDocument.Kind.TABLE).select_related("table__dealer")[:limit])
+    results["comments"] = list(documents.filter(kind=SearchDocument.Kind.COMMENT).select_related("table")[:limit])
+
+    # Players are found by username prefix, like the user pickers
+    fellow_players = TableMembership.objects.filter(table__in=visible).values("user_id")
+    players = username_prefix(User.objects.filter(pk__in=fellow_players), query.strip())
+    results["players"] = list(players.order_by("username").only("username")[:limit])
+    return results
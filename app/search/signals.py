@@ -0,0 +1,33 @@
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import receiver
+
+from comments.models import Comment
+from jobs.enqueue import enqueue_on_commit
+from tables.models import Table, deleted_with_table
+
+from . import tasks
+from .index import Kind, unindex
+
+# Saved names and comments are indexed by a task after the commit, off the
+# request. Deleted comments leave the index right away, so their text is never
+# found. Bulk inserts send no signals: import_games indexes its new tables
+# itself, anything else runs rebuild_search_index afterwards. Documents of
+# deleted tables go with them (on_delete=CASCADE).
+
+
+@receiver(post_save, sender=Table)
+def index_table(sender, instance, raw=False, **kwargs):
+    if not raw:
+        enqueue_on_commit(tasks.index_tables, [instance.pk])
+
+
+@receiver(post_save, sender=Comment)
+def index_comment(sender, instance, raw=False, **kwargs):
+    if not raw:
+        enqueue_on_commit(tasks.index_comments, [instance.pk])
+
+
+@receiver(post_delete, sender=Comment)
+def unindex_comment(sender, instance, origin=None, **kwargs):
+    if not deleted_with_table(origin):
+        unindex(Kind.COMMENT, [instance.pk])
@@ -0,0 +1,13 @@
+from django.tasks import task
+
+from . import index
+
+
+@task
+def index_tables(table_ids):
+    index.index_tables(table_ids)
+
+
+@task
+def index_comments(comment_ids):
+    index.index_comments(comment_ids)
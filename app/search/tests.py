@@ -0,0 +1,109 @@
+import io
+from contextlib import contextmanager
+
+from django.contrib.auth.models import User
+from django.core.management import call_command
+from django.tasks import default_task_backend
+from django.test import TestCase
+from django.urls import reverse
+
+from comments.models import Comment
+from games.models import Game
+from tables.models import Table
+
+from .models import SearchDocument
+from .query import search, search_terms
+
+
+class SearchTests(TestCase):
+    def setUp(self):
+        default_task_backend.clear()
+        with self.indexing():
+            self.create()
+
+    @contextmanager
+    def indexing(self):
+        # Documents are written by tasks enqueued on commit
+        with self.captureOnCommitCallbacks(execute=True):
+            yield
+        default_task_backend.run_pending()
+
+    def create(self):
+        self.dealer = User.objects.create_user("dealer", password="x")
+        self.alice = User.objects.create_user("alice", password="x")
+        self.outsider = User.objects.create_user("outsider", password="x")
+        self.table = Table.objects.create(name="Friday night poker", dealer=self.dealer, creator=self.dealer)
+        game = Game.objects.create(table=self.table, winner=self.alice)
+        game.players.add(self.alice)
+        self.comment = Comment.objects.create(
+            table=self.table, creator=self.alice, comment="Alice won with a river flush on friday"
+        )
+        self.hidden = Table.objects.create(name="Friday private game", dealer=self.outsider, creator=self.outsider)
+        Comment.objects.create(table=self.hidden, creator=self.outsider, comment="friday flush")
+
+    def names(self, results):
+        return {
+            "tables": [document.table.name for document in results["tables"]],
+            "comments": [document.object_id for document in results["comments"]],
+            "players": [user.username for user in results["players"]],
+        }
+
+    def test_finds_tables_comments_and_players_visible_to_the_user(self):
+        self.assertEqual(
+            self.names(search(self.alice, "friday")),
+            {"tables": ["Friday night poker"], "comments": [self.comment.pk], "players": []},
+        )
+        self.assertEqual(self.names(search(self.dealer, "ali"))["players"], ["alice"])
+        self.assertEqual(self.names(search(self.outsider, "poker"))["tables"], [])
+        self.assertEqual(self.names(search(self.outsider, "ali"))["players"], [])
+
+    def test_every_term_must_match_and_the_best_match_comes_first(self):
+        with self.indexing():
+            other = Comment.objects.create(table=self.table, creator=self.dealer, comment="flush")
+            Comment.objects.create(table=self.table, creator=self.dealer, comment="river")
+
+        results = search(self.dealer, "flush")["comments"]
+        self.assertEqual([document.object_id for document in results], [other.pk, self.comment.pk])
+        results = search(self.dealer, "river flu")["comments"]
+        self.assertEqual([document.object_id for document in results], [self.comment.pk])
+
+    def test_query_syntax_is_not_interpreted(self):
+        self.assertEqual(search_terms('fri* OR "poker" -x:y'), ["fri", "or", "poker", "x", "y"])
+        self.assertEqual(self.names(search(self.dealer, 'NEAR("')), {"tables": [], "comments": [], "players": []})
+
+    def test_index_follows_renames_and_deletes(self):
+        self.table.name = "Saturday game"
+        with self.indexing():
+            self.table.save()
+        self.assertEqual(search(self.dealer, "friday")["tables"], [])
+        self.assertEqual(len(search(self.dealer, "saturday")["tables"]), 1)
+
+        self.comment.delete()
+        self.assertEqual(search(self.dealer, "river")["comments"], [])
+        self.table.delete()
+        self.assertFalse(SearchDocument.objects.filter(table_id=self.table.pk).exists())
+
+    def test_rebuild_after_bulk_inserts(self):
+        Table.objects.bulk_create([Table(name="Bulk imported", dealer=self.dealer, creator=self.dealer)])
+        self.assertEqual(search(self.dealer, "bulk")["tables"], [])
+
+        call_command("rebuild_search_index", stdout=io.StringIO())
+        call_command("repair_memberships", stdout=io.StringIO())
+        self.assertEqual(len(search(self.dealer, "bulk")["tables"]), 1)
+
+    def test_indexed_after_commit_by_a_task(self):
+        with self.captureOnCommitCallbacks(execute=True):
+            Comment.objects.create(table=self.table, creator=self.dealer, comment="turn")
+        self.assertEqual(search(self.dealer, "turn")["comments"], [])
+
+        default_task_backend.run_pending()
+        self.assertEqual(len(search(self.dealer, "turn")["comments"]), 1)
+
+    def test_view(self):
+        self.client.force_login(self.alice)
+        with self.assertNumQueries(5):
+            response = self.client.get(reverse("search_view"), {"q": "friday"})
+
+        self.assertContains(response, "Friday night poker")
+        self.assertContains(response, "river flush")
+        self.assertNotContains(response, "Friday private game")
@@ -0,0 +1,15 @@
+from django.contrib.auth.mixins import LoginRequiredMixin
+from django.views.generic import TemplateView
+
+from .query import search
+
+
+class SearchView(LoginRequiredMixin, TemplateView):
+    template_name = "search/search_results.html"
+
+    def get_context_data(self, **kwargs):
+        context = super().get_context_data(**kwargs)
+        query = self.request.GET.get("q", "")[:200]
+        context["query"] = query
+        context.update(search(self.request.user, query))
+        return context
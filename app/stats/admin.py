@@ -0,0 +1,31 @@
+from django.contrib import admin
+
+from .models import PlayerStats, TablePlayerStats
+
+
+class StatsAdmin(admin.ModelAdmin):
+    # Kept by stats.signals and rebuild_stats, an edit here would only be overwritten
+    list_display = ["user", "games_played", "games_won"]
+    list_select_related = ["user"]
+    search_fields = ["user__username"]
+
+    def has_add_permission(self, request):
+        return False
+
+    def has_change_permission(self, request, obj=None):
+        return False
+
+    def has_delete_permission(self, request, obj=None):
+        return False
+
+
+@admin.register(PlayerStats)
+class PlayerStatsAdmin(StatsAdmin):
+    ordering = ["-games_won", "-games_played"]
+
+
+@admin.register(TablePlayerStats)
+class TablePlayerStatsAdmin(StatsAdmin):
+    list_display = ["user", "table", "games_played", "games_won"]
+    list_select_related = ["user", "table"]
+    ordering = ["table", "-games_won", "-games_played"]
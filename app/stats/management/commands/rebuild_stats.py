@@ -0,0 +1,42 @@
+from django.core.management.base import BaseCommand
+from django.db import connection, transaction
+
+from games.models import Game
+from stats.models import PlayerStats, TablePlayerStats
+
+
+class Command(BaseCommand):
+    help = "Recomputes all player statistics from games in a few set-based queries."
+
+    def handle(self, *args, **options):
+        qn = connection.ops.quote_name
+        players = qn(Game.players.through._meta.db_table)
+        games = qn(Game._meta.db_table)
+        table_stats = qn(TablePlayerStats._meta.db_table)
+        player_stats = qn(PlayerStats._meta.db_table)
+
+        with transaction.atomic(), connection.cursor() as cursor:
+            cursor.execute(f"DELETE FROM {table_stats}")
+            cursor.execute(f"DELETE FROM {player_stats}")
+            cursor.execute(f"""
+                INSERT INTO {table_stats} (user_id, table_id, games_played, games_won)
+                SELECT user_id, table_id, SUM(played), SUM(won) FROM (
+                    SELECT p.user_id AS user_id, g.table_id AS table_id, 1 AS played, 0 AS won
+                    FROM {players} p JOIN {games} g ON g.id = p.game_id
+                    UNION ALL
+                    SELECT g.winner_id, g.table_id, 0, 1
+                    FROM {games} g WHERE g.winner_id IS NOT NULL
+                ) counts
+                GROUP BY user_id, table_id
+            """)
+            cursor.execute(f"""
+                INSERT INTO {player_stats} (user_id, games_played, games_won)
+                SELECT user_id, SUM(games_played), SUM(games_won)
+                FROM {table_stats}
+                GROUP BY user_id
+            """)
+
+        self.stdout.write(self.style.SUCCESS(
+            f"Rebuilt stats: {PlayerStats.objects.count()} players, "
+            f"{TablePlayerStats.objects.count()} table rows"
+        ))
@@ -0,0 +1,44 @@
+# Generated by Django 6.1.2 on 2026-10-18 15:56
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    initial = True
+
+    dependencies = [
+        ('tables', '0002_table_creator'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='PlayerStats',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('games_played', models.PositiveIntegerField(default=0)),
+                ('games_won', models.PositiveIntegerField(default=0)),
+                ('user', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, related_name='stats', to=settings.AUTH_USER_MODEL)),
+            ],
+            options={
+                'indexes': [models.Index(fields=['-games_won', '-games_played'], name='stats_playe_games_w_affbeb_idx')],
+            },
+        ),
+        migrations.CreateModel(
+            name='TablePlayerStats',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('games_played', models.PositiveIntegerField(default=0)),
+                ('games_won', models.PositiveIntegerField(default=0)),
+                ('table', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='player_stats', to='tables.table')),
+                ('user', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='table_stats', to=settings.AUTH_USER_MODEL)),
+            ],
+            options={
+                'indexes': [models.Index(fields=['table', '-games_won', '-games_played'], name='stats_table_table_i_801941_idx')],
+                'constraints': [models.UniqueConstraint(fields=('table', 'user'), name='unique_table_player_stats')],
+            },
+        ),
+    ]
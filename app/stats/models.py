@@ -0,0 +1,85 @@
+from django.contrib.auth.models import User
+from django.db import models
+
+from tables.models import Table
+
+
+class StatsMixin(models.Model):
+    class Meta:
+        abstract = True
+
+    games_played = models.PositiveIntegerField(default=0)
+    games_won = models.PositiveIntegerField(default=0)
+
+    @property
+    def win_rate(self):
+        if not self.games_played:
+            return 0
+        return self.games_won / self.games_played
+
+
+class PlayerStats(StatsMixin):
+    """Denormalized per-user totals, kept current by ``stats.signals``."""
+
+    class Meta:
+        indexes = [models.Index(fields=["-games_won", "-games_played"])]
+
+    user = models.OneToOneField(User, on_delete=models.CASCADE, related_name="stats")
+
+
+class TablePlayerStats(StatsMixin):
+    """Denormalized per-(user, table) totals, kept current by ``stats.signals``."""
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=["table", "user"], name="unique_table_player_stats"),
+        ]
+        indexes = [models.Index(fields=["table", "-games_won", "-games_played"])]
+
+    user = models.ForeignKey(User, on_delete=models.CASCADE, related_name="table_stats")
+    table = models.ForeignKey(Table, on_delete=models.CASCADE, related_name="player_stats")
+
+
+def bump_stats(user_ids, table_id, played=0, won=0):
+    """Add ``played``/``won`` (may be negative) to the counters of ``user_ids``.
+
+    Costs a constant number of statements no matter how many users are given.
+    """
+    user_ids = {pk for pk in user_ids if pk is not None}
+    if not user_ids or not (played or won):
+        return
+
+    updates = {
+        "games_played": models.F("games_played") + played,
+        "games_won": models.F("games_won") + won,
+    }
+    for model, scope in ((PlayerStats, {}), (TablePlayerStats, {"table_id": table_id})):
+        model.objects.bulk_create(
+            [model(user_id=pk, **scope) for pk in user_ids], ignore_conflicts=True
+        )
+        model.objects.filter(user_id__in=user_ids, **scope).update(**updates)
+
+
+def bump_stats_many(table_id, deltas):
+    """Apply per-user ``{user_id: (played, won)}`` deltas on one table.
+
+    Like :func:`bump_stats` the number of statements does not depend on the
+    number of users, for writers that skip signals (e.g. ``bulk_create``).
+    """
+    deltas = {pk: delta for pk, delta in deltas.items() if pk is not None and any(delta)}
+    if not deltas:
+        return
+
+    def delta_of(index):
+        whens = [models.When(user_id=pk, then=models.Value(delta[index])) for pk, delta in deltas.items()]
+        return models.Case(*whens, default=models.Value(0), output_field=models.IntegerField())
+
+    updates = {
+        "games_played": models.F("games_played") + delta_of(0),
+        "games_won": models.F("games_won") + delta_of(1),
+    }
+    for model, scope in ((PlayerStats, {}), (TablePlayerStats, {"table_id": table_id})):
+        model.objects.bulk_create(
+            [model(user_id=pk, **scope) for pk in deltas], ignore_conflicts=True
+        )
+        model.objects.filter(user_id__in=deltas, **scope).update(**updates)
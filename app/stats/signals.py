@@ -0,0 +1,88 @@
+from collections import Counter
+
+from django.db.models import F, OuterRef, Subquery
+from django.db.models.signals import m2m_changed, post_init, post_save, pre_delete
+from django.dispatch import receiver
+
+from games.models import Game
+from tables.models import Table, deleted_with_table
+
+from .models import PlayerStats, TablePlayerStats, bump_stats
+
+
+def _remember_state(game):
+    game._stats_state = (game.table_id, game.winner_id)
+
+
+@receiver(post_init, sender=Game)
+def remember_game_state(sender, instance, **kwargs):
+    _remember_state(instance)
+
+
+@receiver(post_save, sender=Game)
+def update_winner_stats(sender, instance, created, raw=False, **kwargs):
+    if raw:
+        return
+    old_table_id, old_winner_id = (None, None) if created else instance._stats_state
+
+    if not created and old_table_id != instance.table_id:
+        # Game moved to another table: move its players' per-table counters too
+        player_ids = list(instance.players.values_list("pk", flat=True))
+        bump_stats(player_ids, old_table_id, played=-1)
+        bump_stats(player_ids, instance.table_id, played=1)
+
+    if (old_table_id, old_winner_id) != (instance.table_id, instance.winner_id):
+        bump_stats([old_winner_id], old_table_id, won=-1)
+        bump_stats([instance.winner_id], instance.table_id, won=1)
+
+    _remember_state(instance)
+
+
+@receiver(pre_delete, sender=Game)
+def remove_game_stats(sender, instance, origin=None, **kwargs):
+    # The players rows are deleted without m2m_changed, so account for them here
+    if deleted_with_table(origin):
+        return
+    bump_stats(instance.players.values_list("pk", flat=True), instance.table_id, played=-1)
+    bump_stats([instance.winner_id], instance.table_id, won=-1)
+
+
+@receiver(pre_delete, sender=Table)
+def remove_table_stats(sender, instance, **kwargs):
+    # Instead of game by game: take the table's counters, deleted with it, off the totals
+    per_table = TablePlayerStats.objects.filter(table_id=instance.pk, user_id=OuterRef("user_id"))
+    PlayerStats.objects.filter(user__table_stats__table_id=instance.pk).update(
+        games_played=F("games_played") - Subquery(per_table.values("games_played")),
+        games_won=F("games_won") - Subquery(per_table.values("games_won")),
+    )
+
+
+@receiver(m2m_changed, sender=Game.players.through)
+def update_player_stats(sender, instance, action, reverse, pk_set, **kwargs):
+    if action in ("pre_clear", "pre_remove"):
+        # Only the rows that exist are deleted: a pk given twice or one that never
+        # played must not be counted off
+        if reverse:
+            games = instance.games.all() if action == "pre_clear" else instance.games.filter(pk__in=pk_set)
+            instance._stats_removed = list(games.values_list("pk", "table_id"))
+        else:
+            players = instance.players.all() if action == "pre_clear" else instance.players.filter(pk__in=pk_set)
+            instance._stats_removed = list(players.values_list("pk", flat=True))
+        return
+    if action not in ("post_add", "post_remove", "post_clear"):
+        return
+
+    # post_add gets only the pks actually added
+    delta = 1 if action == "post_add" else -1
+    if not reverse:
+        user_ids = pk_set if action == "post_add" else instance._stats_removed
+        bump_stats(user_ids, instance.table_id, played=delta)
+        return
+
+    # user.games.add(...) / remove(...) / clear()
+    if action == "post_add":
+        games = Game.objects.filter(pk__in=pk_set).values_list("pk", "table_id")
+    else:
+        games = instance._stats_removed
+    for table_id, count in Counter(table_id for _, table_id in games).items():
+        bump_stats([instance.pk], table_id, played=delta * count)
@@ -0,0 +1,130 @@
+from io import StringIO
+
+from django.contrib.auth.models import User
+from django.core.management import call_command
+from django.db import connection
+from django.db.models import Q
+from django.test import TestCase
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+
+from comments.models import Comment
+from games.models import Game
+from tables.models import Table, TableMembership
+
+from .models import PlayerStats, TablePlayerStats
+
+
+def snapshot():
+    # Incremental updates may leave all-zero rows behind, a rebuild does not
+    nonzero = Q(games_played__gt=0) | Q(games_won__gt=0)
+    return (
+        sorted(PlayerStats.objects.filter(nonzero).values_list("user_id", "games_played", "games_won")),
+        sorted(
+            TablePlayerStats.objects.filter(nonzero).values_list(
+                "user_id", "table_id", "games_played", "games_won"
+            )
+        ),
+    )
+
+
+class StatsTests(TestCase):
+    def setUp(self):
+        self.alice, self.bob, self.carol = (
+            User.objects.create_user(name, password="x") for name in ("alice", "bob", "carol")
+        )
+        self.table = Table.objects.create(name="t", dealer=self.alice, creator=self.alice)
+        self.other_table = Table.objects.create(name="o", dealer=self.bob, creator=self.bob)
+
+    def test_signals_match_rebuild(self):
+        first = Game.objects.create(table=self.table, winner=self.alice)
+        first.players.add(self.alice, self.bob)
+        second = Game.objects.create(table=self.table)
+        second.players.set([self.bob, self.carol])
+        second.winner = self.carol
+        second.save()
+        third = Game.objects.create(table=self.other_table, winner=self.bob)
+        self.bob.games.add(third)
+        self.carol.games.add(third)
+
+        self.assertEqual(PlayerStats.objects.get(user=self.bob).games_played, 3)
+
+        first.winner = self.bob
+        first.save()
+        second.players.remove(self.carol)
+        third.players.clear()
+        third.players.add(self.alice)
+        self.carol.games.clear()
+        Game.objects.get(pk=first.pk).delete()
+
+        incremental = snapshot()
+        call_command("rebuild_stats", stdout=StringIO())
+        self.assertEqual(snapshot(), incremental)
+
+    def test_removing_non_players_counts_nothing_off(self):
+        game = Game.objects.create(table=self.table)
+        game.players.add(self.alice)
+        other = Game.objects.create(table=self.table)
+        other.players.add(self.bob)
+
+        game.players.remove(self.alice, self.bob)
+        game.players.remove(self.alice)
+        self.carol.games.remove(game, other)
+
+        self.assertEqual(PlayerStats.objects.get(user=self.bob).games_played, 1)
+        incremental = snapshot()
+        call_command("rebuild_stats", stdout=StringIO())
+        self.assertEqual(snapshot(), incremental)
+
+    def test_deleting_a_table_costs_the_same_however_many_games(self):
+        def delete_table(games):
+            table = Table.objects.create(name="gone", dealer=self.alice, creator=self.alice)
+            for i in range(games):
+                game = Game.objects.create(table=table, winner=self.bob if i % 2 else self.carol)
+                game.players.add(self.alice, self.bob, self.carol)
+                Comment.objects.create(table=table, creator=self.alice, comment=f"comment {i}")
+            with CaptureQueriesContext(connection) as queries:
+                table.delete()
+            self.assertFalse(TableMembership.objects.filter(table_id=table.pk).exists())
+            return len(queries)
+
+        kept = Game.objects.create(table=self.table, winner=self.alice)
+        kept.players.add(self.alice, self.bob)
+        self.assertEqual(delete_table(2), delete_table(12))
+
+        incremental = snapshot()
+        self.assertEqual(incremental[0], [(self.alice.pk, 1, 1), (self.bob.pk, 1, 0)])
+        call_command("rebuild_stats", stdout=StringIO())
+        self.assertEqual(snapshot(), incremental)
+
+    def test_leaderboards(self):
+        game = Game.objects.create(table=self.table, winner=self.bob)
+        game.players.add(self.alice, self.bob)
+        self.client.force_login(self.alice)
+
+        response = self.client.get(reverse("table_leaderboard_view", args=[self.table.pk]))
+        self.assertEqual([s.user for s in response.context["object_list"]], [self.bob, self.alice])
+
+        response = self.client.get(reverse("leaderboard_view"))
+        self.assertEqual(response.context["object_list"][0].user, self.bob)
+
+        self.client.force_login(self.carol)
+        response = self.client.get(reverse("table_leaderboard_view", args=[self.table.pk]))
+        self.assertEqual(response.status_code, 403)
+
+    def test_leaderboard_counts_only_visible_tables(self):
+        game = Game.objects.create(table=self.table, winner=self.bob)
+        game.players.add(self.alice, self.bob)
+        hidden = Table.objects.create(name="hidden", dealer=self.carol, creator=self.carol)
+        for _ in range(3):
+            Game.objects.create(table=hidden, winner=self.carol).players.add(self.bob, self.carol)
+
+        self.client.force_login(self.alice)
+        response = self.client.get(reverse("leaderboard_view"))
+        rows = [(s.user, s.games_won, s.games_played) for s in response.context["object_list"]]
+        self.assertEqual(rows, [(self.bob, 1, 1), (self.alice, 0, 1)])
+
+        self.client.force_login(self.carol)
+        response = self.client.get(reverse("leaderboard_view"))
+        rows = [(s.user, s.games_won, s.games_played) for s in response.context["object_list"]]
+        self.assertEqual(rows, [(self.carol, 3, 3), (self.bob, 0, 3)])
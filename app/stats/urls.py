@@ -0,0 +1,7 @@
+from django.urls import path
+
+from .views import LeaderboardView
+
+urlpatterns = [
+    path('', LeaderboardView.as_view(), name="leaderboard_view"),
+]
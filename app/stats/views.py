@@ -0,0 +1,56 @@
+from django.contrib.auth.mixins import LoginRequiredMixin
+from django.contrib.auth.models import User
+from django.db.models import Sum
+from django.shortcuts import get_object_or_404
+from django.utils.functional import cached_property
+from django.views.generic import ListView
+from rules.contrib.views import PermissionRequiredMixin
+
+from tables.models import Table
+
+from .models import PlayerStats, TablePlayerStats
+
+
+class LeaderboardView(LoginRequiredMixin, ListView):
+    template_name = "stats/leaderboard.html"
+    leaderboard_size = 50
+
+    def get_queryset(self):
+        # Totals over the tables the viewer can see only, never other tables' games
+        rows = (
+            TablePlayerStats.objects.filter(table__in=Table.objects.visible_to(self.request.user))
+            .values("user")
+            .annotate(played=Sum("games_played"), won=Sum("games_won"))
+            .filter(played__gt=0)
+            .order_by("-won", "-played")[: self.leaderboard_size]
+        )
+        users = User.objects.in_bulk([row["user"] for row in rows])
+        return [
+            PlayerStats(user=users[row["user"]], games_played=row["played"], games_won=row["won"])
+            for row in rows
+        ]
+
+
+class TableLeaderboardView(PermissionRequiredMixin, LoginRequiredMixin, ListView):
+    template_name = "stats/leaderboard.html"
+    permission_required = "tables.read_table"
+    leaderboard_size = 50
+
+    @cached_property
+    def table(self):
+        return get_object_or_404(Table, pk=self.kwargs["pk"])
+
+    def get_permission_object(self):
+        return self.table
+
+    def get_queryset(self):
+        return (
+            TablePlayerStats.objects.filter(table=self.table, games_played__gt=0)
+            .select_related("user")
+            .order_by("-games_won", "-games_played")[: self.leaderboard_size]
+        )
+
+    def get_context_data(self, **kwargs):
+        context = super().get_context_data(**kwargs)
+        context["table"] = self.table
+        return context
@@ -0,0 +1,121 @@
+import csv
+import json
+
+from django.contrib.auth.models import User
+from django.core.serializers.json import DjangoJSONEncoder
+from django.db.models import Prefetch
+
+from comments.models import Comment
+from games.models import Game
+
+# Rows fetched (and related rows prefetched) per query while exporting
+EXPORT_CHUNK_SIZE = 2000
+
+
+def games_queryset(table):
+    players = User.objects.only("username").order_by("username")
+    return (
+        Game.objects.filter(table=table)
+        .select_related("winner")
+        # stats.signals reads table_id and winner_id on init, keep them loaded
+        .only("pk", "table_id", "winner__username")
+        .prefetch_related(Prefetch("players", queryset=players))
+        .order_by("pk")
+    )
+
+
+def game_row(game):
+    return {
+        "id": game.pk,
+        "winner": game.winner.username if game.winner else None,
+        "players": [player.username for player in game.players.all()],
+    }
+
+
+def comments_queryset(table):
+    return (
+        Comment.objects.filter(table=table)
+        .select_related("creator")
+        .only("pk", "created_at", "comment", "creator__username")
+        .order_by("pk")
+    )
+
+
+def comment_row(comment):
+    return {
+        "id": comment.pk,
+        "created_at": comment.created_at,
+        "creator": comment.creator.username if comment.creator else None,
+        "comment": comment.comment,
+    }
+
+
+EXPORTS = {
+    "games": (games_queryset, game_row, ("id", "winner", "players")),
+    "comments": (comments_queryset, comment_row, ("id", "created_at", "creator", "comment")),
+}
+
+
+class _Echo:
+    """File-like object handing ``csv.writer`` output straight back."""
+
+    def write(self, value):
+        return value
+
+
+class CsvFormat:
+    content_type = "text/csv"
+
+    def __init__(self, columns):
+        self.columns = columns
+        self.writer = csv.writer(_Echo())
+
+    def header(self):
+        return self.writer.writerow(self.columns)
+
+    def row(self, row):
+        values = (row[column] for column in self.columns)
+        return self.writer.writerow(
+            ";".join(value) if isinstance(value, list) else value for value in values
+        )
+
+
+class JsonLinesFormat:
+    content_type = "application/x-ndjson"
+
+    def __init__(self, columns):
+        self.columns = columns
+
+    def header(self):
+        return ""
+
+    def row(self, row):
+        return json.dumps(row, cls=DjangoJSONEncoder) + "\n"
+
+
+FORMATS = {"csv": CsvFormat, "jsonl": JsonLinesFormat}
+
+
+def _prepare(table, kind, fmt):
+    get_queryset, to_row, columns = EXPORTS[kind]
+    return get_queryset(table), to_row, FORMATS[fmt](columns)
+
+
+def iter_export(table, kind, fmt):
+    """Yield the export of ``kind`` rows of ``table`` line by line.
+
+    Rows are read ``EXPORT_CHUNK_SIZE`` at a time, so memory use does not
+    depend on the size of the table.
+    """
+    queryset, to_row, formatter = _prepare(table, kind, fmt)
+    yield formatter.header()
+    for obj in queryset.iterator(chunk_size=EXPORT_CHUNK_SIZE):
+        yield formatter.row(to_row(obj))
+
+
+async def aiter_export(table, kind, fmt):
+    """:func:`iter_export` for ASGI, where a sync iterator would be buffered whole."""
+    queryset, to_row, formatter = _prepare(table, kind, fmt)
+    yield formatter.header()
+    async for obj in queryset.aiterator(chunk_size=EXPORT_CHUNK_SIZE):
+        yield formatter.row(to_row(obj))
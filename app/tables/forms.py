@@ -0,0 +1,23 @@
+from django import forms
+
+from .models import Table
+from .pickers import UserSearchSelect
+
+
+class TableForm(forms.ModelForm):
+    class Meta:
+        model = Table
+        fields = ["name", "dealer", "creator"]
+        widgets = {"dealer": UserSearchSelect, "creator": UserSearchSelect}
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        if self.instance.pk is not None:
+            for name in ("dealer", "creator"):
+                if name in self.fields:
+                    self.fields[name].widget.rank_table(self.instance.pk)
+
+
+class TableCreateForm(TableForm):
+    class Meta(TableForm.Meta):
+        fields = ["name", "dealer"]
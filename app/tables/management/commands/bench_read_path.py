@@ -0,0 +1,156 @@
+import http.client
+import os
+import socket
+import statistics
+import subprocess
+import sys
+import time
+from concurrent.futures import ThreadPoolExecutor
+from http.cookies import SimpleCookie
+
+from django.conf import settings
+from django.contrib.auth import (
+    BACKEND_SESSION_KEY, HASH_SESSION_KEY, SESSION_KEY, get_user_model, load_backend,
+)
+from django.contrib.sessions.backends.db import SessionStore
+from django.core.management.base import BaseCommand, CommandError
+
+from games.models import Game
+from tables.models import Table
+
+SERVERS = {
+    "wsgi": ["app.wsgi:application"],
+    "asgi": ["-k", "uvicorn_worker.UvicornWorker", "app.asgi:application"],
+}
+
+
+class Command(BaseCommand):
+    help = (
+        "Compares throughput and tail latency of the table pages served by sync "
+        "gunicorn workers (WSGI) and uvicorn workers (ASGI) with a slow database."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--servers", nargs="+", choices=SERVERS, default=list(SERVERS))
+        parser.add_argument("--workers", type=int, default=2)
+        parser.add_argument("--concurrency", type=int, default=32)
+        parser.add_argument("--requests", type=int, default=500)
+        parser.add_argument("--latency-ms", type=int, default=20, help="Simulated latency of every query.")
+        parser.add_argument("--path", default=None, help="Page to load, defaults to a table detail page.")
+        parser.add_argument("--port", type=int, default=8765)
+
+    def handle(self, *args, **options):
+        table = self.prepare_data()
+        path = options["path"] or f"/tables/{table.pk}/"
+        cookie = f"{settings.SESSION_COOKIE_NAME}={self.login(table.dealer)}"
+
+        self.stdout.write(
+            f"{path}: {options['requests']} requests, concurrency {options['concurrency']}, "
+            f"{options['workers']} workers, {options['latency_ms']} ms per query"
+        )
+        self.stdout.write(f"{'server':<8}{'req/s':>10}{'p50 ms':>10}{'p99 ms':>10}{'errors':>8}")
+        for server in options["servers"]:
+            with self.serve(server, options):
+                result = self.load(options["port"], path, cookie, options["requests"], options["concurrency"])
+            self.stdout.write(
+                f"{server:<8}{result['throughput']:>10.1f}{result['p50']:>10.1f}"
+                f"{result['p99']:>10.1f}{result['errors']:>8}"
+            )
+
+    def prepare_data(self):
+        user, created = get_user_model().objects.get_or_create(username="bench")
+        table = Table.objects.filter(dealer=user).first()
+        if table is None:
+            table = Table.objects.create(name="bench", dealer=user, creator=user)
+            for _ in range(30):
+                Game.objects.create(table=table, winner=user).players.add(user)
+        return table
+
+    def login(self, user):
+        session = SessionStore()
+        session[SESSION_KEY] = str(user.pk)
+        session[BACKEND_SESSION_KEY] = next(
+            path for path in settings.AUTHENTICATION_BACKENDS if hasattr(load_backend(path), "get_user")
+        )
+        session[HASH_SESSION_KEY] = user.get_session_auth_hash()
+        session.create()
+        return session.session_key
+
+    def serve(self, server, options):
+        return _Server(
+            [
+                sys.executable, "-m", "gunicorn",
+                "-b", f"127.0.0.1:{options['port']}",
+                "-w", str(options["workers"]),
+                *SERVERS[server],
+            ],
+            {**os.environ, "SIMULATED_DB_LATENCY_MS": str(options["latency_ms"])},
+            options["port"],
+        )
+
+    def load(self, port, path, cookie, total, concurrency):
+        def fetch(_):
+            connection = http.client.HTTPConnection("127.0.0.1", port, timeout=60)
+            started = time.perf_counter()
+            try:
+                connection.request("GET", path, headers={"Cookie": cookie})
+                response = connection.getresponse()
+                response.read()
+                ok = response.status == 200
+            except OSError:
+                response, ok = None, False
+            finally:
+                connection.close()
+            return ok, (time.perf_counter() - started) * 1000, response
+
+        # Keep the CSRF cookie like a browser would, otherwise every request
+        # gets a new secret and misses the per-viewer fragment cache
+        ok, ms, response = fetch(None)
+        if not ok:
+            raise CommandError(f"{path} answered {response.status if response else 'nothing'}")
+        for header in response.headers.get_all("Set-Cookie", []):
+            csrf = SimpleCookie(header).get(settings.CSRF_COOKIE_NAME)
+            if csrf:
+                cookie = f"{cookie}; {settings.CSRF_COOKIE_NAME}={csrf.value}"
+
+        started = time.perf_counter()
+        with ThreadPoolExecutor(concurrency) as pool:
+            results = list(pool.map(fetch, range(total)))
+        elapsed = time.perf_counter() - started
+
+        latencies = sorted(ms for ok, ms, response in results if ok)
+        if not latencies:
+            raise CommandError(f"Every request to {path} failed")
+        percentiles = statistics.quantiles(latencies, n=100)
+        return {
+            "throughput": len(latencies) / elapsed,
+            "p50": percentiles[49],
+            "p99": percentiles[98],
+            "errors": total - len(latencies),
+        }
+
+
+class _Server:
+    def __init__(self, argv, env, port):
+        self.argv, self.env, self.port = argv, env, port
+
+    def __enter__(self):
+        self.process = subprocess.Popen(
+            self.argv, env=self.env, cwd=settings.BASE_DIR,
+            stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL,
+        )
+        deadline = time.monotonic() + 30
+        while time.monotonic() < deadline:
+            if self.process.poll() is not None:
+                raise CommandError(f"Server exited: {' '.join(self.argv)}")
+            try:
+                socket.create_connection(("127.0.0.1", self.port), timeout=1).close()
+                return self
+            except OSError:
+                time.sleep(0.2)
+        self.__exit__()
+        raise CommandError("Server did not start in 30s")
+
+    def __exit__(self, *exc):
+        self.process.terminate()
+        self.process.wait(timeout=30)
@@ -0,0 +1,79 @@
+import time
+
+from django.core.cache import caches
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection, transaction
+from django.test import Client, override_settings
+from django.urls import reverse
+
+from tables.models import Table
+from tables.seeding import seed
+
+# Session engine and user cache of each setup
+SETUPS = {
+    "database": {"SESSION_ENGINE": "django.contrib.sessions.backends.db", "USER_CACHE_SECONDS": 0},
+    "cache": {"SESSION_ENGINE": "app.sessions", "USER_CACHE_SECONDS": 300},
+}
+PAGES = ("tables_list_view", "leaderboard_view")
+TABLE_PAGES = ("table_object_view", "game_list_view", "comment_list_view")
+
+
+class Command(BaseCommand):
+    help = (
+        "Counts the queries per authenticated request with database sessions and an "
+        "uncached user, and with cached sessions and the cached user loader."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--requests", type=int, default=20, help="Requests per page and setup.")
+
+    def handle(self, *args, requests, **options):
+        if requests < 1:
+            raise CommandError("--requests must be at least 1")
+        with transaction.atomic():
+            seed(users=30, tables=20, prefix="bench-sessions")
+            table = Table.objects.filter(name__startswith="bench-sessions").order_by("pk").first()
+            results = {setup: self.run(table, SETUPS[setup], requests) for setup in SETUPS}
+            transaction.set_rollback(True)
+
+        self.stdout.write(f"{'setup':<10}{'queries/req':>13}{'session':>9}{'user':>7}{'ms/req':>9}")
+        for setup, result in results.items():
+            self.stdout.write(
+                f"{setup:<10}{result['queries']:>13.2f}{result['session']:>9.2f}"
+                f"{result['user']:>7.2f}{result['ms']:>9.2f}"
+            )
+        saved = results["database"]["queries"] - results["cache"]["queries"]
+        self.stdout.write(self.style.SUCCESS(f"Cached sessions and users save {saved:.2f} queries per request"))
+
+    def run(self, table, setup, requests):
+        caches["default"].clear()
+        totals = {"queries": 0, "session": 0, "user": 0, "ms": 0.0}
+
+        def count(execute, sql, params, many, context):
+            totals["queries"] += 1
+            if "django_session" in sql:
+                totals["session"] += 1
+            # The user loaded for request.user, not users shown on the page
+            elif sql.startswith('SELECT "auth_user"') and "LIMIT 21" in sql:
+                totals["user"] += 1
+            return execute(sql, params, many, context)
+
+        # Seeded rows only exist on the primary
+        with override_settings(
+            ALLOWED_HOSTS=["testserver"], REQUEST_TIMING_SAMPLE_RATE=0, DATABASE_ROUTERS=[], THROTTLE_ENABLED=False, **setup
+        ):
+            client = Client()
+            client.force_login(table.dealer)
+            urls = [reverse(name) for name in PAGES] + [reverse(name, args=[table.pk]) for name in TABLE_PAGES]
+            # Fill the caches first, like any long-lived session
+            for url in urls:
+                client.get(url, secure=True)
+            with connection.execute_wrapper(count):
+                for _ in range(requests):
+                    for url in urls:
+                        started = time.perf_counter()
+                        response = client.get(url, secure=True)
+                        totals["ms"] += (time.perf_counter() - started) * 1000
+                        if response.status_code != 200:
+                            raise CommandError(f"{url}: status {response.status_code}")
+        return {key: value / (requests * len(urls)) for key, value in totals.items()}
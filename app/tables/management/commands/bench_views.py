@@ -0,0 +1,226 @@
+import json
+import logging
+import platform
+import statistics
+import time
+from pathlib import Path
+
+from django.contrib.auth.models import User
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection, transaction
+from django.db.models import F
+from django.test import Client, override_settings
+from django.urls import URLResolver, get_resolver, reverse
+from django.urls.resolvers import RoutePattern
+from django.utils import timezone
+
+from comments.models import Comment
+from games.models import Game
+from tables.models import TableMembership
+from tables.seeding import seed
+
+# Routes of these modules are benchmarked; admin, auth and dev tooling are not ours to tune
+URLCONFS = {"app.urls", "tables.urls", "games.urls", "comments.urls", "stats.urls"}
+
+# Only ever POSTed from buttons on other pages, they have no page to GET
+POST_ONLY = {"table_delete_view", "game_delete_view", "comment_delete_view"}
+
+# Visitors with different visibility of the benchmarked table
+PERSONAS = ("dealer", "player", "outsider", "anonymous")
+
+# Compared against the baseline; the tail of a few dozen requests is mostly noise,
+# and timings only mean something on the same machine
+LATENCY_KEY = "p50_ms"
+
+
+def iter_routes(resolver=None, params=()):
+    """Yield ``(url name, parameter names)`` of every named route of ``URLCONFS``."""
+    resolver = resolver or get_resolver()
+    for entry in resolver.url_patterns:
+        names = (*params, *_parameters(entry.pattern))
+        if isinstance(entry, URLResolver):
+            # admin.site.urls is a list of patterns, not a module
+            if getattr(entry.urlconf_name, "__name__", None) in URLCONFS:
+                yield from iter_routes(entry, names)
+        elif entry.name:
+            yield entry.name, names
+
+
+def _parameters(pattern):
+    if isinstance(pattern, RoutePattern):
+        return tuple(pattern.converters)
+    return tuple(pattern.regex.groupindex)
+
+
+def percentile(samples, q):
+    if len(samples) == 1:
+        return samples[0]
+    return statistics.quantiles(samples, n=100, method="inclusive")[q - 1]
+
+
+class Command(BaseCommand):
+    help = (
+        "Requests every route of the project's URLconfs as a dealer, a player, an outsider "
+        "and an anonymous visitor of one table. Records p50/p95/p99 latency, SQL queries and "
+        "response bytes, writes them to JSON and compares them with a baseline."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--repeat", type=int, default=20, help="Timed requests per route and persona.")
+        parser.add_argument("--warmup", type=int, default=2, help="Untimed requests first, to fill caches.")
+        parser.add_argument(
+            "--no-seed", action="store_true",
+            help="Use the data in the database (e.g. from seed_load) instead of a seeded, rolled back dataset.",
+        )
+        parser.add_argument("--tables", type=int, default=200, help="Tables to seed.")
+        parser.add_argument("--users", type=int, default=100, help="Users to seed.")
+        parser.add_argument("--output", help="Write the results to this JSON file.")
+        parser.add_argument("--baseline", help="Compare with the results stored in this JSON file.")
+        parser.add_argument(
+            "--tolerance", type=float, default=0.5,
+            help="Allowed relative p50 growth over the baseline before it counts as a regression.",
+        )
+        parser.add_argument(
+            "--min-delta-ms", type=float, default=5.0,
+            help="p50 growth below this many ms is noise, not a regression.",
+        )
+
+    def handle(self, *args, repeat, warmup, no_seed, tables, users, output, baseline, **options):
+        if repeat < 1:
+            raise CommandError("--repeat must be at least 1")
+        with transaction.atomic():
+            if not no_seed:
+                seed(users=users, tables=tables, prefix="bench-views")
+            results = self.run(repeat, warmup)
+            transaction.set_rollback(True)
+
+        report = {
+            "meta": {
+                "created": timezone.now().isoformat(),
+                "database": connection.vendor,
+                "python": platform.python_version(),
+                "repeat": repeat,
+                "seeded": None if no_seed else {"tables": tables, "users": users},
+            },
+            "results": results,
+        }
+        if output:
+            Path(output).write_text(json.dumps(report, indent=2, sort_keys=True) + "\n")
+            self.stdout.write(f"Results written to {output}")
+        if baseline:
+            self.compare(results, json.loads(Path(baseline).read_text())["results"], options)
+
+    def fixtures(self):
+        membership = (
+            TableMembership.objects.filter(role=TableMembership.Role.PLAYER)
+            .exclude(user_id=F("table__dealer_id"))
+            .order_by("-games", "pk")
+            .first()
+        )
+        if membership is None:
+            raise CommandError("No games to benchmark, don't use --no-seed on an empty database")
+        table = membership.table
+        members = TableMembership.objects.filter(table=table).values("user_id")
+        outsider = User.objects.exclude(pk__in=members).filter(is_superuser=False).order_by("pk").first()
+        if outsider is None:
+            raise CommandError("Every user plays at the benchmarked table, seed more users")
+
+        params = {
+            "pk": table.pk,
+            "game_pk": Game.objects.filter(table=table).order_by("pk").values_list("pk", flat=True).first(),
+            "comment_pk": Comment.objects.filter(table=table).order_by("pk").values_list("pk", flat=True).first(),
+            "kind": "games",
+            "fmt": "csv",
+        }
+        personas = {"dealer": table.dealer, "player": membership.user, "outsider": outsider, "anonymous": None}
+        return params, personas
+
+    def run(self, repeat, warmup):
+        params, personas = self.fixtures()
+        routes = [(name, names) for name, names in iter_routes() if name not in POST_ONLY]
+        results = {}
+        self.stdout.write(
+            f"{'route':<28}{'persona':<10}{'status':>6}{'p50 ms':>9}{'p95 ms':>9}{'p99 ms':>9}{'SQL':>6}{'bytes':>9}"
+        )
+        # 403s and 404s are expected for some personas, don't log a traceback for each
+        request_logger = logging.getLogger("django.request")
+        level = request_logger.level
+        request_logger.setLevel(logging.ERROR)
+        # Request logging would swamp the output, and seeded rows only exist on the primary
+        settings = override_settings(
+            ALLOWED_HOSTS=["testserver"], REQUEST_TIMING_SAMPLE_RATE=0, DATABASE_ROUTERS=[], THROTTLE_ENABLED=False
+        )
+        try:
+            with settings:
+                self.run_personas(params, personas, routes, repeat, warmup, results)
+        finally:
+            request_logger.setLevel(level)
+        return results
+
+    def run_personas(self, params, personas, routes, repeat, warmup, results):
+        for persona in PERSONAS:
+            client = Client(raise_request_exception=False)
+            if personas[persona] is not None:
+                client.force_login(personas[persona])
+            for name, names in routes:
+                if any(params.get(param) is None for param in names):
+                    self.stdout.write(self.style.WARNING(f"{name}: no value for {names}, skipped"))
+                    continue
+                url = reverse(name, kwargs={param: params[param] for param in names})
+                result = self.measure(client, url, repeat, warmup)
+                results[f"{name} {persona}"] = result
+                self.stdout.write(
+                    f"{name:<28}{persona:<10}{result['status']:>6}{result['p50_ms']:>9.1f}"
+                    f"{result['p95_ms']:>9.1f}{result['p99_ms']:>9.1f}{result['queries']:>6}{result['bytes']:>9}"
+                )
+
+    def measure(self, client, url, repeat, warmup):
+        queries = []
+
+        def count(execute, sql, params, many, context):
+            queries.append(sql)
+            return execute(sql, params, many, context)
+
+        timings = []
+        for attempt in range(warmup + repeat):
+            queries.clear()
+            with connection.execute_wrapper(count):
+                started = time.perf_counter()
+                response = client.get(url, secure=True)
+                body = b"".join(response.streaming_content) if response.streaming else response.content
+                elapsed = (time.perf_counter() - started) * 1000
+            if attempt >= warmup:
+                timings.append(elapsed)
+
+        return {
+            "path": url,
+            "status": response.status_code,
+            "p50_ms": round(percentile(timings, 50), 2),
+            "p95_ms": round(percentile(timings, 95), 2),
+            "p99_ms": round(percentile(timings, 99), 2),
+            "queries": len(queries),
+            "bytes": len(body),
+        }
+
+    def compare(self, results, baseline, options):
+        regressions = []
+        for key, result in sorted(results.items()):
+            before = baseline.get(key)
+            if before is None:
+                self.stdout.write(f"new: {key}")
+                continue
+            if result["status"] != before["status"]:
+                regressions.append(f"{key}: status {before['status']} -> {result['status']}")
+            if result["queries"] > before["queries"]:
+                regressions.append(f"{key}: {before['queries']} -> {result['queries']} queries")
+            latency, old = result[LATENCY_KEY], before[LATENCY_KEY]
+            if latency > old * (1 + options["tolerance"]) and latency - old > options["min_delta_ms"]:
+                regressions.append(f"{key}: p50 {old:.1f} -> {latency:.1f} ms")
+        for key in sorted(baseline.keys() - results.keys()):
+            self.stdout.write(f"gone: {key}")
+
+        if regressions:
+            for regression in regressions:
+                self.stdout.write(self.style.ERROR(regression))
+            raise CommandError(f"{len(regressions)} regressions against the baseline")
+        self.stdout.write(self.style.SUCCESS("No regressions against the baseline"))
@@ -0,0 +1,154 @@
+import json
+import re
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection, transaction
+from django.test import Client, override_settings
+from django.urls import reverse
+
+from tables.models import TableMembership
+from tables.seeding import seed
+
+# `FROM "table" alias` / `JOIN "table" AS "alias"`, SQLite plans name tables by alias
+TABLE_ALIAS = re.compile(r'(?:FROM|JOIN)\s+"(\w+)"\s+(?:AS\s+)?"?(\w+)"?', re.IGNORECASE)
+
+# Hot read views, as (name, url of a table the user plays at)
+VIEWS = (
+    ("tables list", lambda table_id: reverse("tables_list_view")),
+    ("table detail", lambda table_id: reverse("table_object_view", args=[table_id])),
+    ("games", lambda table_id: reverse("game_list_view", args=[table_id])),
+    ("comments", lambda table_id: reverse("comment_list_view", args=[table_id])),
+    ("table leaderboard", lambda table_id: reverse("table_leaderboard_view", args=[table_id])),
+    ("settlement", lambda table_id: reverse("table_settlement_view", args=[table_id])),
+    ("leaderboard", lambda table_id: reverse("leaderboard_view")),
+    ("user search", lambda table_id: f"{reverse('user_search_view')}?q=p&table={table_id}"),
+    ("search", lambda table_id: f"{reverse('search_view')}?q=table"),
+)
+
+
+class Command(BaseCommand):
+    help = (
+        "Requests the hot read views against a seeded dataset, EXPLAINs every SELECT they "
+        "run and fails if a plan contains a sequential scan of a large table. The seeded "
+        "rows are rolled back afterwards."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--no-seed", action="store_true", help="Check against the data already in the database.")
+        parser.add_argument("--tables", type=int, default=1000, help="Tables to seed (10 games and 5 comments each).")
+        parser.add_argument("--users", type=int, default=200, help="Users to seed.")
+        parser.add_argument(
+            "--min-rows", type=int, default=1000,
+            help="Sequential scans of tables with fewer rows than this are ignored.",
+        )
+
+    def handle(self, *args, no_seed, tables, users, min_rows, **options):
+        self.min_rows = min_rows
+        self.row_counts = {}
+        with transaction.atomic():
+            if not no_seed:
+                started = time.perf_counter()
+                seed(users=users, tables=tables, prefix="plan-check")
+                self.stdout.write(f"Seeded {tables} tables in {time.perf_counter() - started:.1f}s")
+            with connection.cursor() as cursor:
+                # Fresh planner statistics, or small-table plans get picked for big tables
+                cursor.execute("ANALYZE")
+            findings = self.check_views()
+            transaction.set_rollback(True)
+
+        if findings:
+            raise CommandError(f"{findings} sequential scans of large tables")
+        self.stdout.write(self.style.SUCCESS("No sequential scans of large tables"))
+
+    def check_views(self):
+        membership = (
+            TableMembership.objects.filter(role=TableMembership.Role.PLAYER)
+            .select_related("user")
+            .order_by("-games", "pk")
+            .first()
+        )
+        if membership is None:
+            raise CommandError("No games to check against, don't use --no-seed on an empty database")
+
+        findings = 0
+        # Every query has to hit the database: no cache, and no replica that lacks the seeded rows
+        with override_settings(
+            ALLOWED_HOSTS=["testserver"],
+            CACHES={"default": {"BACKEND": "django.core.cache.backends.dummy.DummyCache"}},
+            DATABASE_ROUTERS=[],
+        ):
+            client = Client()
+            client.force_login(membership.user)
+            for name, url in VIEWS:
+                queries = []
+                with connection.execute_wrapper(self.recorder(queries)):
+                    response = client.get(url(membership.table_id), secure=True)
+                if response.status_code != 200:
+                    raise CommandError(f"{name}: status {response.status_code}")
+
+                selects = [(sql, params) for sql, params in queries if self.is_select(sql)]
+                scans = [scan for sql, params in selects for scan in self.large_scans(sql, params)]
+                findings += len(scans)
+                style = self.style.ERROR if scans else self.style.SUCCESS
+                self.stdout.write(style(f"{name}: {len(selects)} queries, {len(scans)} large sequential scans"))
+                for table, rows, sql in scans:
+                    self.stdout.write(f"  {table} ({rows} rows): {sql}")
+        return findings
+
+    def recorder(self, queries):
+        def record(execute, sql, params, many, context):
+            if not many:
+                queries.append((sql, params))
+            return execute(sql, params, many, context)
+        return record
+
+    def is_select(self, sql):
+        return sql.lstrip().upper().startswith(("SELECT", "WITH"))
+
+    def large_scans(self, sql, params):
+        """Yield ``(table, rows, sql)`` for each sequential scan of a table of ``min_rows`` or more."""
+        for table in self.sequential_scans(sql, params):
+            rows = self.row_count(table)
+            if rows >= self.min_rows:
+                yield table, rows, sql
+
+    def sequential_scans(self, sql, params):
+        with connection.cursor() as cursor:
+            if connection.vendor == "postgresql":
+                cursor.execute(f"EXPLAIN (FORMAT JSON) {sql}", params)
+                plan = cursor.fetchone()[0]
+                nodes = [(json.loads(plan) if isinstance(plan, str) else plan)[0]["Plan"]]
+                while nodes:
+                    node = nodes.pop()
+                    nodes.extend(node.get("Plans", ()))
+                    if node["Node Type"] == "Seq Scan":
+                        yield node["Relation Name"]
+            elif connection.vendor == "sqlite":
+                cursor.execute(f"EXPLAIN QUERY PLAN {sql}", params)
+                aliases = {alias: table for table, alias in TABLE_ALIAS.findall(sql)}
+                for *_, detail in cursor.fetchall():
+                    # "SCAN games_game" reads the whole table, "SCAN ... USING INDEX" and SEARCH don't
+                    words = detail.split()
+                    if words[0] == "SCAN" and "USING" not in words and not words[1].startswith("("):
+                        # Full-text tables: "VIRTUAL TABLE INDEX 0:M1" searches the index, "0:" reads every row
+                        if "VIRTUAL" in words and not words[-1].endswith(":"):
+                            continue
+                        yield aliases.get(words[1], words[1])
+            else:
+                raise CommandError(f"Query plans of {connection.vendor} aren't supported")
+
+    def known_tables(self):
+        if not hasattr(self, "_tables"):
+            self._tables = set(connection.introspection.table_names())
+        return self._tables
+
+    def row_count(self, table):
+        if table not in self.row_counts:
+            if table not in self.known_tables():
+                self.row_counts[table] = 0
+            else:
+                with connection.cursor() as cursor:
+                    cursor.execute(f"SELECT COUNT(*) FROM {connection.ops.quote_name(table)}")
+                    self.row_counts[table] = cursor.fetchone()[0]
+        return self.row_counts[table]
@@ -0,0 +1,28 @@
+from django.core.management.base import BaseCommand, CommandError
+
+from tables.export import EXPORTS, FORMATS, iter_export
+from tables.models import Table
+
+
+class Command(BaseCommand):
+    help = "Streams a table's games or comments as CSV or JSON lines, like tables/<pk>/export/."
+
+    def add_arguments(self, parser):
+        parser.add_argument("table_id", type=int)
+        parser.add_argument("--kind", choices=EXPORTS, default="games")
+        parser.add_argument("--format", choices=FORMATS, default="csv")
+        parser.add_argument("--output", "-o", help="File to write to, stdout by default.")
+
+    def handle(self, *args, table_id, kind, format, output, **options):
+        try:
+            table = Table.objects.get(pk=table_id)
+        except Table.DoesNotExist:
+            raise CommandError(f"Table {table_id} does not exist")
+
+        lines = iter_export(table, kind, format)
+        if output:
+            with open(output, "w", newline="", encoding="utf-8") as stream:
+                stream.writelines(lines)
+        else:
+            for line in lines:
+                self.stdout.write(line, ending="")
@@ -0,0 +1,25 @@
+from django.core.management.base import BaseCommand, CommandError
+
+from tables.memberships import find_drift, rebuild_memberships
+from tables.models import TableMembership
+
+
+class Command(BaseCommand):
+    help = "Checks TableMembership against tables, games and players and rebuilds it if it drifted."
+
+    def add_arguments(self, parser):
+        parser.add_argument("--check", action="store_true", help="Only report drift, exit with an error if found.")
+
+    def handle(self, *args, check, **options):
+        missing, stale = find_drift()
+        if not missing and not stale:
+            self.stdout.write(self.style.SUCCESS("Memberships are consistent"))
+            return
+
+        message = f"{missing} membership rows missing, {stale} stale"
+        if check:
+            raise CommandError(message)
+
+        self.stdout.write(self.style.WARNING(message))
+        rebuild_memberships()
+        self.stdout.write(self.style.SUCCESS(f"Rebuilt {TableMembership.objects.count()} memberships"))
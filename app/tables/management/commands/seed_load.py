@@ -0,0 +1,49 @@
+import random
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+
+from app import db_router
+from tables.seeding import seed
+
+
+class Command(BaseCommand):
+    help = (
+        "Generates a synthetic dataset with bulk inserts: users, tables dealt by them, "
+        "games with players drawn from each table's circle of regulars, and comments."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--users", type=int, default=1000)
+        parser.add_argument("--tables-per-user", type=float, default=2, help="May be fractional, e.g. 0.1.")
+        parser.add_argument("--games-per-table", type=int, default=20)
+        parser.add_argument("--players-per-game", type=int, default=5)
+        parser.add_argument("--comments-per-table", type=int, default=5)
+        parser.add_argument("--prefix", default="load", help="Usernames are <prefix>-<n>, pick a new one per run.")
+        parser.add_argument("--random-seed", type=int, default=0, help="Same seed, same dataset.")
+
+    def handle(self, *args, users, tables_per_user, games_per_table, players_per_game, comments_per_table,
+               prefix, random_seed, **options):
+        if users < 1:
+            raise CommandError("--users must be at least 1")
+        tables = round(users * tables_per_user)
+
+        started = time.perf_counter()
+        # seed() reads back the ids of the rows it inserts
+        with db_router.primary():
+            counts = seed(
+                users=users,
+                tables=tables,
+                games=games_per_table,
+                players=players_per_game,
+                comments=comments_per_table,
+                prefix=prefix,
+                rng=random.Random(random_seed),
+            )
+        elapsed = time.perf_counter() - started
+        rows = sum(counts.values())
+        self.stdout.write(self.style.SUCCESS(
+            f"Created {counts['users']} users, {counts['tables']} tables, {counts['games']} games, "
+            f"{counts['players']} player rows and {counts['comments']} comments "
+            f"in {elapsed:.1f}s ({rows / max(elapsed, 1e-9):.0f} rows/s)"
+        ))
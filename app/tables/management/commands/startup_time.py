@@ -0,0 +1,141 @@
+import json
+import os
+import statistics
+import subprocess
+import sys
+import time
+from pathlib import Path
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+
+# Runs in a fresh interpreter and prints the time of each startup phase in ms.
+# The first request goes straight to the WSGI/ASGI callable, like the first one
+# a new worker serves.
+PROBE = """
+import time
+started = time.perf_counter()
+import json, os, sys
+os.environ.setdefault("DJANGO_SETTINGS_MODULE", "app.settings")
+phases = {}
+def mark(name):
+    global started
+    now = time.perf_counter()
+    phases[name] = (now - started) * 1000
+    started = now
+
+import django
+mark("import_django")
+from app import warmup
+if sys.argv[1] == "asgi":
+    import asyncio
+    from app.asgi import application
+else:
+    from app.wsgi import application
+mark("load_app")
+warmup.warm_up()
+mark("warm_up")
+warmup.connect_databases()
+mark("connect_databases")
+
+path, statuses = sys.argv[2], []
+for attempt in ("first_request", "second_request"):
+    if sys.argv[1] == "asgi":
+        async def request():
+            messages = [{"type": "http.request", "body": b""}]
+            async def receive():
+                # Django stops the request when the client disconnects, so never do
+                return messages.pop() if messages else await asyncio.Future()
+            async def send(message):
+                if message["type"] == "http.response.start":
+                    statuses.append(message["status"])
+            scope = {"type": "http", "method": "GET", "path": path, "query_string": b"", "headers": [
+                (b"host", b"localhost")], "scheme": "http", "server": ("localhost", 80)}
+            await application(scope, receive, send)
+        asyncio.run(request())
+    else:
+        from wsgiref.util import setup_testing_defaults
+        environ = {"PATH_INFO": path, "HTTP_HOST": "localhost"}
+        setup_testing_defaults(environ)
+        b"".join(application(environ, lambda status, headers: statuses.append(int(status[:3]))))
+    mark(attempt)
+print(json.dumps({"phases": phases, "status": statuses[0]}))
+"""
+
+
+class Command(BaseCommand):
+    help = (
+        "Measures how long a fresh process takes to import Django and the app, warm up "
+        "and serve its first request, and lists the packages slowest to import."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--server", choices=("wsgi", "asgi"), default="wsgi")
+        parser.add_argument("--runs", type=int, default=5, help="Fresh processes started; medians are reported.")
+        parser.add_argument("--path", default="/", help="Page of the first request.")
+        parser.add_argument("--imports", type=int, default=10, help="Slowest packages to list.")
+        parser.add_argument("--output", help="Write the results to this JSON file.")
+        parser.add_argument("--max-ms", type=float, help="Fail when the median total exceeds this many ms.")
+
+    def handle(self, *args, server, runs, path, imports, output, max_ms, **options):
+        if runs < 1:
+            raise CommandError("--runs must be at least 1")
+        samples = [self.start(server, path) for _ in range(runs)]
+
+        phases = {name: statistics.median(sample["phases"][name] for sample in samples) for name in samples[0]["phases"]}
+        total = statistics.median(sample["total"] for sample in samples)
+        self.stdout.write(f"{server}, {path}: status {samples[0]['status']}, median of {runs} runs")
+        for name, ms in phases.items():
+            self.stdout.write(f"  {name:<20}{ms:>9.1f} ms")
+        self.stdout.write(f"  {'total':<20}{total:>9.1f} ms (interpreter start to second response)")
+
+        slowest = self.slowest_imports(samples[0]["imports"], imports)
+        if slowest:
+            self.stdout.write("Slowest packages to import:")
+            for module, ms in slowest:
+                self.stdout.write(f"  {module:<40}{ms:>9.1f} ms")
+
+        if output:
+            report = {
+                "server": server,
+                "path": path,
+                "runs": runs,
+                "status": samples[0]["status"],
+                "phases_ms": {name: round(ms, 2) for name, ms in phases.items()},
+                "total_ms": round(total, 2),
+                "imports_ms": {module: round(ms, 2) for module, ms in slowest},
+            }
+            Path(output).write_text(json.dumps(report, indent=2) + "\n")
+            self.stdout.write(f"Results written to {output}")
+        if max_ms is not None and total > max_ms:
+            raise CommandError(f"Startup took {total:.0f} ms, more than {max_ms:.0f} ms")
+
+    def start(self, server, path):
+        started = time.perf_counter()
+        process = subprocess.run(
+            [sys.executable, "-X", "importtime", "-c", PROBE, server, path],
+            cwd=settings.BASE_DIR,
+            env={**os.environ, "DJANGO_SETTINGS_MODULE": "app.settings"},
+            capture_output=True,
+            text=True,
+        )
+        total = (time.perf_counter() - started) * 1000
+        if process.returncode:
+            errors = "\n".join(line for line in process.stderr.splitlines() if not line.startswith("import time:"))
+            raise CommandError(f"Startup failed:\n{errors[-2000:]}")
+        result = json.loads(process.stdout.strip().splitlines()[-1])
+        return {**result, "total": total, "imports": process.stderr}
+
+    @staticmethod
+    def slowest_imports(importtime, count):
+        """Import time of each top-level package, summed over all of its modules."""
+        packages = {}
+        # Lines look like "import time: self [us] | cumulative | imported package"
+        for line in importtime.splitlines():
+            if not line.startswith("import time:"):
+                continue
+            own, _, module = line.removeprefix("import time:").split("|", 2)
+            if own.strip().isdigit():
+                package = module.strip().split(".")[0]
+                packages[package] = packages.get(package, 0) + int(own) / 1000
+        return sorted(packages.items(), key=lambda item: item[1], reverse=True)[:count]
@@ -0,0 +1,112 @@
+from django.db import connection, models, transaction
+
+from .models import Table, TableMembership
+
+Role = TableMembership.Role
+
+
+def remember_roles(table):
+    # Read from __dict__: a deferred field would be loaded by a new query
+    table._membership_roles = {
+        Role.DEALER: table.__dict__.get("dealer_id"),
+        Role.CREATOR: table.__dict__.get("creator_id"),
+    }
+
+
+def sync_roles(table, created):
+    """Move the dealer/creator memberships of ``table`` to its current users."""
+    old = {} if created else getattr(table, "_membership_roles", {})
+    current = {Role.DEALER: table.dealer_id, Role.CREATOR: table.creator_id}
+    for role, user_id in current.items():
+        if role in old and old[role] == user_id:
+            continue
+        TableMembership.objects.filter(table_id=table.pk, role=role).exclude(user_id=user_id).delete()
+        if user_id is not None:
+            TableMembership.objects.bulk_create(
+                [TableMembership(table_id=table.pk, user_id=user_id, role=role)], ignore_conflicts=True
+            )
+    table._membership_roles = current
+
+
+def bump_players(table_id, deltas):
+    """Add ``{user_id: games}`` (may be negative) to player memberships of one table.
+
+    A constant number of statements however many users are given.
+    """
+    deltas = {pk: delta for pk, delta in deltas.items() if pk is not None and delta}
+    if not deltas:
+        return
+
+    rows = TableMembership.objects.filter(table_id=table_id, user_id__in=deltas, role=Role.PLAYER)
+    whens = [models.When(user_id=pk, then=models.Value(delta)) for pk, delta in deltas.items()]
+    with transaction.atomic():
+        TableMembership.objects.bulk_create(
+            [TableMembership(table_id=table_id, user_id=pk, role=Role.PLAYER, games=0) for pk in deltas],
+            ignore_conflicts=True,
+        )
+        rows.update(games=models.F("games") + models.Case(*whens, default=models.Value(0)))
+        rows.filter(games__lte=0).delete()
+
+
+def _expected_sql(table_ids):
+    """SELECT of every membership row the source tables imply."""
+    from games.models import Game
+
+    qn = connection.ops.quote_name
+    tables = qn(Table._meta.db_table)
+    games = qn(Game._meta.db_table)
+    players = qn(Game.players.through._meta.db_table)
+
+    ids = [] if table_ids is None else list(table_ids)
+
+    def only_tables(column):
+        if table_ids is None:
+            return ""
+        return f"AND {column} IN ({', '.join(['%s'] * len(ids))})"
+
+    sql = f"""
+        SELECT t.id AS table_id, t.dealer_id AS user_id, %s AS role, 1 AS games
+        FROM {tables} t WHERE t.dealer_id IS NOT NULL {only_tables("t.id")}
+        UNION ALL
+        SELECT t.id, t.creator_id, %s, 1
+        FROM {tables} t WHERE t.creator_id IS NOT NULL {only_tables("t.id")}
+        UNION ALL
+        SELECT g.table_id, p.user_id, %s, COUNT(*)
+        FROM {players} p JOIN {games} g ON g.id = p.game_id
+        WHERE 1 = 1 {only_tables("g.table_id")}
+        GROUP BY g.table_id, p.user_id
+    """
+    return sql, [Role.DEALER.value, *ids, Role.CREATOR.value, *ids, Role.PLAYER.value, *ids]
+
+
+def rebuild_memberships(table_ids=None):
+    """Recompute memberships (of ``table_ids``, or all) in a few set-based statements."""
+    if table_ids is not None and not table_ids:
+        return
+    table_ids = None if table_ids is None else list(table_ids)
+    expected, params = _expected_sql(table_ids)
+    memberships = connection.ops.quote_name(TableMembership._meta.db_table)
+
+    with transaction.atomic(), connection.cursor() as cursor:
+        if table_ids is None:
+            cursor.execute(f"DELETE FROM {memberships}")
+        else:
+            cursor.execute(
+                f"DELETE FROM {memberships} WHERE table_id IN ({', '.join(['%s'] * len(table_ids))})",
+                table_ids,
+            )
+        cursor.execute(
+            f"INSERT INTO {memberships} (table_id, user_id, role, games) {expected}", params
+        )
+
+
+def find_drift():
+    """Return ``(missing, stale)``: expected rows absent and stored rows not expected."""
+    expected, params = _expected_sql(None)
+    stored = f"SELECT table_id, user_id, role, games FROM {connection.ops.quote_name(TableMembership._meta.db_table)}"
+    with connection.cursor() as cursor:
+        cursor.execute(f"SELECT COUNT(*) FROM (SELECT * FROM ({expected}) e EXCEPT {stored}) d", params)
+        missing = cursor.fetchone()[0]
+        cursor.execute(f"SELECT COUNT(*) FROM ({stored} EXCEPT SELECT * FROM ({expected}) e) d", params)
+        stale = cursor.fetchone()[0]
+    return missing, stale
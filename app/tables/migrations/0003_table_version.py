@@ -0,0 +1,18 @@
+# Generated by Django 6.1.2 on 2026-10-18 15:59
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('tables', '0002_table_creator'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='table',
+            name='version',
+            field=models.PositiveIntegerField(default=0, editable=False),
+        ),
+    ]
@@ -0,0 +1,20 @@
+# Generated by Django 6.1.2 on 2026-10-18 16:04
+
+import django.utils.timezone
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("tables", "0003_table_version"),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="table",
+            name="updated_at",
+            field=models.DateTimeField(auto_now=True, default=django.utils.timezone.now),
+            preserve_default=False,
+        ),
+    ]
@@ -0,0 +1,24 @@
+# Generated by Django 6.1.2 on 2026-10-18 16:31
+
+import django.utils.timezone
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('tables', '0004_table_updated_at'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='table',
+            name='import_key',
+            field=models.CharField(blank=True, editable=False, max_length=255, null=True, unique=True),
+        ),
+        migrations.AlterField(
+            model_name='table',
+            name='play_date',
+            field=models.DateTimeField(default=django.utils.timezone.now, editable=False),
+        ),
+    ]
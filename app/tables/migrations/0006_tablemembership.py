@@ -0,0 +1,56 @@
+# Generated by Django 6.1.2 on 2026-10-18 16:36
+
+from itertools import batched
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+
+
+def backfill_memberships(apps, schema_editor):
+    Table = apps.get_model("tables", "Table")
+    TableMembership = apps.get_model("tables", "TableMembership")
+    Players = apps.get_model("games", "Game").players.through
+
+    def rows():
+        for table_id, dealer_id, creator_id in Table.objects.values_list("pk", "dealer_id", "creator_id").iterator():
+            for role, user_id in (("dealer", dealer_id), ("creator", creator_id)):
+                if user_id is not None:
+                    yield TableMembership(table_id=table_id, user_id=user_id, role=role, games=1)
+        players = (
+            Players.objects.values("game__table_id", "user_id")
+            .annotate(games=models.Count("pk"))
+            .order_by()
+        )
+        for row in players.iterator():
+            yield TableMembership(table_id=row["game__table_id"], user_id=row["user_id"], role="player", games=row["games"])
+
+    for batch in batched(rows(), 1000):
+        TableMembership.objects.bulk_create(batch)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('tables', '0005_table_import_key_alter_table_play_date'),
+        ('games', '0002_game_import_key'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='TableMembership',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('role', models.CharField(choices=[('dealer', 'Dealer'), ('creator', 'Creator'), ('player', 'Player')], max_length=8)),
+                ('games', models.IntegerField(default=1)),
+                ('table', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='memberships', to='tables.table')),
+                ('user', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='table_memberships', to=settings.AUTH_USER_MODEL)),
+            ],
+            options={
+                'indexes': [models.Index(fields=['user', 'table'], name='tables_membership_user_table')],
+                'constraints': [models.UniqueConstraint(fields=('table', 'user', 'role'), name='unique_table_membership')],
+            },
+        ),
+        migrations.RunPython(backfill_memberships, migrations.RunPython.noop),
+    ]
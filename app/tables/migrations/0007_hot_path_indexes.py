@@ -0,0 +1,27 @@
+# Generated by Django 6.1.2 on 2026-10-18 16:41
+
+from django.conf import settings
+from django.db import migrations, models
+
+from app.migration_operations import AddIndexConcurrently
+
+
+class Migration(migrations.Migration):
+    # Indexes are built concurrently on Postgres, which can't run in a transaction
+    atomic = False
+
+    dependencies = [
+        ('tables', '0006_tablemembership'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        AddIndexConcurrently(
+            model_name='table',
+            index=models.Index(fields=['dealer', 'play_date'], name='tables_dealer_play_date'),
+        ),
+        AddIndexConcurrently(
+            model_name='table',
+            index=models.Index(fields=['creator', 'play_date'], name='tables_creator_play_date'),
+        ),
+    ]
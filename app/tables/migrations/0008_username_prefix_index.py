@@ -0,0 +1,22 @@
+from django.conf import settings
+from django.db import migrations
+
+from app.migration_operations import AddTableIndexConcurrently
+
+
+class Migration(migrations.Migration):
+    # Indexes are built concurrently on Postgres, which can't run in a transaction
+    atomic = False
+
+    dependencies = [
+        ('tables', '0007_hot_path_indexes'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        # username LIKE 'prefix%' for the user pickers; the unique index can't serve it
+        # outside the C collation
+        AddTableIndexConcurrently(
+            "auth_user", "auth_user_username_prefix", ["username"], opclasses=["varchar_pattern_ops"]
+        ),
+    ]
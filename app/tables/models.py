@@ -1,16 +1,50 @@
 from django.contrib.auth.models import User
-from django.db import models
+from django.db import models, transaction
+from django.db.models import Count, F, OuterRef, Subquery
+from django.db.models.functions import Coalesce, Now
 from django.urls import reverse
+from django.utils import timezone
 import rules
 from rules.contrib.models import RulesModel
 
 @rules.predicate
 def is_table_dealer(user, table):
-    return user == table.dealer or user == table.creator
+    # Compare ids so checking a permission never loads the dealer/creator rows
+    return user.is_authenticated and user.pk in (table.dealer_id, table.creator_id)
 
 @rules.predicate
 def is_table_dealer_or_game_player(user, table):
-    return user == table.dealer or user == table.creator or table.games.filter(players__pk=user.pk).exists()
+    if not user.is_authenticated:
+        return False
+    return is_table_dealer(user, table) or TableMembership.objects.filter(
+        table_id=table.pk, user_id=user.pk, role=TableMembership.Role.PLAYER
+    ).exists()
+
+class TableQuerySet(models.QuerySet):
+    def visible_to(self, user):
+        # Index-only lookup of the user's memberships instead of an OR over games and players
+        tables = TableMembership.objects.filter(user_id=user.pk).values("table_id")
+        return self.filter(pk__in=tables)
+
+    def bump_version(self):
+        return self.update(version=F("version") + 1, updated_at=Now())
+
+    def with_games_count(self):
+        return self.annotate(games_count=Count("games"))
+
+    def with_comments_count(self):
+        # Subquery, so it can be combined with with_games_count without a fan-out join
+        from comments.models import Comment
+
+        comments = (
+            Comment.objects.filter(table=OuterRef("pk"))
+            .order_by()
+            .values("table")
+            .annotate(count=Count("pk"))
+            .values("count")
+        )
+        return self.annotate(comments_count=Coalesce(Subquery(comments), 0))
+
 
 class Table(RulesModel):
     class Meta:
@@ -19,6 +53,10 @@ class Table(RulesModel):
             "change": is_table_dealer,
             "delete": is_table_dealer,
         }
+        indexes = [
+            models.Index(fields=["dealer", "play_date"], name="tables_dealer_play_date"),
+            models.Index(fields=["creator", "play_date"], name="tables_creator_play_date"),
+        ]
 
     name = models.CharField(max_length=255)
     dealer = models.ForeignKey(
@@ -34,10 +72,70 @@ class Table(RulesModel):
         null=True,
     )
 
-    play_date = models.DateTimeField(auto_now_add=True)
+    # Not auto_now_add, so imported history keeps its dates
+    play_date = models.DateTimeField(default=timezone.now, editable=False)
+    # Natural key of tables created by import_games, makes re-runs idempotent
+    import_key = models.CharField(max_length=255, null=True, blank=True, unique=True, editable=False)
+    # Bumped on every write to the table, its games or comments; part of cache keys
+    version = models.PositiveIntegerField(default=0, editable=False)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    objects = TableQuerySet.as_manager()
 
     def __str__(self):
         return f"{self.name} | {self.play_date}"
 
+    def save(self, *args, **kwargs):
+        from .memberships import sync_roles
+
+        created = self._state.adding
+        with transaction.atomic():
+            if created:
+                super().save(*args, **kwargs)
+            else:
+                # Increment in SQL, so a stale instance can never move the version back
+                self.version = F("version") + 1
+                if kwargs.get("update_fields") is not None:
+                    kwargs["update_fields"] = {*kwargs["update_fields"], "version"}
+                super().save(*args, **kwargs)
+                self.refresh_from_db(fields=["version"])
+            sync_roles(self, created)
+
     def get_absolute_url(self):
         return reverse('table_object_view', kwargs={"pk": self.pk})
+
+
+class TableMembership(models.Model):
+    """Who may see a table and why, one row per (table, user, role).
+
+    Denormalized from ``Table.dealer``/``creator`` and the players of its
+    games by ``Table.save`` and ``tables.signals``; ``repair_memberships``
+    finds and fixes drift.
+    """
+
+    class Role(models.TextChoices):
+        DEALER = "dealer"
+        CREATOR = "creator"
+        PLAYER = "player"
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=["table", "user", "role"], name="unique_table_membership"),
+        ]
+        # Covers visible_to(): all table ids of a user without touching the rows
+        indexes = [models.Index(fields=["user", "table"], name="tables_membership_user_table")]
+
+    table = models.ForeignKey(Table, on_delete=models.CASCADE, related_name="memberships")
+    user = models.ForeignKey(User, on_delete=models.CASCADE, related_name="table_memberships")
+    role = models.CharField(max_length=8, choices=Role.choices)
+    # Games at the table the user played in; player rows are deleted at 0
+    games = models.IntegerField(default=1)
+
+
+def deleted_with_table(origin):
+    """Whether a delete signal sent with ``origin`` is part of deleting whole tables.
+
+    Their games, comments, memberships and stats rows go with them in a query
+    per model, so receivers keeping per-row denormalizations skip them.
+    """
+    return isinstance(origin, Table) or getattr(origin, "model", None) is Table
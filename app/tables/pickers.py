@@ -0,0 +1,75 @@
+from django import forms
+from django.contrib.auth.models import User
+from django.db import connection
+from django.forms.models import ModelChoiceIterator
+from django.urls import reverse_lazy
+
+from .models import TableMembership
+
+# Most users one picker search returns
+PICKER_RESULTS = 20
+
+
+def username_prefix(queryset, prefix):
+    if connection.vendor == "postgresql":
+        # LIKE 'prefix%' is served by the varchar_pattern_ops index of tables 0008
+        return queryset.filter(username__startswith=prefix)
+    # SQLite can't use an index for Django's LIKE ... ESCAPE, but can for the same prefix as a range
+    return queryset.filter(username__gte=prefix, username__lt=prefix + "\U0010ffff")
+
+
+def search_users(prefix, table_id=None, limit=PICKER_RESULTS):
+    """``(pk, username)`` of up to ``limit`` users whose username starts with ``prefix``.
+
+    Members of ``table_id`` come first. Both queries read a capped range of an index,
+    however many users are registered.
+    """
+    users = username_prefix(User.objects.filter(is_active=True), prefix).order_by("username")
+    results = []
+    if table_id is not None:
+        members = TableMembership.objects.filter(table_id=table_id).values("user_id")
+        results = list(users.filter(pk__in=members).values_list("pk", "username")[:limit])
+        users = users.exclude(pk__in=members)
+    if len(results) < limit:
+        results += users.values_list("pk", "username")[: limit - len(results)]
+    return results
+
+
+class UserSearchMixin:
+    """Select of users that renders only the chosen ones; ``user_search.js`` finds the rest.
+
+    A ``data-user-search-table`` attribute ranks that table's members first.
+    """
+
+    def __init__(self, attrs=None, choices=()):
+        super().__init__({"data-user-search": reverse_lazy("user_search_view"), **(attrs or {})}, choices)
+
+    def rank_table(self, table_id):
+        if table_id is not None:
+            self.attrs["data-user-search-table"] = table_id
+
+    def optgroups(self, name, value, attrs=None):
+        choices = self.choices
+        if isinstance(choices, ModelChoiceIterator):
+            # Otherwise every user in the database would become an <option>
+            self.choices = list(self.chosen(choices, value))
+        try:
+            return super().optgroups(name, value, attrs)
+        finally:
+            self.choices = choices
+
+    def chosen(self, iterator, value):
+        field = iterator.field
+        if field.empty_label is not None:
+            yield "", field.empty_label
+        pks = [pk for pk in value if str(pk).isdigit()]
+        if pks:
+            yield from map(iterator.choice, field.queryset.filter(pk__in=pks).order_by("username"))
+
+
+class UserSearchSelect(UserSearchMixin, forms.Select):
+    pass
+
+
+class UserSearchSelectMultiple(UserSearchMixin, forms.SelectMultiple):
+    pass
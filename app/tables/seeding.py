@@ -0,0 +1,101 @@
+import io
+import random
+from collections import Counter
+from datetime import timedelta
+from itertools import batched
+
+from django.contrib.auth.hashers import make_password
+from django.contrib.auth.models import User
+from django.core.management import call_command
+from django.db import transaction
+from django.utils import timezone
+
+from comments.models import Comment
+from games.models import Game
+
+from .memberships import rebuild_memberships
+from .models import Table
+
+# Rows sent per bulk INSERT while seeding
+SEED_BATCH_SIZE = 5000
+
+
+def deal_chips(rng, seated, winner_id):
+    """``(buy_in, cash_out)`` of each of ``seated``; the winner tends to leave with most of the pot."""
+    buy_ins = [rng.choice((50, 100, 200)) for _ in seated]
+    shares = [rng.random() + 2 * (user_id == winner_id) for user_id in seated]
+    pot, total = sum(buy_ins), sum(shares)
+    cash_outs = [int(pot * share / total) for share in shares]
+    if seated:
+        # Chips lost to rounding go to the winner, or whoever sits first
+        cash_outs[seated.index(winner_id) if winner_id in seated else 0] += pot - sum(cash_outs)
+    return list(zip(buy_ins, cash_outs))
+
+
+def seed(users=200, tables=1000, games=10, players=4, comments=5, prefix="seed", rng=None):
+    """Bulk-create a synthetic dataset and return the number of rows created per kind.
+
+    ``games`` and ``comments`` are per table, ``players`` per game. Like real
+    poker nights, every table has a circle of regulars a little larger than a
+    game, one of them deals, and each game seats players from that circle,
+    who buy in and cash out chips that add up (see ``deal_chips``). Play
+    dates are spread over the past year. Memberships, stats and the search
+    index are rebuilt afterwards since bulk inserts send no signals.
+    """
+    rng = rng or random.Random(0)
+    password = make_password(None)
+    now = timezone.now()
+    counts = Counter()
+    with transaction.atomic():
+        names = [f"{prefix}-{i}" for i in range(users)]
+        User.objects.bulk_create(
+            (User(username=name, password=password) for name in names), batch_size=SEED_BATCH_SIZE
+        )
+        user_ids = list(User.objects.filter(username__in=names).order_by("pk").values_list("pk", flat=True))
+        counts["users"] = len(user_ids)
+        players = min(players, len(user_ids))
+        circle_size = min(players + 2, len(user_ids))
+
+        circles = []
+        for chunk in batched(range(tables), SEED_BATCH_SIZE):
+            chunk_circles = [rng.sample(user_ids, circle_size) for _ in chunk]
+            created = Table.objects.bulk_create(
+                Table(
+                    name=f"{prefix} table {i}",
+                    dealer_id=circle[0],
+                    creator_id=circle[0],
+                    play_date=now - timedelta(days=rng.uniform(0, 365)),
+                )
+                for i, circle in zip(chunk, chunk_circles)
+            )
+            circles.extend(zip((table.pk for table in created), chunk_circles))
+        counts["tables"] = len(circles)
+
+        through = Game.players.through
+        for chunk in batched(circles, max(1, SEED_BATCH_SIZE // max(games, 1))):
+            seats = []
+            for table_id, circle in chunk:
+                for _ in range(games):
+                    seated = rng.sample(circle, players)
+                    winner_id = rng.choice(seated) if seated else None
+                    seats.append((table_id, seated, winner_id, deal_chips(rng, seated, winner_id)))
+            created = Game.objects.bulk_create(
+                Game(table_id=table_id, winner_id=winner_id) for table_id, _, winner_id, _ in seats
+            )
+            rows = through.objects.bulk_create(
+                (through(game_id=game.pk, user_id=user_id, buy_in=buy_in, cash_out=cash_out)
+                 for game, (_, seated, _, chips) in zip(created, seats)
+                 for user_id, (buy_in, cash_out) in zip(seated, chips)),
+                batch_size=SEED_BATCH_SIZE,
+            )
+            notes = Comment.objects.bulk_create(
+                (Comment(table_id=table_id, creator_id=rng.choice(circle), comment=f"{prefix} comment {i}")
+                 for table_id, circle in chunk for i in range(comments)),
+                batch_size=SEED_BATCH_SIZE,
+            )
+            counts.update(games=len(created), players=len(rows), comments=len(notes))
+
+        rebuild_memberships([table_id for table_id, _ in circles])
+        call_command("rebuild_stats", stdout=io.StringIO())
+        call_command("rebuild_search_index", stdout=io.StringIO())
+    return counts
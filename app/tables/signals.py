@@ -0,0 +1,118 @@
+from collections import Counter
+
+from django.contrib.auth.models import User
+from django.db.models import Q
+from django.db.models.signals import m2m_changed, post_delete, post_init, post_save, pre_delete
+from django.dispatch import receiver
+
+from comments.models import Comment
+from games.models import Game, GamePlayer
+
+from .memberships import bump_players, remember_roles
+from .models import Table, TableMembership, deleted_with_table
+
+
+@receiver(post_save, sender=Game)
+@receiver(post_delete, sender=Game)
+@receiver(post_save, sender=Comment)
+@receiver(post_delete, sender=Comment)
+def bump_table_version(sender, instance, raw=False, origin=None, **kwargs):
+    if not raw and not deleted_with_table(origin):
+        Table.objects.filter(pk=instance.table_id).bump_version()
+
+
+@receiver(post_save, sender=GamePlayer)
+def bump_table_version_on_chips_change(sender, instance, raw=False, **kwargs):
+    # Buy-ins and cash-outs saved one by one, e.g. in the admin
+    if not raw:
+        Table.objects.filter(games__pk=instance.game_id).bump_version()
+
+
+@receiver(m2m_changed, sender=Game.players.through)
+def bump_table_version_on_players_change(sender, instance, action, reverse, pk_set, **kwargs):
+    if action not in ("post_add", "post_remove", "pre_clear"):
+        return
+    if not reverse:
+        Table.objects.filter(pk=instance.table_id).bump_version()
+    elif action == "pre_clear":
+        Table.objects.filter(games__players=instance).bump_version()
+    else:
+        Table.objects.filter(games__pk__in=pk_set).bump_version()
+
+
+# Cached table fragments show usernames (dealer, players, winners, comment authors)
+
+@receiver(post_init, sender=User)
+def remember_username(sender, instance, **kwargs):
+    instance._cached_username = instance.__dict__.get("username")
+
+
+@receiver(post_save, sender=User)
+def bump_table_versions_on_rename(sender, instance, created, raw=False, **kwargs):
+    old_username = instance._cached_username
+    instance._cached_username = instance.username
+    if raw or created or old_username in (None, instance.username):
+        return
+    Table.objects.filter(
+        Q(pk__in=TableMembership.objects.filter(user=instance).values("table_id"))
+        | Q(pk__in=Game.objects.filter(winner=instance).values("table_id"))
+        | Q(pk__in=Comment.objects.filter(creator=instance).values("table_id"))
+    ).bump_version()
+
+
+# Table memberships: dealer/creator rows are kept by Table.save, player rows here
+
+@receiver(post_init, sender=Table)
+def remember_table_roles(sender, instance, **kwargs):
+    remember_roles(instance)
+
+
+@receiver(post_init, sender=Game)
+def remember_game_table(sender, instance, **kwargs):
+    instance._membership_table_id = instance.__dict__.get("table_id")
+
+
+@receiver(post_save, sender=Game)
+def move_game_memberships(sender, instance, created, raw=False, **kwargs):
+    old_table_id = instance._membership_table_id
+    instance._membership_table_id = instance.table_id
+    if raw or created or old_table_id in (None, instance.table_id):
+        return
+    player_ids = list(instance.players.values_list("pk", flat=True))
+    bump_players(old_table_id, dict.fromkeys(player_ids, -1))
+    bump_players(instance.table_id, dict.fromkeys(player_ids, 1))
+
+
+@receiver(pre_delete, sender=Game)
+def remove_game_memberships(sender, instance, origin=None, **kwargs):
+    # The players rows are deleted without m2m_changed. With its table all its
+    # memberships go (on_delete=CASCADE)
+    if deleted_with_table(origin):
+        return
+    bump_players(instance.table_id, dict.fromkeys(instance.players.values_list("pk", flat=True), -1))
+
+
+@receiver(m2m_changed, sender=Game.players.through)
+def update_player_memberships(sender, instance, action, reverse, pk_set, **kwargs):
+    if action == "pre_clear":
+        if reverse:
+            instance._membership_cleared = list(instance.games.values_list("table_id", flat=True))
+        else:
+            instance._membership_cleared = list(instance.players.values_list("pk", flat=True))
+        return
+    if action not in ("post_add", "post_remove", "post_clear"):
+        return
+
+    delta = 1 if action == "post_add" else -1
+    if not reverse:
+        user_ids = instance._membership_cleared if action == "post_clear" else pk_set
+        bump_players(instance.table_id, dict.fromkeys(user_ids, delta))
+        return
+
+    # user.games.add(...) / remove(...) / clear()
+    if action == "post_clear":
+        table_ids = instance._membership_cleared
+    else:
+        table_ids = Game.objects.filter(pk__in=pk_set).values_list("table_id", flat=True)
+    for table_id, count in Counter(table_ids).items():
+        bump_players(table_id, {instance.pk: delta * count})
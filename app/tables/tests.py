@@ -1,3 +1,578 @@
-from django.test import TestCase
+import csv
+import io
+import json
+import tempfile
+from pathlib import Path
+from unittest import mock
+
+from asgiref.sync import iscoroutinefunction
+from django.contrib.auth.models import User
+from django.core import signing
+from django.core.cache import cache
+from django.core.management import CommandError, call_command
+from django.db import connection
+from django.test import TestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.urls import include, path, resolve, reverse
+from django.utils import timezone
+
+from comments.models import Comment
+from comments.views import AsyncCommentListView
+from games.models import Game
+from games.views import AsyncGameListView, first_games_page
+
+from app import fragment_cache
+from app.pagination import KeysetPaginator
+
+from . import export
+from .management.commands.check_query_plans import Command as CheckQueryPlans
+from .memberships import find_drift, rebuild_memberships
+from .models import Table, TableMembership
+from .views import AsyncTableObjectView, AsyncTablesListView
+
+# Project routes with the async read views in front, as served under ASGI
+urlpatterns = [
+    path("tables/", AsyncTablesListView.as_view()),
+    path("tables/<int:pk>/", AsyncTableObjectView.as_view()),
+    path("tables/<int:pk>/games/", AsyncGameListView.as_view()),
+    path("tables/<int:pk>/comments/", AsyncCommentListView.as_view()),
+    path("", include("app.urls")),
+]
+
+
+def seed_tables(user, dealer, count):
+    tables = Table.objects.bulk_create(
+        Table(name=f"table {i}", dealer=dealer, creator=dealer) for i in range(count)
+    )
+    games = Game.objects.bulk_create(Game(table=table, winner=dealer) for table in tables)
+    Game.players.through.objects.bulk_create(
+        Game.players.through(game_id=game.pk, user_id=user.pk) for game in games
+    )
+    # bulk_create skips signals, so fill in memberships like bulk write paths do
+    rebuild_memberships([table.pk for table in tables])
+
+
+class TablesListViewTests(TestCase):
+    def setUp(self):
+        self.user = User.objects.create_user("player", password="x")
+        self.dealer = User.objects.create_user("dealer", password="x")
+        self.client.force_login(self.user)
+        cache.clear()
+
+    def count_list_queries(self):
+        with CaptureQueriesContext(connection) as ctx:
+            response = self.client.get(reverse("tables_list_view"))
+        self.assertEqual(response.status_code, 200)
+        return len(ctx.captured_queries)
+
+    def test_query_count_does_not_grow_with_tables(self):
+        counts = []
+        seeded = 0
+        for size in (1, 100, 1000):
+            seed_tables(self.user, self.dealer, size - seeded)
+            seeded = size
+            counts.append(self.count_list_queries())
+
+        self.assertEqual(counts[0], counts[1])
+        self.assertEqual(counts[1], counts[2])
+
+    def test_pages_forward_and_back(self):
+        seed_tables(self.user, self.dealer, 60)
+        url = reverse("tables_list_view")
+
+        first = self.client.get(url).context["page_obj"]
+        second = self.client.get(url, {"cursor": first.next_cursor}).context["page_obj"]
+        third = self.client.get(url, {"cursor": second.next_cursor}).context["page_obj"]
+        back = self.client.get(url, {"cursor": third.previous_cursor}).context["page_obj"]
+
+        self.assertEqual((second.number, third.number, back.number), (2, 3, 2))
+        self.assertEqual(len(third), 10)
+        self.assertFalse(third.has_next())
+        self.assertEqual(list(back), list(second))
+        self.assertEqual(second.paginator.num_pages, 3)
+        seen = [table.pk for page in (first, second, third) for table in page]
+        self.assertEqual(sorted(seen, reverse=True), seen)
+        self.assertEqual(len(set(seen)), 60)
+
+    def test_page_total_is_approximate(self):
+        seed_tables(self.user, self.dealer, 60)
+        url = reverse("tables_list_view")
+        second = self.client.get(url, {"cursor": self.client.get(url).context["page_obj"].next_cursor})
+        self.assertContains(second, "of about")
+
+        with mock.patch.object(KeysetPaginator, "num_pages", new_callable=mock.PropertyMock, return_value=1):
+            second = self.client.get(url, {"cursor": self.client.get(url).context["page_obj"].next_cursor})
+        self.assertContains(second, "Page")
+        self.assertNotContains(second, "of about")
+
+    def test_signed_cursor_with_bad_values_shows_first_page(self):
+        seed_tables(self.user, self.dealer, 30)
+        cursor = signing.dumps([["not-a-date", "1"], "next", 2, 25], salt=KeysetPaginator.salt, compress=True)
+        response = self.client.get(reverse("tables_list_view"), {"cursor": cursor})
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.context["page_obj"].number, 1)
+
+    def test_visibility(self):
+        other = User.objects.create_user("other", password="x")
+        hidden = Table.objects.create(name="hidden", dealer=other, creator=other)
+        dealt = Table.objects.create(name="dealt", dealer=self.user, creator=other)
+        created = Table.objects.create(name="created", dealer=other, creator=self.user)
+        played = Table.objects.create(name="played", dealer=other, creator=other)
+        for _ in range(3):
+            Game.objects.create(table=played).players.add(self.user, other)
+
+        visible = Table.objects.visible_to(self.user).with_games_count()
+
+        self.assertNotIn(hidden, visible)
+        self.assertCountEqual(visible, [dealt, created, played])
+        self.assertEqual(visible.get(pk=played.pk).games_count, 3)
+
+
+class TableObjectViewTests(TestCase):
+    def setUp(self):
+        self.dealer = User.objects.create_user("dealer", password="x")
+        self.player = User.objects.create_user("player", password="x")
+        self.table = Table.objects.create(name="t", dealer=self.dealer, creator=self.dealer)
+        self.client.force_login(self.dealer)
+        cache.clear()
+
+    def add_games_and_comments(self, count):
+        games = Game.objects.bulk_create(
+            Game(table=self.table, winner=self.player) for _ in range(count)
+        )
+        Game.players.through.objects.bulk_create(
+            Game.players.through(game_id=game.pk, user_id=user.pk)
+            for game in games
+            for user in (self.dealer, self.player)
+        )
+        Comment.objects.bulk_create(
+            Comment(table=self.table, creator=self.player, comment="gg") for _ in range(count)
+        )
+        # bulk_create skips signals, so bump the version like bulk write paths do
+        Table.objects.filter(pk=self.table.pk).bump_version()
+
+    def count_detail_queries(self):
+        with CaptureQueriesContext(connection) as ctx:
+            response = self.client.get(reverse("table_object_view", args=[self.table.pk]))
+        self.assertEqual(response.status_code, 200)
+        return len(ctx.captured_queries)
+
+    def test_query_count_does_not_grow_with_games_and_comments(self):
+        self.add_games_and_comments(1)
+        small = self.count_detail_queries()
+        self.add_games_and_comments(200)
+        self.assertEqual(self.count_detail_queries(), small)
+
+    def test_fragments_follow_cursor(self):
+        self.add_games_and_comments(30)
+        url = reverse("game_list_view", args=[self.table.pk])
+
+        first = self.client.get(url)
+        self.assertEqual(len(first.context["page_obj"]), 25)
+        self.assertTrue(first.context["page_obj"].has_next())
+
+        second = self.client.get(url, {"cursor": first.context["page_obj"].next_cursor})
+        self.assertEqual(len(second.context["page_obj"]), 5)
+        self.assertFalse(second.context["page_obj"].has_next())
+        self.assertContains(second, '<div class="truncate text-sm/6 font-medium text-white">30</div>', html=True)
+
+        comments = self.client.get(reverse("comment_list_view", args=[self.table.pk]))
+        self.assertEqual(len(comments.context["page_obj"]), 25)
+
+    def test_fragments_ignore_forged_cursor(self):
+        self.add_games_and_comments(30)
+        response = self.client.get(reverse("game_list_view", args=[self.table.pk]), {"cursor": "1"})
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.context["page_obj"].number, 1)
+        self.assertEqual(len(response.context["page_obj"]), 25)
+
+    def test_fragments_require_read_permission(self):
+        outsider = User.objects.create_user("outsider", password="x")
+        self.client.force_login(outsider)
+        response = self.client.get(reverse("game_list_view", args=[self.table.pk]))
+        self.assertEqual(response.status_code, 403)
+
+
+class FragmentCacheTests(TestCase):
+    def setUp(self):
+        self.dealer = User.objects.create_user("dealer", password="x")
+        self.player = User.objects.create_user("player", password="x")
+        self.table = Table.objects.create(name="t", dealer=self.dealer, creator=self.dealer)
+        self.url = reverse("table_object_view", args=[self.table.pk])
+        cache.clear()
+        fragment_cache.stats.reset()
+
+    def test_version_bumps_on_related_writes(self):
+        versions = [Table.objects.get(pk=self.table.pk).version]
+        game = Game.objects.create(table=self.table)
+        game.players.add(self.player)
+        self.player.games.remove(game)
+        comment = Comment.objects.create(table=self.table, creator=self.player, comment="gg")
+        comment.delete()
+        self.table.name = "renamed"
+        self.table.save()
+
+        versions.append(self.table.version)
+        self.assertEqual(versions, [0, 6])
+
+    def test_sections_are_cached_per_version_and_viewer(self):
+        self.client.force_login(self.dealer)
+        self.client.get(self.url)
+        self.assertEqual((fragment_cache.stats.hits, fragment_cache.stats.misses), (0, 2))
+
+        self.client.get(self.url)
+        self.assertEqual((fragment_cache.stats.hits, fragment_cache.stats.misses), (2, 2))
+
+        game = Game.objects.create(table=self.table, winner=self.player)
+        response = self.client.get(self.url)
+        self.assertEqual(fragment_cache.stats.misses, 4)
+        self.assertContains(response, reverse("game_update_view", args=[self.table.pk, game.pk]))
+
+        game.players.add(self.player)
+        self.client.force_login(self.player)
+        response = self.client.get(self.url)
+        self.assertEqual(fragment_cache.stats.misses, 6)
+        self.assertNotContains(response, reverse("game_update_view", args=[self.table.pk, game.pk]))
+
+    def test_renaming_a_user_refreshes_their_tables(self):
+        other = Table.objects.create(name="other", dealer=self.player, creator=self.player)
+        Game.objects.create(table=self.table, winner=self.player).players.add(self.dealer)
+        self.client.force_login(self.dealer)
+        self.assertNotContains(self.client.get(self.url), "renamed")
+
+        versions = dict(Table.objects.values_list("pk", "version"))
+        self.player.username = "renamed"
+        self.player.save()
+        self.player.last_login = timezone.now()
+        self.player.save()
+
+        self.assertEqual(
+            dict(Table.objects.values_list("pk", "version")),
+            {self.table.pk: versions[self.table.pk] + 1, other.pk: versions[other.pk] + 1},
+        )
+        self.assertContains(self.client.get(self.url), "renamed")
+
+    @override_settings(CACHES={"default": {
+        "BACKEND": "django.core.cache.backends.filebased.FileBasedCache",
+        "LOCATION": "/tmp/pokero-test-cache",
+    }})
+    def test_file_based_backend(self):
+        cache.clear()
+        Game.objects.create(table=self.table).players.add(self.dealer)
+        self.client.force_login(self.dealer)
+        for _ in range(3):
+            response = self.client.get(reverse("tables_list_view"))
+            self.assertContains(response, "1 game")
+        self.assertEqual((fragment_cache.stats.hits, fragment_cache.stats.misses), (2, 1))
+
+
+class ConditionalGetTests(TestCase):
+    def setUp(self):
+        self.dealer = User.objects.create_user("dealer", password="x")
+        self.table = Table.objects.create(name="t", dealer=self.dealer, creator=self.dealer)
+        self.client.force_login(self.dealer)
+
+    def assert_revalidates(self, url, change):
+        with CaptureQueriesContext(connection) as rendered:
+            response = self.client.get(url)
+        self.assertEqual(response.status_code, 200)
+        self.assertIn("private", response["Cache-Control"])
+        etag = response["ETag"]
+
+        with CaptureQueriesContext(connection) as revalidated:
+            response = self.client.get(url, headers={"if-none-match": etag})
+        self.assertEqual(response.status_code, 304)
+        self.assertLess(len(revalidated), len(rendered))
+
+        change()
+        response = self.client.get(url, headers={"if-none-match": etag})
+        self.assertEqual(response.status_code, 200)
+        self.assertNotEqual(response["ETag"], etag)
+
+    def test_detail_page(self):
+        url = reverse("table_object_view", args=[self.table.pk])
+        self.assert_revalidates(
+            url, lambda: Comment.objects.create(table=self.table, creator=self.dealer, comment="gg")
+        )
+
+    def test_list_page(self):
+        other = User.objects.create_user("other", password="x")
+        other_table = Table.objects.create(name="o", dealer=other, creator=other)
+        game = Game.objects.create(table=other_table)
+        self.assert_revalidates(reverse("tables_list_view"), lambda: game.players.add(self.dealer))
+
+    def test_new_login_gets_fresh_page(self):
+        url = reverse("table_object_view", args=[self.table.pk])
+        etag = self.client.get(url)["ETag"]
+        self.client.logout()
+        self.client.force_login(self.dealer)
+        self.client.get(reverse("tables_list_view"))
+        self.assertEqual(self.client.get(url, headers={"if-none-match": etag}).status_code, 200)
+
+
+@override_settings(ROOT_URLCONF=__name__)
+class AsyncTablesListViewTests(TablesListViewTests):
+    pass
+
+
+@override_settings(ROOT_URLCONF=__name__)
+class AsyncTableObjectViewTests(TableObjectViewTests):
+    async def test_served_natively(self):
+        url = reverse("table_object_view", args=[self.table.pk])
+        self.assertTrue(iscoroutinefunction(resolve(url).func))
+
+        await self.async_client.aforce_login(self.dealer)
+        with mock.patch("tables.views.first_games_page", wraps=first_games_page) as games_page:
+            response = await self.async_client.get(url)
+            self.assertEqual(response.status_code, 200)
+            # Cached fragment: the games page isn't queried again
+            await self.async_client.get(url)
+        self.assertEqual(games_page.call_count, 1)
+
+        response = await self.async_client.get(url, headers={"if-none-match": response["ETag"]})
+        self.assertEqual(response.status_code, 304)
+
+    async def test_anonymous_redirects_to_login(self):
+        response = await self.async_client.get(reverse("tables_list_view"))
+        self.assertEqual(response.status_code, 302)
+        self.assertIn(reverse("login"), response["Location"])
+
+
+@override_settings(ROOT_URLCONF=__name__)
+class AsyncConditionalGetTests(ConditionalGetTests):
+    pass
+
+
+class TableExportTests(TestCase):
+    def setUp(self):
+        self.dealer = User.objects.create_user("dealer", password="x")
+        self.player = User.objects.create_user("player", password="x")
+        self.table = Table.objects.create(name="t", dealer=self.dealer, creator=self.dealer)
+        for winner in (self.dealer, self.player, None, self.player, self.dealer):
+            Game.objects.create(table=self.table, winner=winner).players.add(self.dealer, self.player)
+        Comment.objects.create(table=self.table, creator=self.player, comment='nice, "close" game')
+        self.client.force_login(self.player)
+
+    def url(self, kind, fmt):
+        return reverse("table_export_view", args=[self.table.pk, kind, fmt])
+
+    @mock.patch.object(export, "EXPORT_CHUNK_SIZE", 2)
+    def test_games_csv_streams_in_chunks(self):
+        with CaptureQueriesContext(connection) as ctx:
+            response = self.client.get(self.url("games", "csv"))
+            content = b"".join(response.streaming_content).decode()
+
+        self.assertEqual(response["Content-Type"], "text/csv; charset=utf-8")
+        rows = list(csv.reader(io.StringIO(content)))
+        self.assertEqual(rows[0], ["id", "winner", "players"])
+        self.assertEqual([row[1] for row in rows[1:]], ["dealer", "player", "", "player", "dealer"])
+        self.assertEqual({row[2] for row in rows[1:]}, {"dealer;player"})
+        # Players are prefetched once per chunk of two games
+        prefetches = [q for q in ctx.captured_queries if '"games_game_players"."game_id" IN' in q["sql"]]
+        self.assertEqual(len(prefetches), 3)
+
+    def test_comments_jsonl(self):
+        response = self.client.get(self.url("comments", "jsonl"))
+        lines = b"".join(response.streaming_content).decode().splitlines()
+        self.assertEqual(len(lines), 1)
+        row = json.loads(lines[0])
+        self.assertEqual((row["creator"], row["comment"]), ("player", 'nice, "close" game'))
+
+    def test_requires_read_permission(self):
+        self.client.force_login(User.objects.create_user("outsider", password="x"))
+        self.assertEqual(self.client.get(self.url("games", "jsonl")).status_code, 403)
+
+    async def test_asgi_streams_asynchronously(self):
+        await self.async_client.aforce_login(self.player)
+        response = await self.async_client.get(self.url("games", "jsonl"))
+        self.assertTrue(response.is_async)
+        lines = b"".join([chunk async for chunk in response.streaming_content]).decode().splitlines()
+        self.assertEqual(len(lines), 5)
+
+    def test_management_command(self):
+        out = io.StringIO()
+        call_command("export_table", self.table.pk, "--format", "jsonl", stdout=out)
+        self.assertEqual(len(out.getvalue().splitlines()), 5)
+
+
+class TableMembershipTests(TestCase):
+    def setUp(self):
+        self.dealer, self.player, self.other = (
+            User.objects.create_user(name, password="x") for name in ("dealer", "player", "other")
+        )
+        self.table = Table.objects.create(name="t", dealer=self.dealer, creator=self.dealer)
+
+    def roles(self, table=None):
+        return sorted(
+            TableMembership.objects.filter(table=table or self.table)
+            .values_list("user__username", "role", "games")
+        )
+
+    def test_single_writes_keep_memberships_consistent(self):
+        self.assertEqual(self.roles(), [("dealer", "creator", 1), ("dealer", "dealer", 1)])
+
+        first = Game.objects.create(table=self.table)
+        first.players.add(self.player, self.other)
+        second = Game.objects.create(table=self.table)
+        self.player.games.add(second)
+        self.assertIn(("player", "player", 2), self.roles())
+
+        self.table.dealer = self.other
+        self.table.save()
+        first.players.remove(self.other)
+        self.assertEqual(
+            self.roles(), [("dealer", "creator", 1), ("other", "dealer", 1), ("player", "player", 2)]
+        )
+
+        elsewhere = Table.objects.create(name="e", dealer=self.other, creator=self.other)
+        second.table = elsewhere
+        second.save()
+        self.assertIn(("player", "player", 1), self.roles())
+        self.assertIn(("player", "player", 1), self.roles(elsewhere))
+
+        first.delete()
+        self.player.games.clear()
+        self.assertEqual(self.roles(), [("dealer", "creator", 1), ("other", "dealer", 1)])
+        self.assertEqual(find_drift(), (0, 0))
+
+    def test_read_rule_is_one_indexed_lookup(self):
+        Game.objects.create(table=self.table).players.add(self.player)
+        table = Table.objects.get(pk=self.table.pk)
+        with self.assertNumQueries(1):
+            self.assertTrue(self.player.has_perm("tables.read_table", table))
+        with self.assertNumQueries(0):
+            self.assertTrue(self.dealer.has_perm("tables.read_table", table))
+        self.assertFalse(self.other.has_perm("tables.read_table", table))
+
+    def test_repair_command(self):
+        Game.objects.create(table=self.table).players.add(self.player)
+        TableMembership.objects.filter(role="player").delete()
+        TableMembership.objects.create(table=self.table, user=self.other, role="player")
+
+        with self.assertRaisesMessage(CommandError, "1 membership rows missing, 1 stale"):
+            call_command("repair_memberships", "--check", stdout=io.StringIO())
+        call_command("repair_memberships", stdout=io.StringIO())
+        self.assertEqual(find_drift(), (0, 0))
+        self.assertIn(self.table, Table.objects.visible_to(self.player))
+        self.assertNotIn(self.table, Table.objects.visible_to(self.other))
+
+
+class CheckQueryPlansTests(TestCase):
+    def test_hot_views_use_indexes(self):
+        out = io.StringIO()
+        call_command("check_query_plans", "--tables", "200", "--min-rows", "500", stdout=out)
+
+        self.assertIn("No sequential scans of large tables", out.getvalue())
+        # The seeded rows are rolled back
+        self.assertFalse(User.objects.filter(username__startswith="plan-check").exists())
+
+    def test_reports_sequential_scan(self):
+        check = CheckQueryPlans()
+        check.min_rows, check.row_counts = 0, {}
+        unindexed, params = Comment.objects.filter(comment="x").query.sql_with_params()
+        indexed, indexed_params = Game.objects.filter(table_id=1).order_by("pk").query.sql_with_params()
+
+        self.assertEqual([scan[0] for scan in check.large_scans(unindexed, params)], ["comments_comment"])
+        self.assertEqual(list(check.large_scans(indexed, indexed_params)), [])
+
+
+class SeedLoadTests(TestCase):
+    def test_creates_requested_dataset(self):
+        out = io.StringIO()
+        call_command(
+            "seed_load", "--users", "20", "--tables-per-user", "0.5", "--games-per-table", "3",
+            "--players-per-game", "4", "--comments-per-table", "2", "--prefix", "t", stdout=out,
+        )
+
+        self.assertIn("Created 20 users, 10 tables, 30 games, 120 player rows and 20 comments", out.getvalue())
+        table = Table.objects.filter(name__startswith="t table").first()
+        game = table.games.first()
+        self.assertIn(game.winner, game.players.all())
+        # Memberships and stats are rebuilt after the bulk inserts
+        self.assertEqual(TableMembership.objects.filter(table=table, role=TableMembership.Role.DEALER).count(), 1)
+        self.assertEqual(find_drift(), (0, 0))
+
+
+class BenchViewsTests(TestCase):
+    def bench(self, *args):
+        out = io.StringIO()
+        call_command(
+            "bench_views", "--repeat", "1", "--warmup", "0", "--tables", "20", "--users", "30", *args, stdout=out
+        )
+        return out.getvalue()
+
+    def test_writes_report_and_compares(self):
+        with tempfile.TemporaryDirectory() as directory:
+            report = Path(directory, "bench.json")
+            self.bench("--output", str(report))
+            results = json.loads(report.read_text())["results"]
+
+            self.assertEqual(results["table_object_view dealer"]["status"], 200)
+            self.assertEqual(results["table_object_view outsider"]["status"], 403)
+            self.assertEqual(results["table_object_view anonymous"]["status"], 302)
+            self.assertNotIn("table_delete_view dealer", results)
+            # The seeded rows are rolled back
+            self.assertFalse(User.objects.filter(username__startswith="bench-views").exists())
+
+            for result in results.values():
+                result["p50_ms"] = 1e6
+            report.write_text(json.dumps({"results": results}))
+            self.assertIn("No regressions", self.bench("--baseline", str(report)))
+
+            results["game_list_view player"]["queries"] = 0
+            results["home dealer"]["status"] = 302
+            report.write_text(json.dumps({"results": results}))
+            with self.assertRaisesMessage(CommandError, "2 regressions"):
+                self.bench("--baseline", str(report))
+
+
+class BenchSessionsTests(TestCase):
+    def test_reports_saved_queries(self):
+        out = io.StringIO()
+        call_command("bench_sessions", "--requests", "1", stdout=out)
+
+        self.assertIn("save 2.00 queries per request", out.getvalue())
+
+
+class UserSearchTests(TestCase):
+    def setUp(self):
+        self.dealer = User.objects.create_user("dealer", password="x")
+        self.table = Table.objects.create(name="t", dealer=self.dealer, creator=self.dealer)
+        User.objects.bulk_create(User(username=f"pat{i:02}") for i in range(30))
+        self.member = User.objects.create_user("pat99", password="x")
+        TableMembership.objects.create(table=self.table, user=self.member, role=TableMembership.Role.PLAYER)
+        User.objects.create_user("other", password="x")
+        self.client.force_login(self.dealer)
+
+    def search(self, **params):
+        response = self.client.get(reverse("user_search_view"), params)
+        self.assertEqual(response.status_code, 200)
+        return [user["username"] for user in response.json()["results"]]
+
+    def test_prefix_results_are_capped(self):
+        names = self.search(q="pat")
+        self.assertEqual(len(names), 20)
+        self.assertEqual(names[:2], ["pat00", "pat01"])
+        self.assertEqual(self.search(q="oth"), ["other"])
+
+    def test_table_members_come_first(self):
+        self.assertEqual(self.search(q="pat", table=self.table.pk)[:2], ["pat99", "pat00"])
+
+    def test_no_ranking_for_tables_the_user_cannot_read(self):
+        self.client.force_login(User.objects.get(username="other"))
+        self.assertEqual(self.search(q="pat", table=self.table.pk)[0], "pat00")
+
+    def test_forms_render_only_chosen_users(self):
+        response = self.client.get(reverse("table_update_view", args=[self.table.pk]))
+        self.assertContains(response, ">dealer</option>")
+        self.assertNotContains(response, "pat00")
+        self.assertContains(response, f'data-user-search-table="{self.table.pk}"')
+
+        response = self.client.post(
+            reverse("table_update_view", args=[self.table.pk]),
+            {"name": "t", "dealer": self.member.pk, "creator": self.dealer.pk},
+        )
+        self.assertEqual(response.status_code, 302)
+        self.table.refresh_from_db()
+        self.assertEqual(self.table.dealer, self.member)
 
-# Create your tests here.
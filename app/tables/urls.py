@@ -1,13 +1,33 @@
-from django.urls import include, path
+from django.urls import include, path, re_path
 
-from .views import TableDeleteView, TableObjectView, TableUpdateView, TablesCreateView, TablesListView
+from app.async_views import read_view
+from stats.views import TableLeaderboardView
+
+from .views import (
+    AsyncTableObjectView,
+    AsyncTablesListView,
+    TableDeleteView,
+    TableExportView,
+    TableObjectView,
+    TableUpdateView,
+    TablesCreateView,
+    TablesListView,
+    UserSearchView,
+)
 
 urlpatterns = [
-    path('', TablesListView.as_view(), name="tables_list_view"),
-    path('<int:pk>/', TableObjectView.as_view(), name="table_object_view"),
+    path('', read_view(TablesListView, AsyncTablesListView), name="tables_list_view"),
+    path('<int:pk>/', read_view(TableObjectView, AsyncTableObjectView), name="table_object_view"),
     path('create/', TablesCreateView.as_view(), name="table_create_view"),
+    path('users/search/', UserSearchView.as_view(), name="user_search_view"),
     path('<int:pk>/delete/', TableDeleteView.as_view(), name="table_delete_view"),
     path('<int:pk>/update/', TableUpdateView.as_view(), name="table_update_view"),
+    path('<int:pk>/leaderboard/', TableLeaderboardView.as_view(), name="table_leaderboard_view"),
+    re_path(
+        r'^(?P<pk>[0-9]+)/export/(?P<kind>games|comments)\.(?P<fmt>csv|jsonl)$',
+        TableExportView.as_view(),
+        name="table_export_view",
+    ),
     path('<int:pk>/games/', include("games.urls")),
     path('<int:pk>/comments/', include("comments.urls")),
 ]
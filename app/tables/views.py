@@ -1,26 +1,172 @@
+from functools import partial
+
+from django.core.handlers.asgi import ASGIRequest
+from django.db.models import Count, Max
+from django.http import JsonResponse, StreamingHttpResponse
+from django.shortcuts import aget_object_or_404, get_object_or_404
 from django.urls import reverse_lazy
-from django.views.generic import DeleteView, ListView, DetailView, CreateView, UpdateView
+from django.utils.functional import cached_property
+from django.views.generic import DeleteView, ListView, DetailView, CreateView, UpdateView, View
+from app.async_views import AsyncReadView
+from app.conditional import ConditionalGetMixin, make_etag
+from app.pagination import KeysetPaginationMixin, KeysetPaginator
+from comments.views import first_comments_page
+from games.views import first_games_page
+
+from .export import FORMATS, aiter_export, iter_export
+from .forms import TableCreateForm, TableForm
 from .models import Table
+from .pickers import search_users
 from django.contrib.auth.mixins import LoginRequiredMixin
 from rules.contrib.views import PermissionRequiredMixin
-from django.db.models import Q
 
-class TablesListView(LoginRequiredMixin, ListView):
+def visible_tables(user):
+    return Table.objects.visible_to(user).with_games_count().select_related("dealer")
+
+
+def summary_aggregates():
+    # Any write to a visible table bumps its updated_at, and gaining or losing
+    # access to a table changes the count or the latest updated_at
+    return {"count": Count("pk"), "last_modified": Max("updated_at")}
+
+
+def list_validators(request, summary):
+    etag = make_etag(request, summary["count"], summary["last_modified"], request.GET.get("cursor", ""))
+    return etag, summary["last_modified"]
+
+
+def detail_validators(request, table):
+    return make_etag(request, table.pk, table.version), table.updated_at
+
+
+def detail_queryset():
+    return Table.objects.with_games_count().with_comments_count().select_related("dealer")
+
+
+class TablesListView(ConditionalGetMixin, KeysetPaginationMixin, LoginRequiredMixin, ListView):
     model = Table
+    paginate_by = 25
+    keyset_ordering = ("-play_date", "-pk")
+    estimate_count = True
 
     def get_queryset(self):
-        user = self.request.user
-        return Table.objects.filter(
-            Q(dealer=user) | Q(games__players=user) | Q(creator=user)
-        ).distinct()
+        return visible_tables(self.request.user)
+
+    def get_validators(self):
+        return list_validators(
+            self.request, Table.objects.visible_to(self.request.user).aggregate(**summary_aggregates())
+        )
 
-class TableObjectView(PermissionRequiredMixin, LoginRequiredMixin, DetailView):
+class TableObjectView(ConditionalGetMixin, PermissionRequiredMixin, LoginRequiredMixin, DetailView):
     model = Table
     permission_required = "tables.read_table"
 
+    @cached_property
+    def table(self):
+        # Plain row for the permission check and validators; the page itself is
+        # only queried when it has to be rendered
+        return get_object_or_404(Table, pk=self.kwargs["pk"])
+
+    def get_permission_object(self):
+        return self.table
+
+    def get_validators(self):
+        return detail_validators(self.request, self.table)
+
+    def get_queryset(self):
+        return detail_queryset()
+
+    def get_context_data(self, **kwargs):
+        context = super().get_context_data(**kwargs)
+        # Callables are only evaluated by the template on a fragment cache miss
+        context["games_page"] = partial(first_games_page, self.object)
+        context["comments_page"] = partial(first_comments_page, self.object)
+        return context
+
+class AsyncTablesListView(AsyncReadView):
+    template_name = "tables/table_list.html"
+
+    async def get(self, request, *args, **kwargs):
+        summary = await Table.objects.visible_to(self.user).aaggregate(**summary_aggregates())
+        validators = list_validators(request, summary)
+        if response := self.not_modified(validators):
+            return response
+
+        paginator = KeysetPaginator(
+            visible_tables(self.user),
+            TablesListView.paginate_by,
+            TablesListView.keyset_ordering,
+            estimate_count=TablesListView.estimate_count,
+        )
+        page = await self.get_page(paginator, request.GET.get("cursor"))
+        context = {
+            "paginator": paginator,
+            "page_obj": page,
+            "is_paginated": page.has_other_pages(),
+            "object_list": page.object_list,
+            "table_list": page.object_list,
+        }
+        return await self.render(context, validators)
+
+class AsyncTableObjectView(AsyncReadView):
+    template_name = "tables/table_detail.html"
+    permission_required = TableObjectView.permission_required
+
+    async def get(self, request, *args, **kwargs):
+        table = await aget_object_or_404(Table, pk=kwargs["pk"])
+        await self.check_permission(table)
+        validators = detail_validators(request, table)
+        if response := self.not_modified(validators):
+            return response
+
+        table = await detail_queryset().aget(pk=table.pk)
+        # The template renders in a thread, so as in TableObjectView the pages
+        # are only queried there, on a fragment cache miss
+        context = {
+            "object": table,
+            "table": table,
+            "games_page": partial(first_games_page, table),
+            "comments_page": partial(first_comments_page, table),
+        }
+        return await self.render(context, validators)
+
+class TableExportView(PermissionRequiredMixin, LoginRequiredMixin, View):
+    # Full games or comments history, streamed as CSV or JSON lines
+    permission_required = "tables.read_table"
+
+    @cached_property
+    def table(self):
+        return get_object_or_404(Table, pk=self.kwargs["pk"])
+
+    def get_permission_object(self):
+        return self.table
+
+    def get(self, request, pk, kind, fmt):
+        if isinstance(request, ASGIRequest):
+            content = aiter_export(self.table, kind, fmt)
+        else:
+            content = iter_export(self.table, kind, fmt)
+        response = StreamingHttpResponse(content, content_type=f"{FORMATS[fmt].content_type}; charset=utf-8")
+        response["Content-Disposition"] = f'attachment; filename="table-{pk}-{kind}.{fmt}"'
+        return response
+
+class UserSearchView(LoginRequiredMixin, View):
+    """Prefix search behind the user pickers, ``?q=<prefix>&table=<pk>``."""
+
+    def get(self, request):
+        prefix = request.GET.get("q", "")[:150]
+        table_id = request.GET.get("table", "")
+        table = Table.objects.filter(pk=table_id).first() if table_id.isdigit() else None
+        # Ranking reveals who plays at the table, so only for its readers
+        if table is not None and not request.user.has_perm("tables.read_table", table):
+            table = None
+
+        users = search_users(prefix, table.pk if table else None)
+        return JsonResponse({"results": [{"id": pk, "username": username} for pk, username in users]})
+
 class TablesCreateView(LoginRequiredMixin, CreateView):
     model = Table
-    fields = ["name", "dealer"]
+    form_class = TableCreateForm
     template_name_suffix = "_create_form"
 
     def form_valid(self, form):
@@ -35,7 +181,7 @@ class TableDeleteView(PermissionRequiredMixin, LoginRequiredMixin, DeleteView):
 
 class TableUpdateView(PermissionRequiredMixin, LoginRequiredMixin, UpdateView):
     model = Table
-    fields = "__all__"
+    form_class = TableForm
     template_name_suffix = "_update_form"
     permission_required = "tables.change_table"
 
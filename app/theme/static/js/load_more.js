@@ -0,0 +1,25 @@
+// Replaces "load more" links with the next page of rows fetched from a fragment endpoint.
+document.addEventListener("click", async (event) => {
+  const link = event.target.closest("a[data-load-more]");
+  if (!link) {
+    return;
+  }
+  event.preventDefault();
+
+  const container = link.closest("[data-load-more-container]");
+  const response = await fetch(link.href, { credentials: "same-origin" });
+  if (!response.ok) {
+    return;
+  }
+
+  const html = await response.text();
+  const template = document.createElement("template");
+  if (container.tagName === "TR") {
+    // <tr> fragments must be parsed inside a table to survive the HTML parser
+    template.innerHTML = `<table><tbody>${html}</tbody></table>`;
+    container.replaceWith(...template.content.querySelector("tbody").children);
+  } else {
+    template.innerHTML = html;
+    container.replaceWith(template.content);
+  }
+});
@@ -0,0 +1,52 @@
+// Adds a search box to every select[data-user-search] and fills it with matching users.
+// The server renders only the chosen users, so a select never lists the whole user table.
+const SEARCH_DELAY_MS = 200;
+
+function attachUserSearch(select) {
+  const input = document.createElement("input");
+  input.type = "search";
+  input.placeholder = "Search users…";
+  input.autocomplete = "off";
+  input.className = "mb-2 w-full rounded-md bg-white/5 py-1.5 pl-3 text-base text-white outline-1 -outline-offset-1 outline-white/10 placeholder:text-gray-500 focus:outline-2 focus:-outline-offset-2 focus:outline-indigo-500 sm:text-sm/6";
+  select.before(input);
+
+  let timer = null;
+  let latest = null;
+  const search = async () => {
+    const url = new URL(select.dataset.userSearch, window.location.origin);
+    url.searchParams.set("q", input.value.trim());
+    if (select.dataset.userSearchTable) {
+      url.searchParams.set("table", select.dataset.userSearchTable);
+    }
+    const request = (latest = fetch(url, { credentials: "same-origin" }));
+    const response = await request;
+    // An older, slower response must not overwrite a newer one
+    if (request !== latest || !response.ok) {
+      return;
+    }
+    const { results } = await response.json();
+
+    // Keep the chosen users (and the empty choice), replace every other option
+    for (const option of [...select.options]) {
+      if (!option.selected && option.value !== "") {
+        option.remove();
+      }
+    }
+    const present = new Set([...select.options].map((option) => option.value));
+    for (const user of results) {
+      if (!present.has(String(user.id))) {
+        select.add(new Option(user.username, user.id));
+      }
+    }
+  };
+
+  input.addEventListener("input", () => {
+    clearTimeout(timer);
+    timer = setTimeout(search, SEARCH_DELAY_MS);
+  });
+  input.addEventListener("focus", search, { once: true });
+}
+
+document.addEventListener("DOMContentLoaded", () => {
+  document.querySelectorAll("select[data-user-search]").forEach(attachUserSearch);
+});